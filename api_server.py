@@ -0,0 +1,226 @@
+"""Headless REST API over the Gmail tools
+
+    python api_server.py --port 8000 --workers 4
+
+Endpoints return JSON records instead of chat-formatted text. Listings use
+cursor pagination and can stream as NDJSON (``?format=ndjson`` or
+``Accept: application/x-ndjson``). Fetched messages and summaries are kept
+in an SQLite cache shared by all workers. Set ``GMAIL_AI_API_TOKEN`` to
+require ``Authorization: Bearer <token>`` on every request.
+"""
+import argparse
+import asyncio
+import json
+import os
+from typing import List, Optional
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from components.account_manager import AccountManager
+from tools import EmailRecord, SessionCache, metrics, tracing
+from tools.disk_cache import DiskCache
+from tools.data_dir import data_path
+from tools.gemini_client import GeminiClient
+
+API_TOKEN = os.getenv("GMAIL_AI_API_TOKEN")
+CACHE_FILE = os.getenv("GMAIL_AI_API_CACHE") or data_path("api_cache.sqlite3")
+ACCOUNTS_FILE = os.getenv("GMAIL_AI_ACCOUNTS_FILE", "gmail_accounts.json")
+# Message labels change, bodies and summaries don't
+RECORD_TTL = float(os.getenv("GMAIL_AI_API_RECORD_TTL", "300"))
+MAX_PAGE_SIZE = 100
+NDJSON = "application/x-ndjson"
+
+account_manager = AccountManager(ACCOUNTS_FILE)
+sessions = SessionCache()
+cache = DiskCache(CACHE_FILE, default_ttl=RECORD_TTL)
+
+app = FastAPI(title="Gmail AI API")
+
+class LabelRequest(BaseModel):
+    label: str
+
+class DraftRequest(BaseModel):
+    to: str
+    subject: str
+    context: str
+
+class SummariesRequest(BaseModel):
+    ids: List[str]
+
+def check_token(request: Request):
+    if API_TOKEN and request.headers.get("authorization") != f"Bearer {API_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid or missing API token")
+
+def active_account():
+    account = account_manager.get_active_account()
+    if not account or not account.token_pickle:
+        raise HTTPException(status_code=503, detail="No authenticated Gmail account selected in the app")
+    metrics.set_account(account.name)
+    return account
+
+def _record_key(account, email_id: str, full: bool) -> str:
+    return f"{account.name}:record:{email_id}:{'full' if full else 'meta'}"
+
+def get_record(account, email_id: str, full: bool = False) -> dict:
+    """Fetch a message as a record dict, through the shared cache"""
+    key = _record_key(account, email_id, full)
+    data = cache.get(key)
+    metrics.record_cache('api_record', data is not None)
+    if data is None:
+        data = sessions.get(account)['email_analyzer'].get_record(email_id, full=full).to_dict()
+        cache.set(key, data)
+    return data
+
+def summarize(account, email_id: str) -> str:
+    """Summarize a message with Gemini; summaries are cached permanently"""
+    key = f"{account.name}:summary:{email_id}"
+    summary = cache.get(key)
+    metrics.record_cache('api_summary', summary is not None)
+    if summary is not None:
+        return summary
+    if not account.gemini_api_key:
+        raise HTTPException(status_code=400, detail="Add a Gemini API key for this account in Account Management")
+
+    record = EmailRecord.from_dict(get_record(account, email_id, full=True))
+    text = ' '.join((record.body or '').split())[:1000]
+    if not text:
+        summary = "No content to summarize"
+    else:
+        with tracing.get_tracer(__name__).start_as_current_span("summarize"):
+            summary = GeminiClient(account.gemini_api_key).generate_content(
+                f"Summarize this email content in 1-2 clear, informative sentences:\n\n{text}",
+                generation_config={'temperature': 0.3, 'topP': 0.8, 'topK': 40, 'maxOutputTokens': 150}
+            ).strip()
+    cache.set(key, summary, ttl=None)
+    return summary
+
+def wants_ndjson(request: Request, format: Optional[str]) -> bool:
+    return format == "ndjson" or NDJSON in request.headers.get("accept", "")
+
+async def _list_messages(request: Request, account, q: str, label: Optional[List[str]], limit: int,
+                         cursor: Optional[str], full: bool, format: Optional[str]):
+    finder = sessions.get(account)['email_finder']
+    ids, next_cursor = await run_in_threadpool(finder.list_ids, q, label, limit, cursor)
+
+    if wants_ndjson(request, format):
+        async def stream():
+            # Fetch in parallel, emit in order as each record arrives
+            tasks = [asyncio.ensure_future(run_in_threadpool(get_record, account, email_id, full)) for email_id in ids]
+            try:
+                for task in tasks:
+                    yield json.dumps({"message": await task}) + "\n"
+                yield json.dumps({"next_cursor": next_cursor}) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+        return StreamingResponse(stream(), media_type=NDJSON)
+
+    messages = await asyncio.gather(*(run_in_threadpool(get_record, account, email_id, full) for email_id in ids))
+    return {"messages": list(messages), "next_cursor": next_cursor}
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/messages", dependencies=[Depends(check_token)])
+async def list_messages(request: Request,
+                        q: str = "",
+                        label: Optional[List[str]] = Query(None, description="Label IDs, e.g. INBOX, UNREAD"),
+                        limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+                        cursor: Optional[str] = None,
+                        full: bool = False,
+                        format: Optional[str] = Query(None, pattern="^(json|ndjson)$")):
+    """List messages, newest first, one page per call (pass back ``next_cursor``)"""
+    return await _list_messages(request, active_account(), q, label, limit, cursor, full, format)
+
+@app.get("/search", dependencies=[Depends(check_token)])
+async def search(request: Request,
+                 q: str = Query(..., min_length=1, description="Gmail search query, e.g. from:alice is:unread"),
+                 limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+                 cursor: Optional[str] = None,
+                 full: bool = False,
+                 format: Optional[str] = Query(None, pattern="^(json|ndjson)$")):
+    """Search messages with Gmail query syntax"""
+    return await _list_messages(request, active_account(), q, None, limit, cursor, full, format)
+
+@app.get("/messages/{email_id}", dependencies=[Depends(check_token)])
+async def get_message(email_id: str, full: bool = True):
+    return await run_in_threadpool(get_record, active_account(), email_id, full)
+
+@app.post("/messages/{email_id}/summary", dependencies=[Depends(check_token)])
+async def summarize_message(email_id: str):
+    summary = await run_in_threadpool(summarize, active_account(), email_id)
+    return {"id": email_id, "summary": summary}
+
+@app.post("/summaries", dependencies=[Depends(check_token)])
+async def summarize_messages(body: SummariesRequest):
+    """Summarize many messages concurrently, streaming NDJSON lines as each finishes"""
+    account = active_account()
+
+    async def summarize_one(email_id):
+        try:
+            return {"id": email_id, "summary": await run_in_threadpool(summarize, account, email_id)}
+        except HTTPException as e:
+            return {"id": email_id, "error": e.detail}
+        except Exception as e:
+            return {"id": email_id, "error": str(e)}
+
+    async def stream():
+        for result in asyncio.as_completed([summarize_one(email_id) for email_id in body.ids]):
+            yield json.dumps(await result) + "\n"
+
+    return StreamingResponse(stream(), media_type=NDJSON)
+
+def _invalidate(account, email_id: str):
+    for full in (False, True):
+        cache.delete(_record_key(account, email_id, full))
+
+def _tool_result(message: str) -> dict:
+    """Map a tool's status text to a response (the tools report errors as text)"""
+    if message.startswith("Error"):
+        raise HTTPException(status_code=502, detail=message)
+    if "not found" in message:
+        raise HTTPException(status_code=404, detail=message)
+    return {"message": message}
+
+@app.get("/labels", dependencies=[Depends(check_token)])
+async def list_labels():
+    labels = await run_in_threadpool(sessions.get(active_account())['label_manager'].get_labels)
+    return {"labels": labels}
+
+@app.post("/messages/{email_id}/labels", dependencies=[Depends(check_token)])
+async def add_label(email_id: str, body: LabelRequest):
+    account = active_account()
+    message = await run_in_threadpool(sessions.get(account)['label_manager'].add_label_to_email, body.label, email_id)
+    _invalidate(account, email_id)
+    return _tool_result(message)
+
+@app.delete("/messages/{email_id}/labels/{label}", dependencies=[Depends(check_token)])
+async def remove_label(email_id: str, label: str):
+    account = active_account()
+    message = await run_in_threadpool(sessions.get(account)['label_manager'].remove_label_from_email, label, email_id)
+    _invalidate(account, email_id)
+    return _tool_result(message)
+
+@app.post("/drafts", dependencies=[Depends(check_token)], status_code=201)
+async def create_draft(body: DraftRequest):
+    drafter = sessions.get(active_account())['email_drafter']
+    draft = await run_in_threadpool(drafter.create_draft, body.to, body.subject, body.context)
+    return {"id": draft['id'], "message": draft.get('message', {})}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Gmail AI REST API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("GMAIL_AI_API_WORKERS", "1")))
+    args = parser.parse_args()
+
+    import uvicorn
+    # Workers are separate processes; they share the on-disk cache
+    uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -1,164 +1,148 @@
 import gradio as gr
-from tools import EmailDrafter, EmailAnalyzer, ResponseSuggester, EmailProcessor, EmailFinder, LabelManager
+from tools import ToolSession
+from tools.command_router import route_command, CommandFormatError
+from tools.jobs import job_manager
+from tools import metrics, profiling, tracing
 from components.email_viewer import EmailViewer
 from components.account_manager import AccountManager
+from components.prefetcher import DatePrefetcher
+from components.reply_precomputer import ReplyPrecomputer
+from components.outbox_sender import OutboxSender
+from components.write_replayer import WriteReplayer
+from components.calendar_widget import CalendarWidget
+from tools.day_index import DayCountIndex
+from tools.records import EmailRecord
+from tools.outbox import outbox
 import os
+import uvicorn
+from fastapi import FastAPI, Response
 
-# Initialize managers and tools
+# Initialize managers (shared, read-mostly)
 account_manager = AccountManager()
 email_viewer = EmailViewer(account_manager)
+date_prefetcher = DatePrefetcher(email_viewer)
+reply_precomputer = ReplyPrecomputer(email_viewer)
+outbox_sender = OutboxSender(account_manager)
+write_replayer = WriteReplayer(account_manager)
+day_index = DayCountIndex()
+calendar_widget = CalendarWidget(day_index, account_manager)
+
+def index_synced_messages(messages):
+    """Keep the per-day count index current from each inbox refresh"""
+    active_account = account_manager.get_active_account()
+    if active_account:
+        day_index.record_messages(active_account.name, [EmailRecord.from_message(m) for m in messages])
+
+email_viewer.add_sync_listener(index_synced_messages)
+
+# Number of Gradio events processed concurrently; tools are per session and
+# Gmail transports are thread-local, so handlers no longer need serializing
+CONCURRENCY_LIMIT = int(os.getenv("GMAIL_AI_CONCURRENCY", "8"))
 
-# Initialize tools with active account
 def initialize_tools():
+    """Create a tool session for the active account"""
     active_account = account_manager.get_active_account()
     if not active_account:
         return None
-    
-    tools = {
-        'email_drafter': EmailDrafter(),
-        'email_analyzer': EmailAnalyzer(),
-        'response_suggester': ResponseSuggester(),
-        'email_processor': EmailProcessor(),
-        'email_finder': EmailFinder(),
-        'label_manager': LabelManager()
-    }
-    
-    # Configure each tool with the active account
-    for tool in tools.values():
-        tool.set_credentials(
-            client_id=active_account.client_id,
-            client_secret=active_account.client_secret,
-            token_pickle=active_account.token_pickle if active_account.token_pickle else None
-        )
-    
-    return tools
+    return ToolSession(active_account)
 
-# Initialize tools
-tools = initialize_tools()
+def get_session(session):
+    """Get this user's tool session, re-creating it after an account switch"""
+    active_account = account_manager.get_active_account()
+    if not active_account:
+        return session, "Please set up and select a Gmail account first"
+    metrics.set_account(active_account.name)
+    if session is None or not session.matches(active_account):
+        session = initialize_tools()
+        if not session:
+            return session, "Error initializing tools. Please check your account settings."
+    return session, None
 
-def process_message(message, history):
-    """Process user messages and interact with Gmail MCP tools."""
-    global tools
-    
-    # Check if tools are initialized
-    if not tools:
-        active_account = account_manager.get_active_account()
-        if not active_account:
-            return "Please set up and select a Gmail account first", history
-        tools = initialize_tools()
-        if not tools:
-            return "Error initializing tools. Please check your account settings.", history
-    
-    # Convert message to lowercase for easier processing
-    msg = message.lower()
-    
-    if "connect email" in msg:
-        try:
-            email = message.split("connect email:")[1].strip()
-            # Set email for all tools
-            for tool in tools.values():
-                tool.set_connected_email(email)
-            return f"Successfully connected to {email}", history + [(message, f"Successfully connected to {email}")]
-        except:
-            return "Please format your message as: 'connect email: your.email@example.com'", history
-    
-    elif "draft email" in msg:
-        try:
-            # Extract email details from the message
-            parts = message.split("to:")[1].split("subject:")[0].strip()
-            subject = message.split("subject:")[1].split("context:")[0].strip()
-            context = message.split("context:")[1].strip()
-            
-            response = tools['email_drafter'].draft_email(parts, subject, context)
-            return response, history + [(message, response)]
-        except:
-            return "Please format your message as: 'draft email to: recipient@email.com subject: your subject context: your context'", history
-    
-    elif "send email" in msg:
-        try:
-            # Extract email details from the message
-            parts = message.split("to:")[1].split("subject:")[0].strip()
-            subject = message.split("subject:")[1].split("context:")[0].strip()
-            context = message.split("context:")[1].strip()
-            
-            response = tools['email_drafter'].send_email(parts, subject, context)
-            return response, history + [(message, response)]
-        except:
-            return "Please format your message as: 'send email to: recipient@email.com subject: your subject context: your context'", history
-    
-    elif "analyze email" in msg:
-        try:
-            email_content = message.split("analyze email:")[1].strip()
-            response = tools['email_analyzer'].analyze_email(email_content)
-            return response, history + [(message, response)]
-        except:
-            return "Please format your message as: 'analyze email: [paste email content or message ID]'", history
-    
-    elif "suggest response" in msg:
-        try:
-            email_content = message.split("suggest response:")[1].strip()
-            response = tools['response_suggester'].suggest_response(email_content)
-            return response, history + [(message, response)]
-        except:
-            return "Please format your message as: 'suggest response: [paste email to respond to]'", history
-    
-    elif "list emails" in msg:
-        try:
-            response = tools['email_analyzer'].list_recent_emails(5)
-            return response, history + [(message, response)]
-        except:
-            return "Error listing recent emails. Please try again.", history
-    
-    elif "find email" in msg:
-        try:
-            parts = message.split("find email:")[1].split("count:")[0].strip()
-            count = int(message.split("count:")[1].strip()) if "count:" in message else 1
-            response = tools['email_finder'].find_emails(parts, count)
-            return response, history + [(message, response)]
-        except:
-            return "Please format your message as: 'find email: name_or_email count: number_of_emails'", history
-    
-    elif "list labels" in msg:
-        try:
-            response = tools['label_manager'].list_labels()
-            return response, history + [(message, response)]
-        except:
-            return "Error listing labels. Please try again.", history
-    
-    elif "add label" in msg:
-        try:
-            label = message.split("add label:")[1].split("to:")[0].strip()
-            email_id = message.split("to:")[1].strip()
-            response = tools['label_manager'].add_label_to_email(label, email_id)
-            return response, history + [(message, response)]
-        except:
-            return "Please format your message as: 'add label: label_name to: email_id'", history
-    
-    elif "remove label" in msg:
+def process_message(message, history, session):
+    """Process user messages and interact with Gmail MCP tools.
+    
+    Not instrumented itself: it runs inside stream_message's handler
+    metrics and span.
+    """
+    session, error = get_session(session)
+    if error:
+        return error, history, session
+    
+    try:
+        # "profile: <command>" (or GMAIL_AI_PROFILE) runs the command under cProfile/tracemalloc
+        response, report = profiling.profile_command(message, lambda command: route_command(command, session))
+    except CommandFormatError as e:
+        return str(e), history, session
+    if report:
+        response += "\n" + report.format()
+    return response, history + [(message, response)], session
+
+@metrics.instrument_handler('stream_message')
+@tracing.traced('stream_message')
+def stream_message(message, history, session):
+    """Streaming front end for process_message
+    
+    Searches run as background jobs so the chat shows progress and partial
+    results while messages are fetched; other commands respond directly.
+    """
+    # Command name only; the rest of the message may contain email content
+    tracing.set_attribute('command', message.split(':', 1)[0].strip().lower()[:40])
+    # Profiled commands run inline, since only the calling thread is profiled
+    profile_requested, _ = profiling.split_profile_prefix(message)
+    if "find email" not in message.lower() or profile_requested:
+        yield process_message(message, history, session)
+        return
+    
+    session, error = get_session(session)
+    if error:
+        yield error, history, session
+        return
+    
+    def run(job):
         try:
-            label = message.split("remove label:")[1].split("from:")[0].strip()
-            email_id = message.split("from:")[1].strip()
-            response = tools['label_manager'].remove_label_from_email(label, email_id)
-            return response, history + [(message, response)]
-        except:
-            return "Please format your message as: 'remove label: label_name from: email_id'", history
-    
-    else:
-        # Use the general email request processor
-        response = tools['email_processor'].process_email_request(message)
-        return response, history + [(message, response)]
+            return route_command(message, session, job=job), True
+        except CommandFormatError as e:
+            return str(e), False
+    
+    job = job_manager.submit('find_emails', run)
+    for job in job_manager.follow(job):
+        if job.status == 'done':
+            response, ok = job.result
+            if not ok:
+                yield response, history, session
+            else:
+                yield response, history + [(message, response)], session
+        elif job.status == 'failed':
+            response = f"Error finding emails: {job.error}"
+            yield response, history + [(message, response)], session
+        elif job.status == 'cancelled':
+            found = "\n".join(record.format_summary() for record in job.partial_results())
+            response = f"Search stopped ({job.progress_text()}):\n" + found
+            yield response, history + [(message, response)], session
+        else:
+            progress = f"Searching ({job.progress_text()})..."
+            partial = progress + "\n" + "\n".join(record.format_summary() for record in job.partial_results())
+            yield progress, history + [(message, partial)], session
+
+def outbox_markdown():
+    """Outbox status for every account, one message per line"""
+    return outbox.format_status(limit=50).replace("\n", "  \n")
 
 # Command examples with their descriptions
 COMMANDS = {
     "Draft Email": "draft email to:  subject: ",
     "Send Email": "send email to:  subject:  context: ",
+    "Schedule Email": "send email to:  subject:  context:  send at: YYYY-MM-DD HH:MM",
+    "Outbox": "outbox",
+    "Offline Status": "offline: status",
     "Analyze Email": "analyze email: [paste email content or message ID]",
     "Suggest Response": "suggest response: [paste email to respond to]",
     "List Emails": "list emails",
     "Find Email": "find email: [name or email] count: [number]",
     "List Labels": "list labels",
     "Add Label": "add label: [label_name] to: [email_id]",
-    "Remove Label": "remove label: [label_name] from: [email_id]"
+    "Remove Label": "remove label: [label_name] from: [email_id]",
+    "Profile": "profile: list emails"
 }
 
 # Create Gradio interface
@@ -190,9 +174,18 @@ with gr.Blocks() as demo:
                         inputs=[gr.Textbox(value=cmd, visible=False)],
                         outputs=[msg_input]
                     )
+                stop = gr.Button("Stop", size="sm", variant="stop")
                 clear = gr.Button("Clear Chat", size="sm")
             
-            msg_input.submit(process_message, [msg_input, chatbot], [msg_input, chatbot])
+            # Per-session tool instances
+            session_state = gr.State(None)
+            
+            submit_event = msg_input.submit(
+                stream_message,
+                [msg_input, chatbot, session_state],
+                [msg_input, chatbot, session_state]
+            )
+            stop.click(None, None, None, cancels=[submit_event])
             clear.click(lambda: None, None, chatbot, queue=False)
         
         # Account Management Tab
@@ -202,6 +195,34 @@ with gr.Blocks() as demo:
         # New Emails Tab
         with gr.Tab("New Emails"):
             email_viewer.create_interface()
+        
+        # Calendar Tab with per-day message count heatmap
+        with gr.Tab("Calendar"):
+            calendar_widget.create_interface()
+        
+        # Outbox Tab with queued, scheduled and failed sends
+        with gr.Tab("Outbox"):
+            outbox_status = gr.Markdown(outbox_markdown)
+            gr.Button("Refresh", size="sm").click(outbox_markdown, None, outbox_status)
+
+def create_server_app():
+    """Mount the Gradio UI on a FastAPI app that also serves /metrics"""
+    server_app = FastAPI()
+    
+    @server_app.get("/metrics")
+    def prometheus_metrics():
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+    
+    return gr.mount_gradio_app(server_app, demo, path="/")
 
 if __name__ == "__main__":
-    demo.launch() 
\ No newline at end of file
+    demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT)
+    date_prefetcher.start()
+    reply_precomputer.start()
+    outbox_sender.start()
+    write_replayer.start()
+    uvicorn.run(
+        create_server_app(),
+        host=os.getenv("GRADIO_SERVER_NAME", "127.0.0.1"),
+        port=int(os.getenv("GRADIO_SERVER_PORT", "7860"))
+    ) 
\ No newline at end of file
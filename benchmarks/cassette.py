@@ -0,0 +1,273 @@
+"""Record/replay of Gmail and Gemini HTTP exchanges
+
+    with use_cassette("benchmarks/cassettes/default.json", mode="record"):
+        ...  # real (or fake server) traffic is captured
+    with use_cassette("benchmarks/cassettes/default.json", latency_ms=25) as cassette:
+        ...  # served from the file, no network or credentials needed
+
+Gmail traffic is captured below the googleapiclient service objects (the
+service pool's transport) and Gemini traffic as a requests transport
+adapter on the pooled sessions, so the code under test runs unchanged.
+Credentials (API keys, tokens, cookies) are scrubbed before anything is
+written; message content is kept.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+import httplib2
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from tools import gemini_client
+from tools.quota import gmail_operation
+from tools.service_pool import service_pool
+
+CASSETTE_VERSION = 1
+REDACTED = "REDACTED"
+
+SECRET_PARAMS = {'key', 'access_token', 'api_key', 'client_secret', 'refresh_token'}
+SECRET_HEADERS = {'authorization', 'x-goog-api-key', 'cookie', 'set-cookie', 'proxy-authorization'}
+# Headers that vary per run and would only add noise to the cassette
+VOLATILE_HEADERS = {'date', 'expires', 'alt-svc', 'server-timing', 'x-goog-request-id',
+                    'content-length', 'content-encoding', 'transfer-encoding', '-content-encoding'}
+
+_GEMINI_PATH = re.compile(r'/models/[^/:]+:(\w+)')
+
+class CassetteMiss(Exception):
+    """Raised on replay when a request was never recorded"""
+
+def scrub_uri(uri: str) -> str:
+    """Replace credential query parameters with a placeholder"""
+    parsed = urlparse(uri)
+    query = [(k, REDACTED if k in SECRET_PARAMS else v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)]
+    return urlunparse(parsed._replace(query=urlencode(query)))
+
+def scrub_headers(headers) -> dict:
+    return {
+        k.lower(): (REDACTED if k.lower() in SECRET_HEADERS else str(v))
+        for k, v in dict(headers or {}).items()
+        if k.lower() not in VOLATILE_HEADERS and k.lower() != 'status'
+    }
+
+def _encode_body(body) -> dict:
+    if body is None:
+        return {'text': ''}
+    if isinstance(body, str):
+        return {'text': body}
+    try:
+        return {'text': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'base64': base64.b64encode(body).decode('ascii')}
+
+def _decode_body(body: dict) -> bytes:
+    if 'base64' in body:
+        return base64.b64decode(body['base64'])
+    return body.get('text', '').encode('utf-8')
+
+def _body_key(body) -> str:
+    """Match JSON bodies by content; ignore others (multipart boundaries are random)"""
+    if not body:
+        return ''
+    try:
+        data = json.loads(body)
+    except (ValueError, TypeError):
+        return ''
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+def operation_name(method: str, uri: str) -> str:
+    """Name a request for request-count budgets ('messages.get', 'gemini.generateContent', ...)"""
+    match = _GEMINI_PATH.search(urlparse(uri).path)
+    if match:
+        return f"gemini.{match.group(1)}"
+    return gmail_operation(method, uri)
+
+class Cassette:
+    """A file of recorded exchanges, replayable in recorded order per request"""
+
+    def __init__(self, path: str, mode: str = "replay", latency_ms: float = 0.0, latency_scale: float = 1.0):
+        """
+        Args:
+            mode: "record" (always hit the network), "replay" (never) or
+                "auto" (replay if the file exists, record otherwise)
+            latency_ms: simulated latency per replayed request; ``None``
+                replays each request's recorded duration times ``latency_scale``
+        """
+        if mode == "auto":
+            mode = "replay" if os.path.exists(path) else "record"
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+
+        self.path = path
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.latency_scale = latency_scale
+        self.metadata = {}
+        self.interactions = []
+        self.request_counts = Counter()
+        # Requests that found no recording; tools turn CassetteMiss into error strings
+        self.misses = []
+        self._queues = defaultdict(deque)
+        self._lock = threading.Lock()
+
+        if mode == "replay":
+            self.load()
+
+    @staticmethod
+    def _match_key(method: str, uri: str, body) -> tuple:
+        # Scheme, host and port are left out: cassettes recorded against the
+        # fake server (on a random port) replay against the default endpoints
+        parsed = urlparse(scrub_uri(uri))
+        return method.upper(), parsed.path, parsed.query, _body_key(body)
+
+    def load(self):
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {self.path}")
+        self.metadata = data.get('metadata', {})
+        self.interactions = data['interactions']
+        for interaction in self.interactions:
+            request = interaction['request']
+            key = self._match_key(request['method'], request['uri'], _decode_body(request['body']))
+            self._queues[key].append(interaction)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            data = {'version': CASSETTE_VERSION, 'metadata': self.metadata, 'interactions': self.interactions}
+        with open(self.path, "w") as f:
+            json.dump(data, f, indent=1)
+
+    def reset_counts(self):
+        with self._lock:
+            self.request_counts.clear()
+            self.misses.clear()
+
+    def snapshot_counts(self) -> Counter:
+        with self._lock:
+            return Counter(self.request_counts)
+
+    def record(self, method: str, uri: str, request_headers, request_body, status: int, headers, body: bytes, duration: float):
+        interaction = {
+            'request': {
+                'method': method.upper(),
+                'uri': scrub_uri(uri),
+                'headers': scrub_headers(request_headers),
+                'body': _encode_body(request_body)
+            },
+            'response': {
+                'status': status,
+                'headers': scrub_headers(headers),
+                'body': _encode_body(body)
+            },
+            'duration_ms': round(duration * 1000, 3)
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+            self.request_counts[operation_name(method, uri)] += 1
+
+    def play(self, method: str, uri: str, body) -> dict:
+        """Find the next recorded response for a request and apply simulated latency"""
+        key = self._match_key(method, uri, body)
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                miss = f"No recorded response for {method} {scrub_uri(uri)} in {self.path}"
+                self.misses.append(miss)
+                raise CassetteMiss(miss)
+            # Replay identical requests in recorded order, repeating the last one
+            interaction = queue.popleft() if len(queue) > 1 else queue[0]
+            self.request_counts[operation_name(method, uri)] += 1
+
+        delay_ms = interaction['duration_ms'] * self.latency_scale if self.latency_ms is None else self.latency_ms
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        return interaction['response']
+
+class CassetteHttp:
+    """httplib2-compatible transport recording to or replaying from a cassette"""
+
+    def __init__(self, cassette: Cassette, http=None):
+        self.cassette = cassette
+        self.http = http
+
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        if self.cassette.mode == "replay":
+            response = self.cassette.play(method, uri, body)
+            info = dict(response['headers'])
+            info['status'] = str(response['status'])
+            return httplib2.Response(info), _decode_body(response['body'])
+
+        start = time.perf_counter()
+        response, content = self.http.request(uri, method, body, headers, *args, **kwargs)
+        self.cassette.record(method, uri, headers, body, response.status, response, content, time.perf_counter() - start)
+        return response, content
+
+    def __getattr__(self, name):
+        if self.http is None:
+            raise AttributeError(name)
+        return getattr(self.http, name)
+
+class CassetteAdapter(BaseAdapter):
+    """requests transport adapter recording to or replaying from a cassette"""
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+        self._http = HTTPAdapter()
+
+    def send(self, request, **kwargs):
+        if self.cassette.mode == "replay":
+            recorded = self.cassette.play(request.method, request.url, request.body)
+            response = requests.Response()
+            response.status_code = recorded['status']
+            response.headers = CaseInsensitiveDict(recorded['headers'])
+            response._content = _decode_body(recorded['body'])
+            response.encoding = 'utf-8'
+            response.url = request.url
+            response.request = request
+            response.reason = 'OK' if recorded['status'] < 400 else 'Error'
+            return response
+
+        start = time.perf_counter()
+        response = self._http.send(request, **kwargs)
+        self.cassette.record(
+            request.method, request.url, request.headers, request.body,
+            response.status_code, response.headers, response.content, time.perf_counter() - start
+        )
+        return response
+
+    def close(self):
+        self._http.close()
+
+@contextmanager
+def use_cassette(path: str, mode: str = "replay", latency_ms: float = 0.0, latency_scale: float = 1.0):
+    """Route all Gmail and Gemini traffic through a cassette for the block"""
+    cassette = Cassette(path, mode, latency_ms, latency_scale)
+
+    def http_factory(credentials):
+        if cassette.mode == "replay":
+            return CassetteHttp(cassette)
+        return CassetteHttp(cassette, service_pool.authorized_http(credentials))
+
+    previous_factory = service_pool.http_factory
+    service_pool.set_http_factory(http_factory)
+    gemini_client.set_transport_adapter(CassetteAdapter(cassette))
+    try:
+        yield cassette
+    finally:
+        service_pool.set_http_factory(previous_factory)
+        gemini_client.set_transport_adapter(None)
+        if cassette.mode == "record":
+            cassette.save()
@@ -0,0 +1,193 @@
+import base64
+import random
+import time
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+FIRST_NAMES = ["Alice", "Bob", "Carol", "Dan", "Erin", "Frank", "Grace", "Heidi", "Ivan", "Judy",
+               "Mallory", "Niaj", "Olivia", "Peggy", "Rupert", "Sybil", "Trent", "Victor", "Walter", "Zoe"]
+DOMAINS = ["example.com", "acme.io", "contoso.org", "globex.net", "initech.com", "umbrella.co"]
+WORDS = ("project update meeting invoice report review schedule release budget customer team quarter "
+         "deadline proposal contract feedback design launch support ticket travel lunch agenda notes "
+         "migration server outage metrics roadmap hiring onboarding security audit renewal").split()
+SYSTEM_LABELS = ["INBOX", "SENT", "DRAFT", "SPAM", "TRASH", "UNREAD", "STARRED", "IMPORTANT",
+                 "CATEGORY_PERSONAL", "CATEGORY_SOCIAL", "CATEGORY_PROMOTIONS", "CATEGORY_UPDATES"]
+
+def b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+class SyntheticMessage:
+    """A generated message that can be rendered in every Gmail API format"""
+
+    __slots__ = ('id', 'thread_id', 'label_ids', 'internal_date', 'sender', 'to', 'subject',
+                 'text', 'html', 'attachment')
+
+    def __init__(self, id, thread_id, label_ids, internal_date, sender, to, subject, text, html=None, attachment=None):
+        self.id = id
+        self.thread_id = thread_id
+        self.label_ids = label_ids
+        self.internal_date = internal_date
+        self.sender = sender
+        self.to = to
+        self.subject = subject
+        self.text = text
+        self.html = html
+        self.attachment = attachment
+
+    @property
+    def date_header(self) -> str:
+        return format_datetime(datetime.fromtimestamp(self.internal_date / 1000, tz=timezone.utc))
+
+    def headers(self) -> list:
+        return [
+            {'name': 'From', 'value': self.sender},
+            {'name': 'To', 'value': self.to},
+            {'name': 'Subject', 'value': self.subject},
+            {'name': 'Date', 'value': self.date_header},
+            {'name': 'Message-ID', 'value': f"<{self.id}@synthetic.local>"},
+        ]
+
+    def snippet(self) -> str:
+        return self.text[:100]
+
+    def payload(self) -> dict:
+        """Build the format='full' payload tree"""
+        text_part = {
+            'partId': '0',
+            'mimeType': 'text/plain',
+            'filename': '',
+            'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset="UTF-8"'}],
+            'body': {'size': len(self.text), 'data': b64url(self.text.encode())}
+        }
+        if not self.html and not self.attachment:
+            return dict(text_part, partId='', headers=self.headers() + text_part['headers'])
+
+        parts = [text_part]
+        if self.html:
+            parts.append({
+                'partId': '1',
+                'mimeType': 'text/html',
+                'filename': '',
+                'headers': [{'name': 'Content-Type', 'value': 'text/html; charset="UTF-8"'}],
+                'body': {'size': len(self.html), 'data': b64url(self.html.encode())}
+            })
+        if self.attachment:
+            filename, data = self.attachment
+            parts.append({
+                'partId': str(len(parts)),
+                'mimeType': 'application/octet-stream',
+                'filename': filename,
+                'headers': [{'name': 'Content-Disposition', 'value': f'attachment; filename="{filename}"'}],
+                'body': {'size': len(data), 'attachmentId': f"att-{self.id}"}
+            })
+        return {
+            'partId': '',
+            'mimeType': 'multipart/mixed',
+            'filename': '',
+            'headers': self.headers(),
+            'body': {'size': 0},
+            'parts': parts
+        }
+
+    def raw_bytes(self) -> bytes:
+        """Render the message as RFC 822 bytes"""
+        message = EmailMessage()
+        for header in self.headers():
+            message[header['name']] = header['value']
+        message.set_content(self.text)
+        if self.html:
+            message.add_alternative(self.html, subtype='html')
+        if self.attachment:
+            filename, data = self.attachment
+            message.add_attachment(data, maintype='application', subtype='octet-stream', filename=filename)
+        return message.as_bytes()
+
+    def resource(self, format: str = 'full', metadata_headers=None) -> dict:
+        """Render the messages.get response for a format"""
+        resource = {
+            'id': self.id,
+            'threadId': self.thread_id,
+            'labelIds': list(self.label_ids),
+            'snippet': self.snippet(),
+            'internalDate': str(self.internal_date),
+            'historyId': '1',
+            'sizeEstimate': len(self.text) + len(self.html or '') + len(self.attachment[1] if self.attachment else b'')
+        }
+        if format == 'minimal':
+            return resource
+        if format == 'raw':
+            resource['raw'] = b64url(self.raw_bytes())
+            return resource
+        if format == 'metadata':
+            headers = self.headers()
+            if metadata_headers:
+                wanted = {h.lower() for h in metadata_headers}
+                headers = [h for h in headers if h['name'].lower() in wanted]
+            mime_type = 'multipart/mixed' if self.html or self.attachment else 'text/plain'
+            resource['payload'] = {'mimeType': mime_type, 'headers': headers}
+            return resource
+        resource['payload'] = self.payload()
+        return resource
+
+class Mailbox:
+    """In-memory synthetic mailbox"""
+
+    def __init__(self, messages, labels):
+        # Newest first, like messages.list
+        self.messages = sorted(messages, key=lambda m: m.internal_date, reverse=True)
+        self.by_id = {m.id: m for m in self.messages}
+        self.labels = labels
+
+    def add(self, message: SyntheticMessage):
+        self.messages.insert(0, message)
+        self.messages.sort(key=lambda m: m.internal_date, reverse=True)
+        self.by_id[message.id] = message
+
+def _sentence(rng, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def generate_mailbox(size: int = 500, seed: int = 42, days: int = 60,
+                     html_ratio: float = 0.3, attachment_ratio: float = 0.1,
+                     attachment_size: int = 64 * 1024) -> Mailbox:
+    """Generate a reproducible mailbox of ``size`` messages spread over ``days``"""
+    rng = random.Random(seed)
+    now_ms = int(time.time() * 1000)
+    senders = [f"{rng.choice(FIRST_NAMES)} <{name.lower()}@{rng.choice(DOMAINS)}>" for name in FIRST_NAMES]
+
+    labels = [{'id': label, 'name': label, 'type': 'system'} for label in SYSTEM_LABELS]
+    labels += [{'id': f"Label_{i}", 'name': name, 'type': 'user'}
+               for i, name in enumerate(["Work", "Personal", "Receipts", "Travel"], start=1)]
+
+    messages = []
+    for i in range(size):
+        message_id = f"{rng.getrandbits(64):016x}"
+        label_ids = ["INBOX"] if rng.random() < 0.85 else ["SENT"]
+        for label, probability in (("UNREAD", 0.35), ("IMPORTANT", 0.2), ("STARRED", 0.05)):
+            if rng.random() < probability:
+                label_ids.append(label)
+        label_ids.append(rng.choice(["CATEGORY_PERSONAL", "CATEGORY_UPDATES", "CATEGORY_PROMOTIONS"]))
+
+        text = "\n\n".join(
+            " ".join(_sentence(rng, rng.randint(6, 16)) for _ in range(rng.randint(2, 6)))
+            for _ in range(rng.randint(1, 8))
+        )
+        html = f"<html><body><p>{text.replace(chr(10) * 2, '</p><p>')}</p></body></html>" if rng.random() < html_ratio else None
+        attachment = None
+        if rng.random() < attachment_ratio:
+            attachment = (f"{rng.choice(WORDS)}.bin", rng.getrandbits(attachment_size * 8).to_bytes(attachment_size, 'little'))
+
+        messages.append(SyntheticMessage(
+            id=message_id,
+            thread_id=message_id if rng.random() < 0.7 else f"{rng.getrandbits(64):016x}",
+            label_ids=label_ids,
+            internal_date=now_ms - rng.randint(0, days * 86400 * 1000),
+            sender=rng.choice(senders),
+            to="me@example.com",
+            subject=_sentence(rng, rng.randint(3, 8)).rstrip('.'),
+            text=text,
+            html=html,
+            attachment=attachment
+        ))
+
+    return Mailbox(messages, labels)
@@ -0,0 +1,327 @@
+"""Local stand-in for the Gmail v1 and Gemini generateContent APIs
+
+Serves a synthetic mailbox with configurable latency, jitter and error
+injection, and counts requests per API method so benchmarks can report
+how many calls each user-facing operation makes.
+
+    python -m benchmarks.fake_server --port 8765 --messages 2000 --latency-ms 40
+"""
+import argparse
+import base64
+import email
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from email import policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from tools.quota import gmail_operation
+from .corpus import Mailbox, SyntheticMessage, generate_mailbox
+
+_GEMINI_PATH = re.compile(r'^/v1beta/models/([^/:]+):generateContent$')
+
+class FakeGoogleServer:
+    """Threaded HTTP server faking the Gmail and Gemini endpoints the tools use"""
+
+    def __init__(self, mailbox: Mailbox = None, host: str = "127.0.0.1", port: int = 0,
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 gemini_latency_ms: float = None, seed: int = 0):
+        self.mailbox = mailbox or generate_mailbox()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.gemini_latency_ms = latency_ms if gemini_latency_ms is None else gemini_latency_ms
+        self.request_counts = Counter()
+        self.bytes_sent = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> 'FakeGoogleServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-google", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.request_counts.clear()
+            self.bytes_sent.clear()
+
+    def snapshot_counts(self) -> Counter:
+        with self._lock:
+            return Counter(self.request_counts)
+
+    def _new_id(self) -> str:
+        with self._lock:
+            self._next_id += 1
+            return f"fake{self._next_id:012x}"
+
+    def _delay(self, base_ms: float):
+        if base_ms or self.jitter_ms:
+            with self._lock:
+                jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            time.sleep(max(0.0, base_ms + jitter) / 1000.0)
+
+    def _should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    # Gmail semantics
+
+    def _matches_query(self, message: SyntheticMessage, query: str) -> bool:
+        for term in query.split():
+            if ':' in term:
+                key, value = term.split(':', 1)
+                if key in ('after', 'before'):
+                    # Gmail takes a date or epoch seconds
+                    seconds = int(value) if value.isdigit() else datetime.strptime(value, "%Y/%m/%d").timestamp()
+                    cutoff = seconds * 1000
+                    if key == 'after' and message.internal_date < cutoff:
+                        return False
+                    if key == 'before' and message.internal_date >= cutoff:
+                        return False
+                elif key == 'from':
+                    if value.lower() not in message.sender.lower():
+                        return False
+                elif key == 'is':
+                    if value.upper() not in message.label_ids:
+                        return False
+                elif key == 'label':
+                    if not any(value.lower() == label.lower() for label in message.label_ids):
+                        return False
+            else:
+                haystack = f"{message.sender} {message.subject} {message.text}".lower()
+                if term.lower() not in haystack:
+                    return False
+        return True
+
+    def list_messages(self, params: dict) -> dict:
+        label_ids = params.get('labelIds', [])
+        query = params.get('q', [''])[0]
+        max_results = min(int(params.get('maxResults', ['100'])[0]), 500)
+        offset = int(params.get('pageToken', ['0'])[0])
+
+        matches = [
+            m for m in self.mailbox.messages
+            if all(label in m.label_ids for label in label_ids) and self._matches_query(m, query)
+        ]
+        page = matches[offset:offset + max_results]
+        result = {
+            'messages': [{'id': m.id, 'threadId': m.thread_id} for m in page],
+            'resultSizeEstimate': len(matches)
+        }
+        if not page:
+            del result['messages']
+        if offset + max_results < len(matches):
+            result['nextPageToken'] = str(offset + max_results)
+        return result
+
+    def store_raw(self, raw: bytes, label_ids) -> SyntheticMessage:
+        """Add an RFC 822 message (sent, drafted or imported) to the mailbox"""
+        parsed = email.message_from_bytes(raw, policy=policy.default)
+        body = parsed.get_body(preferencelist=('plain', 'html'))
+        message = SyntheticMessage(
+            id=self._new_id(),
+            thread_id=None,
+            label_ids=list(label_ids),
+            internal_date=int(time.time() * 1000),
+            sender=str(parsed.get('From', 'me@example.com')),
+            to=str(parsed.get('To', '')),
+            subject=str(parsed.get('Subject', '')),
+            text=body.get_content() if body else ''
+        )
+        message.thread_id = message.id
+        self.mailbox.add(message)
+        return message
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Keep-alive connections otherwise stall ~40 ms per response on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _read_body(self) -> bytes:
+                length = int(self.headers.get('Content-Length') or 0)
+                return self.rfile.read(length) if length else b''
+
+            def _send_json(self, status: int, body: dict, operation: str):
+                data = json.dumps(body).encode() if status != 204 else b''
+                with server._lock:
+                    server.bytes_sent[operation] += len(data)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _error(self, status: int, message: str, operation: str):
+                self._send_json(status, {'error': {'code': status, 'message': message}}, operation)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_PUT(self):
+                self._dispatch('PUT')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+            def _dispatch(self, method: str):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                body = self._read_body()
+
+                gemini = _GEMINI_PATH.match(url.path)
+                operation = 'gemini.generateContent' if gemini else gmail_operation(method, self.path)
+                with server._lock:
+                    server.request_counts[operation] += 1
+
+                server._delay(server.gemini_latency_ms if gemini else server.latency_ms)
+                if server._should_fail():
+                    self._error(503, "Injected backend error", operation)
+                    return
+
+                try:
+                    if gemini:
+                        self._send_json(200, self._generate_content(body), operation)
+                    else:
+                        status, result = self._gmail(method, url.path, params, body, operation)
+                        self._send_json(status, result, operation)
+                except Exception as e:
+                    self._error(500, str(e), operation)
+
+            def _generate_content(self, body: bytes) -> dict:
+                request = json.loads(body or b'{}')
+                prompt = request.get('contents', [{}])[0].get('parts', [{}])[0].get('text', '')
+                words = prompt.split()
+                text = "Summary: " + " ".join(words[-12:]) if words else "Summary."
+                return {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 'STOP'}]}
+
+            def _gmail(self, method, path, params, body, operation):
+                mailbox = server.mailbox
+                segments = [s for s in re.sub(r'^(/upload)?/gmail/v1/users/[^/]+/?', '', path).split('/') if s]
+
+                if operation == 'getProfile':
+                    return 200, {'emailAddress': 'me@example.com', 'messagesTotal': len(mailbox.messages)}
+                if operation == 'labels.list':
+                    return 200, {'labels': mailbox.labels}
+                if operation == 'labels.create':
+                    request = json.loads(body or b'{}')
+                    label = {'id': f"Label_{len(mailbox.labels) + 1}", 'name': request.get('name', ''), 'type': 'user'}
+                    mailbox.labels.append(label)
+                    return 200, label
+                if operation == 'messages.list':
+                    return 200, server.list_messages(params)
+                if operation == 'messages.get':
+                    message = mailbox.by_id.get(segments[1])
+                    if not message:
+                        return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+                    return 200, message.resource(params.get('format', ['full'])[0], params.get('metadataHeaders'))
+                if operation == 'messages.attachments.get':
+                    message = mailbox.by_id.get(segments[1])
+                    if not message or not message.attachment:
+                        return 404, {'error': {'code': 404, 'message': 'Attachment not found.'}}
+                    data = message.attachment[1]
+                    return 200, {'size': len(data), 'data': base64.urlsafe_b64encode(data).decode()}
+                if operation == 'messages.modify':
+                    message = mailbox.by_id.get(segments[1])
+                    if not message:
+                        return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+                    self._modify(message, json.loads(body or b'{}'))
+                    return 200, message.resource('minimal')
+                if operation == 'messages.batchModify':
+                    request = json.loads(body or b'{}')
+                    for message_id in request.get('ids', []):
+                        if message_id in mailbox.by_id:
+                            self._modify(mailbox.by_id[message_id], request)
+                    return 204, {}
+                if operation in ('messages.send', 'drafts.create', 'messages.import', 'messages.insert'):
+                    raw = self._extract_raw(body, operation)
+                    labels = {'messages.send': ['SENT'], 'drafts.create': ['DRAFT']}.get(operation, ['INBOX'])
+                    message = server.store_raw(raw, labels)
+                    if operation == 'drafts.create':
+                        return 200, {'id': f"r{message.id}", 'message': message.resource('minimal')}
+                    return 200, message.resource('minimal')
+                return 404, {'error': {'code': 404, 'message': f"Not implemented: {operation}"}}
+
+            def _modify(self, message, request):
+                for label in request.get('addLabelIds', []):
+                    if label not in message.label_ids:
+                        message.label_ids.append(label)
+                for label in request.get('removeLabelIds', []):
+                    if label in message.label_ids:
+                        message.label_ids.remove(label)
+
+            def _extract_raw(self, body: bytes, operation: str) -> bytes:
+                content_type = self.headers.get('Content-Type', '')
+                if content_type.startswith('application/json') or not content_type:
+                    request = json.loads(body or b'{}')
+                    raw = request.get('raw') or request.get('message', {}).get('raw', '')
+                    return base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4))
+                if content_type.startswith('multipart/related'):
+                    # Media upload: metadata part followed by the message/rfc822 part
+                    boundary = content_type.split('boundary=')[1].strip('"').encode()
+                    parts = [p for p in body.split(b'--' + boundary) if p.strip() not in (b'', b'--')]
+                    return parts[-1].split(b'\r\n\r\n', 1)[1].rsplit(b'\r\n', 1)[0]
+                return body
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Gmail + Gemini server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--messages", type=int, default=500, help="Synthetic mailbox size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    args = parser.parse_args()
+
+    server = FakeGoogleServer(
+        generate_mailbox(args.messages, args.seed),
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        gemini_latency_ms=args.gemini_latency_ms,
+        seed=args.seed
+    )
+    print(f"Fake Gmail/Gemini server on {server.url} ({len(server.mailbox.messages)} messages)")
+    print(f"Use GMAIL_API_ENDPOINT={server.url} GEMINI_API_ENDPOINT={server.url.rstrip('/')}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""CPU and memory cost of decoding message bodies: format='full' vs format='raw'
+
+Builds large multipart messages (text, HTML and inline images), renders
+each as the JSON response Gmail returns for both formats, and times the
+body decode paths the app uses on them: ``EmailRecord.from_message`` (the
+analysis path) and ``EmailViewer._get_email_body`` (summaries and Show
+Body). Peak memory is measured with tracemalloc. Network transfer is not
+included; the response sizes are printed alongside.
+
+    python -m benchmarks.parse_benchmark --messages 50 --size-kb 512 --inline-parts 8
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from email.message import EmailMessage
+
+from .corpus import WORDS, b64url
+
+def build_message(size_kb: int, inline_parts: int, rng: random.Random) -> EmailMessage:
+    """A multipart/mixed message with a text/HTML alternative and inline images"""
+    words, length = [], 0
+    while length < size_kb * 1024:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    text = '\n'.join(' '.join(words[i:i + 12]) for i in range(0, len(words), 12))
+
+    message = EmailMessage()
+    message['From'] = 'Alice Example <alice@example.com>'
+    message['To'] = 'bob@example.com'
+    message['Subject'] = 'Quarterly report with figures'
+    message['Date'] = 'Mon, 05 Oct 2026 09:30:00 +0000'
+    message.set_content(text)
+    message.add_alternative(f"<html><body><p>{text}</p><p>{text}</p></body></html>", subtype='html')
+    for number in range(inline_parts):
+        message.add_attachment(rng.randbytes(20 * 1024), maintype='image', subtype='png',
+                               filename=f"figure{number}.png", disposition='inline')
+    return message
+
+def full_payload(part: EmailMessage, part_id: str = '') -> dict:
+    """Render a part the way format='full' does: a tree with base64url bodies"""
+    payload = {
+        'partId': part_id,
+        'mimeType': part.get_content_type(),
+        'filename': part.get_filename() or '',
+        'headers': [{'name': name, 'value': str(value)} for name, value in part.items()],
+    }
+    if part.is_multipart():
+        payload['body'] = {'size': 0}
+        payload['parts'] = [full_payload(child, f"{part_id}.{i}".lstrip('.'))
+                            for i, child in enumerate(part.iter_parts())]
+    else:
+        data = part.get_payload(decode=True)
+        payload['body'] = {'size': len(data), 'data': b64url(data)}
+    return payload
+
+def responses(message: EmailMessage, message_id: str):
+    """The messages.get response bodies for format='full' and format='raw'"""
+    base = {'id': message_id, 'threadId': message_id, 'labelIds': ['INBOX'],
+            'snippet': '', 'internalDate': '0', 'historyId': '1'}
+    full = json.dumps(dict(base, payload=full_payload(message)))
+    raw = json.dumps(dict(base, raw=b64url(message.as_bytes())))
+    return full, raw
+
+def measure(decode, bodies, iterations: int):
+    """CPU ms per message and peak traced memory of one decode"""
+    start = time.process_time()
+    for _ in range(iterations):
+        for body in bodies:
+            decode(body)
+    cpu_ms = (time.process_time() - start) * 1000 / (iterations * len(bodies))
+
+    tracemalloc.start()
+    decode(bodies[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu_ms, peak
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare format='full' and format='raw' body decoding")
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--size-kb", type=int, default=512, help="Size of each message's text part")
+    parser.add_argument("--inline-parts", type=int, default=8, help="20 KB inline images per message")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from components.email_viewer import EmailViewer
+    from tools.records import EmailRecord
+
+    rng = random.Random(args.seed)
+    rendered = [responses(build_message(args.size_kb, args.inline_parts, rng), f"m{i}") for i in range(args.messages)]
+    viewer = EmailViewer(None)
+
+    cases = [
+        ("analyze (EmailRecord)", lambda body: EmailRecord.from_message(json.loads(body), full=True).body),
+        ("viewer body (_get_email_body)", lambda body: viewer._get_email_body(json.loads(body))),
+    ]
+    print(f"{args.messages} messages: {args.size_kb} KB text + HTML alternative + {args.inline_parts} inline images\n")
+    print(f"{'path':<32} {'format':<6} {'response KB':>12} {'CPU ms/msg':>11} {'peak KB':>9} {'text KB':>8}")
+    for name, decode in cases:
+        for format, index in (('full', 0), ('raw', 1)):
+            bodies = [pair[index] for pair in rendered]
+            cpu_ms, peak = measure(decode, bodies, args.iterations)
+            size_kb = sum(len(body) for body in bodies) / len(bodies) / 1024
+            # How much body text the path found (0 means it missed the text part)
+            text_kb = len(decode(bodies[0])) / 1024
+            print(f"{name:<32} {format:<6} {size_kb:>12.0f} {cpu_ms:>11.2f} {peak / 1024:>9.0f} {text_kb:>8.0f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Offline performance regression checks from recorded cassettes
+
+Record once (against the local fake server, or a real account with --live):
+
+    python -m benchmarks.replay record --cassette benchmarks/cassettes/default.json
+
+Then check in CI, without network or credentials:
+
+    python -m benchmarks.replay check --cassette benchmarks/cassettes/default.json --latency-ms 20
+
+``check`` replays every benchmark case and fails if a request wasn't
+recorded, a case returns an error, or a case's first (cold) call makes a
+different number of requests of any kind than its budget in
+``benchmarks/budgets.json``. Fewer requests fail too, so an improvement
+is locked in by re-recording with ``--update-budgets``. Budgets are written
+by ``record`` when the file does not exist yet (or with ``--update-budgets``)
+and reviewed like code from then on.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from .cassette import CassetteMiss, use_cassette
+from .run_benchmarks import (build_cases, case_params, configure_endpoints, make_account_manager,
+                             percentile, run_case)
+
+DEFAULT_CASSETTE = os.path.join(os.path.dirname(__file__), "cassettes", "default.json")
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(__file__), "budgets.json")
+
+def _workdir() -> str:
+    """A fresh directory for the run's accounts file and runtime data
+
+    Stores left by earlier runs (saved summaries and bodies) would let
+    cases skip requests, so each run starts from empty ones.
+    """
+    workdir = tempfile.mkdtemp(prefix="gmail-ai-bench-")
+    os.environ["GMAIL_AI_DATA_DIR"] = workdir
+    return workdir
+
+def _live_setup(accounts_file: str):
+    """Use the active real account; pick benchmark targets from its inbox"""
+    from datetime import datetime, timedelta
+    from components.account_manager import AccountManager
+    from tools import ToolSession
+
+    account_manager = AccountManager(accounts_file)
+    account = account_manager.get_active_account()
+    if not account or not account.token_pickle:
+        raise SystemExit("No authenticated account selected in the app")
+
+    recent = ToolSession(account)['email_analyzer'].recent_records(1)
+    if not recent:
+        raise SystemExit("The active account has no messages to benchmark")
+    params = {
+        'sample_id': recent[0].id,
+        'sender': recent[0].sender.split('<')[-1].rstrip('>'),
+        'date': (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    }
+    return account_manager, params
+
+def record(args) -> int:
+    server = None
+    workdir = _workdir()
+    if args.live:
+        account_manager, params = _live_setup(os.path.abspath(args.accounts_file))
+    else:
+        from .corpus import generate_mailbox
+        from .fake_server import FakeGoogleServer
+
+        mailbox = generate_mailbox(args.messages, args.seed)
+        server = FakeGoogleServer(mailbox, seed=args.seed).start()
+        configure_endpoints(server.url)
+        account_manager = make_account_manager(os.path.join(workdir, "accounts.json"))
+        params = case_params(mailbox)
+
+    budgets = {}
+    try:
+        with use_cassette(args.cassette, mode="record") as cassette:
+            cassette.metadata = {'params': params, 'live': args.live}
+            for name, fn in build_cases(account_manager, params):
+                # A single call per case keeps the cassette in call order
+                _, per_call = run_case(cassette, fn, iterations=1, warmup=0)
+                budgets[name] = dict(sorted(per_call.items()))
+                print(f"{name:<32} {sum(per_call.values()):>4g} requests")
+    finally:
+        if server:
+            server.stop()
+
+    print(f"\nRecorded {len(cassette.interactions)} exchanges to {args.cassette}")
+    if args.update_budgets or not os.path.exists(args.budgets):
+        with open(args.budgets, "w") as f:
+            json.dump(budgets, f, indent=2)
+            f.write("\n")
+        print(f"Wrote request budgets to {args.budgets}")
+    return 0
+
+def _is_error(result) -> bool:
+    """Tools report failures, including cassette misses, as "Error ..." strings"""
+    return isinstance(result, str) and result.strip().startswith("Error")
+
+def _budget_status(per_call, budget) -> str:
+    """'ok', or how the request counts differ from the budget"""
+    if not sum(per_call.values()):
+        return "NO REQUESTS"
+    diffs = [
+        f"{op}={per_call.get(op, 0):g}{'>' if per_call.get(op, 0) > budget.get(op, 0) else '<'}{budget.get(op, 0)}"
+        for op in sorted(set(per_call) | set(budget))
+        if per_call.get(op, 0) != budget.get(op, 0)
+    ]
+    return "ok" if not diffs else "MISMATCH " + ", ".join(diffs)
+
+def check(args) -> int:
+    with open(args.budgets, "r") as f:
+        budgets = json.load(f)
+
+    failures = []
+    with use_cassette(args.cassette, mode="replay", latency_ms=args.latency_ms) as cassette:
+        account_manager = make_account_manager(os.path.join(_workdir(), "accounts.json"))
+        print(f"{'benchmark':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/call':>9}  budget")
+        for name, fn in build_cases(account_manager, cassette.metadata['params']):
+            results = []
+            call = lambda: results.append(fn())
+            try:
+                # Counts come from one cold call, like the recording; later calls hit caches
+                _, per_call = run_case(cassette, call, iterations=1, warmup=0)
+                misses = list(cassette.misses)
+                latencies, _ = run_case(cassette, call, args.iterations, warmup=0)
+                misses += cassette.misses
+            except CassetteMiss as e:
+                misses = [str(e)]
+            if misses:
+                failures.append(f"{name}: {misses[0]} (re-record the cassette)")
+                continue
+            errors = [result for result in results if _is_error(result)]
+            if errors:
+                failures.append(f"{name}: {errors[0].strip()[:200]}")
+                continue
+
+            budget = budgets.get(name)
+            status = "NO BUDGET" if budget is None else _budget_status(per_call, budget)
+            if status != "ok":
+                failures.append(f"{name}: {status}")
+            print(f"{name:<32} {percentile(latencies, 50):>9.1f} {percentile(latencies, 95):>9.1f} "
+                  f"{percentile(latencies, 99):>9.1f} {sum(per_call.values()):>9.1f}  {status}")
+
+    if failures:
+        print("\nRequest budget check failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nAll request budgets met")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and replay Gmail AI benchmark traffic")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Record a cassette and request budgets")
+    record_parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    record_parser.add_argument("--budgets", default=DEFAULT_BUDGETS)
+    record_parser.add_argument("--update-budgets", action="store_true", help="Overwrite existing budgets")
+    record_parser.add_argument("--live", action="store_true", help="Record the active account instead of the fake server")
+    record_parser.add_argument("--accounts-file", default="gmail_accounts.json")
+    record_parser.add_argument("--messages", type=int, default=500, help="Fake server mailbox size")
+    record_parser.add_argument("--seed", type=int, default=42)
+
+    check_parser = subparsers.add_parser("check", help="Replay a cassette and enforce request budgets")
+    check_parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    check_parser.add_argument("--budgets", default=DEFAULT_BUDGETS)
+    check_parser.add_argument("--iterations", type=int, default=5)
+    check_parser.add_argument("--latency-ms", type=float, default=0.0,
+                              help="Simulated latency per request; -1 replays the recorded latencies")
+
+    args = parser.parse_args(argv)
+    if args.command == "check" and args.latency_ms < 0:
+        args.latency_ms = None
+    return record(args) if args.command == "record" else check(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""End-to-end latency benchmarks against the local fake Gmail + Gemini server
+
+Runs the real tools and views (EmailViewer, EmailFinder, LabelManager,
+EmailAnalyzer, GmailMCP) against ``benchmarks.fake_server`` and reports
+p50/p95/p99 latency plus the number of API requests each call made.
+
+    python -m benchmarks.run_benchmarks --messages 2000 --latency-ms 40 --iterations 20
+"""
+import argparse
+import math
+import os
+import pickle
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from .corpus import generate_mailbox
+from .fake_server import FakeGoogleServer
+
+def percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def configure_endpoints(server_url: str, quota_units: float = None):
+    """Point the Gmail and Gemini clients at the fake server
+
+    The environment covers modules imported later (and subprocesses); the
+    shared pool, Gemini root and scheduler are already loaded, so they are
+    updated in place.
+    """
+    from tools import gemini_client
+    from tools.quota import quota_scheduler
+    from tools.service_pool import service_pool
+
+    os.environ["GMAIL_API_ENDPOINT"] = server_url
+    os.environ["GEMINI_API_ENDPOINT"] = server_url.rstrip("/")
+    service_pool.api_endpoint = server_url
+    service_pool.clear()
+    gemini_client.GEMINI_API_ROOT = server_url.rstrip("/")
+
+    if quota_units is not None:
+        quota_scheduler.units_per_second = quota_units
+        quota_scheduler.capacity = quota_units
+
+def make_account_manager(accounts_file: str):
+    """Create an AccountManager with one authenticated account for the fake server"""
+    from google.auth.credentials import AnonymousCredentials
+    from components.account_manager import AccountManager, GmailAccount
+
+    manager = AccountManager(accounts_file)
+    manager.accounts = [GmailAccount(
+        name="benchmark",
+        client_id="benchmark-client",
+        client_secret="benchmark-secret",
+        auth_uri="http://localhost/auth",
+        token_uri="http://localhost/token",
+        redirect_uris=["http://localhost"],
+        is_active=True,
+        token_pickle=pickle.dumps(AnonymousCredentials()).hex(),
+        gemini_api_key="benchmark-key"
+    )]
+    return manager
+
+def case_params(mailbox) -> dict:
+    """Pick the message, sender and day the benchmarks operate on"""
+    return {
+        'sample_id': mailbox.messages[0].id,
+        'sender': mailbox.messages[0].sender.split('<')[-1].rstrip('>'),
+        'date': (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    }
+
+def build_cases(account_manager, params: dict):
+    """Return (name, callable) pairs for every benchmarked operation"""
+    from components.email_viewer import EmailViewer
+    from gmail_mcp import GmailMCP
+    from tools import ToolSession
+    from tools.gemini_client import GeminiClient
+
+    account = account_manager.get_active_account()
+    session = ToolSession(account)
+    viewer = EmailViewer(account_manager)
+    mcp = GmailMCP()
+    mcp.api_key = account.gemini_api_key
+    mcp.api_url = GeminiClient(account.gemini_api_key, 'gemini-2.0-flash').api_url
+
+    sample_id = params['sample_id']
+    sender = params['sender']
+    date_str = params['date']
+
+    return [
+        ("viewer.get_recent_emails(10)", lambda: viewer.get_recent_emails(10)),
+        ("viewer.get_emails_by_date", lambda: viewer.get_emails_by_date(date_str, use_cache=False)),
+        ("finder.find_emails(from, 5)", lambda: session['email_finder'].find_emails(f"from:{sender}", 5)),
+        ("finder.find_emails(words, 20)", lambda: session['email_finder'].find_emails("project update", 20)),
+        ("labels.list_labels", lambda: session['label_manager'].list_labels()),
+        ("labels.add_label_to_email", lambda: session['label_manager'].add_label_to_email("Work", sample_id)),
+        ("analyzer.analyze_email", lambda: session['email_analyzer'].analyze_email(sample_id)),
+        ("mcp._call_gemini_api", lambda: mcp._call_gemini_api("Summarize: quarterly budget review meeting")),
+    ]
+
+def run_case(server, fn, iterations: int, warmup: int = 1):
+    """Time ``fn`` and count the API requests made per call
+
+    ``server`` is anything counting requests (the fake server or a cassette).
+    """
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    server.reset_counts()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    counts = server.snapshot_counts()
+    per_call = Counter({op: count / iterations for op, count in counts.items()})
+    return latencies, per_call
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Gmail AI against a local fake Gmail + Gemini server")
+    parser.add_argument("--messages", type=int, default=500, help="Synthetic mailbox size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Added latency per Gmail request")
+    parser.add_argument("--gemini-latency-ms", type=float, default=None, help="Added latency per Gemini request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--quota-units", type=float, default=None,
+                        help="Gmail quota units per second (defaults to GMAIL_QUOTA_UNITS_PER_SEC)")
+    parser.add_argument("--only", action="append", default=[], help="Run only benchmarks containing this text")
+    args = parser.parse_args(argv)
+
+    mailbox = generate_mailbox(args.messages, args.seed)
+    server = FakeGoogleServer(
+        mailbox,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        gemini_latency_ms=args.gemini_latency_ms,
+        seed=args.seed
+    ).start()
+
+    configure_endpoints(server.url, args.quota_units)
+
+    workdir = tempfile.mkdtemp(prefix="gmail-ai-bench-")
+    os.chdir(workdir)
+    try:
+        account_manager = make_account_manager(os.path.join(workdir, "gmail_accounts.json"))
+        cases = build_cases(account_manager, case_params(mailbox))
+        if args.only:
+            cases = [(name, fn) for name, fn in cases if any(text in name for text in args.only)]
+
+        print(f"Fake server {server.url}: {len(mailbox.messages)} messages, "
+              f"{args.latency_ms:.0f}ms latency, {args.error_rate:.0%} errors, {args.iterations} iterations\n")
+        print(f"{'benchmark':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/call':>9}  requests by method")
+        for name, fn in cases:
+            latencies, per_call = run_case(server, fn, args.iterations)
+            by_method = ", ".join(f"{op}={count:g}" for op, count in per_call.most_common())
+            print(f"{name:<32} {percentile(latencies, 50):>9.1f} {percentile(latencies, 95):>9.1f} "
+                  f"{percentile(latencies, 99):>9.1f} {sum(per_call.values()):>9.1f}  {by_method}")
+    finally:
+        server.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
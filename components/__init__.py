@@ -1,5 +1,6 @@
 from .email_viewer import EmailViewer
 from .date_email_viewer import DateEmailViewer
 from .calendar_widget import CalendarWidget
+from .prefetcher import DatePrefetcher
 
-__all__ = ['EmailViewer', 'DateEmailViewer', 'CalendarWidget'] 
\ No newline at end of file
+__all__ = ['EmailViewer', 'DateEmailViewer', 'CalendarWidget', 'DatePrefetcher'] 
\ No newline at end of file
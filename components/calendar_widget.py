@@ -1,83 +1,170 @@
 import gradio as gr
 from datetime import datetime, timedelta
 import calendar
+import pickle
+from tools.service_pool import get_gmail_service
+from tools import metrics
+
+# Heatmap filters and the label each one counts (None = all mail)
+HEATMAP_FILTERS = {
+    "All mail": None,
+    "Unread": "UNREAD",
+    "Important": "IMPORTANT",
+    "Starred": "STARRED"
+}
 
 class CalendarWidget:
-    def __init__(self):
-        self.current_date = datetime.now()
+    """Month heatmap of per-day message counts
+
+    The displayed month belongs to each browser session: it is kept in a
+    ``gr.State`` as ``(year, month)`` (``None`` until navigated, meaning the
+    current month) and passed to every handler.
+    """
+    
+    def __init__(self, day_index=None, account_manager=None):
+        self.day_index = day_index
+        self.account_manager = account_manager
+    
+    def _month(self, shown):
+        """The (year, month) a session shows"""
+        if shown:
+            return tuple(shown)
+        today = datetime.now()
+        return today.year, today.month
+    
+    def month_title(self, shown=None) -> str:
+        year, month = self._month(shown)
+        return f"{calendar.month_name[month]} {year}"
     
-    def update_month(self, direction):
-        """Update current month (1 for next, -1 for previous)"""
-        year = self.current_date.year
-        month = self.current_date.month
+    def update_month(self, shown, direction):
+        """Move a session's month (1 for next, -1 for previous); returns the new month and its title"""
+        year, month = self._month(shown)
+        month += direction
+        if month > 12:
+            month = 1
+            year += 1
+        elif month < 1:
+            month = 12
+            year -= 1
+        return (year, month), self.month_title((year, month))
+    
+    def navigate(self, shown, direction, heatmap_filter="All mail"):
+        """Month navigation: the session's new month, its title and its heatmap"""
+        shown, title = self.update_month(shown, direction)
+        return shown, title, self.render_heatmap(shown, heatmap_filter)
+    
+    def _active_account_name(self):
+        if not self.account_manager:
+            return None
+        active_account = self.account_manager.get_active_account()
+        return active_account.name if active_account else None
+    
+    def render_heatmap(self, shown=None, heatmap_filter="All mail"):
+        """Render a month as a heatmap of per-day message counts"""
+        account_name = self._active_account_name()
+        if not self.day_index or not account_name:
+            return "<p>Select an account to see where your mail is.</p>"
+        
+        year, month = self._month(shown)
+        # One lookup for the whole month
+        counts = self.day_index.month_counts(account_name, year, month, HEATMAP_FILTERS.get(heatmap_filter))
+        busiest = max(counts.values(), default=0)
         
-        if direction == 1:
-            month += 1
-            if month > 12:
-                month = 1
-                year += 1
-        else:
-            month -= 1
-            if month < 1:
-                month = 12
-                year -= 1
+        cells = []
+        for week in calendar.Calendar(firstweekday=6).monthdayscalendar(year, month):
+            row = []
+            for day in week:
+                if day == 0:
+                    row.append('<td style="padding: 6px;"></td>')
+                    continue
+                
+                count = counts.get(day)
+                if count is None:
+                    # Not indexed yet
+                    style = "background-color: #2d2d2d; color: #6b7280;"
+                    label = "–"
+                else:
+                    intensity = count / busiest if busiest else 0
+                    style = f"background-color: rgba(37, 99, 235, {0.1 + 0.9 * intensity:.2f}); color: #e0e0e0;"
+                    label = str(count)
+                
+                row.append(f"""
+                <td title="{year}-{month:02d}-{day:02d}: {label}" style="padding: 6px; text-align: center; border-radius: 4px; {style}">
+                    <div style="font-weight: 600;">{day}</div>
+                    <div style="font-size: 12px;">{label}</div>
+                </td>""")
+            cells.append(f"<tr>{''.join(row)}</tr>")
         
-        self.current_date = self.current_date.replace(year=year, month=month)
-        month_name = f"{calendar.month_name[self.current_date.month]} {self.current_date.year}"
-        return month_name
+        weekdays = "".join(f'<th style="color: #9ca3af;">{day}</th>' for day in ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"])
+        return f"""
+        <table style="width: 100%; border-collapse: separate; border-spacing: 4px;">
+            <tr>{weekdays}</tr>
+            {''.join(cells)}
+        </table>
+        """
     
-    def handle_date_click(self, day):
-        """Handle date button click"""
-        if day and day.strip():
-            date_str = f"{self.current_date.year}-{self.current_date.month:02d}-{int(day):02d}"
-            return date_str
-        return None
+    def scan_current_month(self, shown=None, heatmap_filter="All mail"):
+        """Index the displayed month with ID-only list scans and re-render the heatmap"""
+        try:
+            active_account = self.account_manager.get_active_account() if self.account_manager else None
+            if not self.day_index or not active_account or not active_account.token_pickle:
+                return "<p>Please select and authenticate an account first.</p>"
+            
+            metrics.set_account(active_account.name)
+            credentials = pickle.loads(bytes.fromhex(active_account.token_pickle))
+            service = get_gmail_service(credentials)
+            
+            labels = [label for label in HEATMAP_FILTERS.values() if label]
+            year, month = self._month(shown)
+            self.day_index.scan_month(service, active_account.name, year, month, labels)
+            return self.render_heatmap(shown, heatmap_filter)
+        except Exception as e:
+            return f"Error scanning month: {str(e)}"
     
     def create_interface(self):
         """Create the calendar interface"""
         with gr.Column() as calendar_widget:
+            shown_month = gr.State(None)
+            
             # Month and Year Selection
             with gr.Row():
                 prev_month = gr.Button("◀", size="sm")
-                month_display = gr.Markdown(f"{calendar.month_name[self.current_date.month]} {self.current_date.year}")
+                # Callable values are computed on each page load, not once at startup
+                month_display = gr.Markdown(self.month_title)
                 next_month = gr.Button("▶", size="sm")
             
-            # Weekday Headers
+            # Message count heatmap
             with gr.Row():
-                for day in ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]:
-                    gr.Markdown(f"**{day}**")
-            
-            # Calendar Grid
-            cal = calendar.monthcalendar(self.current_date.year, self.current_date.month)
-            
-            # Hidden date storage
-            selected_date = gr.Textbox(visible=False)
-            
-            # Create date buttons
-            date_buttons = []
-            for week in cal:
-                with gr.Row():
-                    for day in week:
-                        if day == 0:
-                            btn = gr.Button(" ", visible=False)
-                        else:
-                            btn = gr.Button(str(day), size="sm")
-                            # Connect each date button to the date selection handler
-                            btn.click(
-                                fn=self.handle_date_click,
-                                inputs=[btn],
-                                outputs=[selected_date]
-                            )
-                        date_buttons.append(btn)
+                heatmap_filter = gr.Radio(
+                    choices=list(HEATMAP_FILTERS.keys()),
+                    value="All mail",
+                    label="Heatmap"
+                )
+                scan_btn = gr.Button("Scan Month", size="sm")
+            heatmap = gr.HTML(self.render_heatmap, inputs=[shown_month, heatmap_filter])
             
             # Handle month navigation
             prev_month.click(
-                fn=lambda: self.update_month(-1),
-                outputs=[month_display]
+                fn=lambda shown, f: self.navigate(shown, -1, f),
+                inputs=[shown_month, heatmap_filter],
+                outputs=[shown_month, month_display, heatmap]
             )
             next_month.click(
-                fn=lambda: self.update_month(1),
-                outputs=[month_display]
+                fn=lambda shown, f: self.navigate(shown, 1, f),
+                inputs=[shown_month, heatmap_filter],
+                outputs=[shown_month, month_display, heatmap]
             )
             
-        return calendar_widget, selected_date 
\ No newline at end of file
+            # Heatmap filter and scanning
+            heatmap_filter.change(
+                fn=self.render_heatmap,
+                inputs=[shown_month, heatmap_filter],
+                outputs=[heatmap]
+            )
+            scan_btn.click(
+                fn=self.scan_current_month,
+                inputs=[shown_month, heatmap_filter],
+                outputs=[heatmap]
+            )
+        
+        return calendar_widget
@@ -1,45 +1,53 @@
 import gradio as gr
 from tools import EmailFinder, EmailAnalyzer
-from datetime import datetime
+from tools.connectivity import is_network_error
+from tools.local_store import local_store, offline_notice
+from datetime import datetime, timedelta
 
 class DateEmailViewer:
-    def __init__(self):
+    def __init__(self, account=None):
         self.email_finder = EmailFinder()
         self.email_analyzer = EmailAnalyzer()
+        self.account_name = None
+        if account:
+            self.account_name = account.name
+            for tool in (self.email_finder, self.email_analyzer):
+                tool.set_credentials(account.client_id, account.client_secret, account.token_pickle or None,
+                                     account_name=account.name)
     
     def get_emails_by_date(self, date_str):
         """Fetch emails for a specific date"""
         try:
             # Convert date string to proper format for Gmail search
             selected_date = datetime.strptime(date_str, "%Y-%m-%d")
-            formatted_date = selected_date.strftime("%Y/%m/%d")
+            next_date = selected_date + timedelta(days=1)
             
-            # Use EmailFinder to get emails from specific date
-            search_query = f"after:{formatted_date} before:{formatted_date}+1d"
-            emails_response = self.email_finder.find_emails(search_query, 50)  # Increased count for daily emails
+            # Use EmailFinder to get emails from specific date (with bodies, fetched once)
+            search_query = f"after:{selected_date.strftime('%Y/%m/%d')} before:{next_date.strftime('%Y/%m/%d')}"
+            notice = ""
+            try:
+                records = self.email_finder.search(search_query, 50, full=True)  # Increased count for daily emails
+            except Exception as e:
+                if not is_network_error(e) or not self.account_name:
+                    raise
+                # Offline: the saved copy of that day
+                records = local_store.recent(self.account_name, None, 50, int(selected_date.timestamp() * 1000),
+                                             int(next_date.timestamp() * 1000))
+                notice = offline_notice(local_store.synced_at(self.account_name))
             
-            if "No emails found" in emails_response:
-                return "No emails found for this date."
-            
-            # Parse the response to get individual email details
-            email_sections = emails_response.split("\n\n")[1:]  # Skip the header
+            if not records:
+                return notice + "No emails found for this date."
             
             formatted_emails = []
-            for section in email_sections:
-                if not section.strip():
-                    continue
-                
-                # Extract email ID
-                email_id = section.split("ID: ")[1].split("\n")[0]
-                
-                # Get email summary using EmailAnalyzer
-                summary = self.email_analyzer.analyze_email(email_id)
+            for record in records:
+                # Analyze the already fetched email instead of fetching it again
+                summary = self.email_analyzer.format_analysis(record)
                 
                 # Combine original email info with summary
-                formatted_email = f"{section}\nSummary: {summary}\n{'='*50}"
+                formatted_email = f"{record.format_summary().strip()}\nSummary: {summary}\n{'='*50}"
                 formatted_emails.append(formatted_email)
             
-            return "\n\n".join(formatted_emails)
+            return notice + "\n\n".join(formatted_emails)
         except Exception as e:
             return f"Error fetching emails: {str(e)}"
     
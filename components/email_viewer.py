@@ -1,18 +1,67 @@
 import gradio as gr
-from googleapiclient.discovery import build
+import os
 from datetime import datetime, timedelta
 from google.oauth2.credentials import Credentials
 import pickle
 import base64
+import threading
+from collections import OrderedDict
 from bs4 import BeautifulSoup
-import google.generativeai as genai
+from tools.service_pool import get_gmail_service
+from tools.gemini_client import GeminiClient
+from tools.jobs import job_manager, JobCancelled
+from tools.quota import quota_scheduler
+from tools import metrics, tracing, triage
+from tools.connectivity import connectivity, is_network_error
+from tools.local_store import describe_age, local_store
+from tools.records import EmailRecord, iter_parts
+from tools.raw_message import BODY_FORMAT, RawMessage
 
 class EmailViewer:
+    # How long a rendered day view stays fresh (today's view changes as mail arrives)
+    DAY_CACHE_TTL = 3600
+    TODAY_CACHE_TTL = 120
+    # Gemini summaries per view, spent on the highest triage scores first (0 = no limit)
+    SUMMARY_BUDGET = int(os.getenv("GMAIL_AI_SUMMARY_BUDGET", "5"))
+    # Messages the triage model scores below this are never summarized
+    MIN_SUMMARY_SCORE = float(os.getenv("GMAIL_AI_MIN_SUMMARY_SCORE", "0"))
+    # Cards are rendered from these headers; bodies are fetched only when needed
+    CARD_HEADERS = ['From', 'Subject', 'Date']
+    # Decoded message bodies kept in memory (message IDs never change content)
+    BODY_CACHE_SIZE = int(os.getenv("GMAIL_AI_BODY_CACHE_SIZE", "500"))
+    
     def __init__(self, account_manager):
         self.account_manager = account_manager
+        # Service and model are per thread so concurrent sessions don't clobber each other
+        self._local = threading.local()
         self.service = None
         self.model = None
+        # Rendered day views keyed by (account name, YYYY-MM-DD)
+        self._day_cache = {}
+        self._day_cache_lock = threading.Lock()
+        # Callbacks run with the fetched messages after each inbox refresh
+        self._sync_listeners = []
+        # Decoded bodies keyed by (account name, message ID), least recently used first
+        self._bodies = OrderedDict()
+        self._bodies_lock = threading.Lock()
+    
+    @property
+    def service(self):
+        return getattr(self._local, 'service', None)
+    
+    @service.setter
+    def service(self, value):
+        self._local.service = value
+    
+    @property
+    def model(self):
+        return getattr(self._local, 'model', None)
+    
+    @model.setter
+    def model(self, value):
+        self._local.model = value
     
+    @tracing.traced('ensure_service')
     def _ensure_service(self):
         """Ensure we have an authenticated Gmail service"""
         # Get active account
@@ -26,25 +75,30 @@ class EmailViewer:
         if not active_account.token_pickle:
             raise ValueError("Account not authenticated. Please authenticate the account first.")
         
+        metrics.set_account(active_account.name)
         try:
             # Convert token pickle back to credentials
             credentials = pickle.loads(bytes.fromhex(active_account.token_pickle))
             
-            # Create new service with these credentials
-            self.service = build('gmail', 'v1', credentials=credentials)
+            # Get the thread-local service for these credentials
+            self.service = get_gmail_service(credentials)
             
-            # Configure Gemini with the account's API key
+            # Create a Gemini client with the account's API key
             if active_account.gemini_api_key:
-                genai.configure(api_key=active_account.gemini_api_key)
-                self.model = genai.GenerativeModel('gemini-2.0-flash-001')
+                self.model = GeminiClient(active_account.gemini_api_key, 'gemini-2.0-flash-001')
             else:
                 self.model = None
                 
         except Exception as e:
             raise ValueError(f"Error creating Gmail service: {str(e)}")
     
-    def _get_email_summary(self, body_text: str) -> str:
-        """Get a summary of the email content using Gemini"""
+    @tracing.traced('summarize')
+    def _get_email_summary(self, body_text: str, cache_key=None) -> str:
+        """Get a summary of the email content using Gemini
+        
+        With ``cache_key`` (account name, message ID) a generated summary is
+        saved locally, so the card can still show it offline.
+        """
         try:
             if not self.model:
                 return "Email summary not available. Please add a Gemini API key in Account Management."
@@ -61,21 +115,34 @@ class EmailViewer:
             prompt = f"Summarize this email content in 1-2 clear, informative sentences:\n\n{clean_text}"
             response = self.model.generate_content(prompt, generation_config={
                 'temperature': 0.3,
-                'top_p': 0.8,
-                'top_k': 40,
-                'max_output_tokens': 150
+                'topP': 0.8,
+                'topK': 40,
+                'maxOutputTokens': 150
             })
-            return response.text.strip()
+            summary = response.strip()
+            if cache_key:
+                local_store.put_summary(*cache_key, summary)
+            return summary
         except Exception as e:
             return f"Could not generate summary: {str(e)}"
     
+    @tracing.traced('decode_body')
     def _get_email_body(self, msg) -> str:
         """Extract email body text from the message"""
+        if 'raw' in msg:
+            raw = RawMessage.from_resource(msg)
+            part = raw.text_part('text/plain', 'text/html') if raw.is_multipart else raw
+            if part is None:
+                return ""
+            if part.content_type == 'text/html':
+                return BeautifulSoup(part.text(), 'html.parser').get_text()
+            return part.text()
+        
         if 'payload' not in msg:
             return ""
         
         if 'parts' in msg['payload']:
-            for part in msg['payload']['parts']:
+            for part in iter_parts(msg['payload']):
                 if part['mimeType'] == 'text/plain':
                     if 'data' in part['body']:
                         text = base64.urlsafe_b64decode(part['body']['data']).decode()
@@ -110,8 +177,156 @@ class EmailViewer:
             return check_parts(msg['payload']['parts'])
         elif 'body' in msg['payload'] and 'attachmentId' in msg['payload']['body']:
             return True
-            
-        return False
+        
+        # format='metadata' has no parts; multipart/mixed is how attachments are sent
+        return msg['payload'].get('mimeType') == 'multipart/mixed'
+    
+    def _fetch_card_message(self, message_id: str):
+        """Fetch just what a card shows: headers, labels and snippet"""
+        return self.service.users().messages().get(
+            userId='me',
+            id=message_id,
+            format='metadata',
+            metadataHeaders=self.CARD_HEADERS
+        ).execute()
+    
+    def _fetch_cards(self, account, view: str, saved, job=None, **list_params):
+        """Card messages for a view, from Gmail or, when it can't be reached, the local store
+        
+        ``saved`` returns the view's locally saved records. Live results are
+        written through to the store. Returns (messages, banner): the banner
+        is empty for live results and says how stale a saved copy is otherwise.
+        """
+        try:
+            self._ensure_service()
+            results = self.service.users().messages().list(userId='me', **list_params).execute()
+            messages = results.get('messages', [])
+            if job:
+                job.update(total=len(messages), fetched=0, summarized=0)
+            fetched = []
+            for message in messages:
+                if job:
+                    job.check_cancelled()
+                fetched.append(self._fetch_card_message(message['id']))
+                if job:
+                    job.increment('fetched')
+        except Exception as e:
+            if not is_network_error(e):
+                raise
+            fetched = [record.to_message() for record in saved()]
+            if job:
+                job.update(total=len(fetched), fetched=len(fetched), summarized=0)
+            return fetched, self._offline_banner(local_store.synced_at(account.name, view))
+        
+        records = []
+        for msg in fetched:
+            record = EmailRecord.from_message(msg)
+            record.has_attachments = self._has_attachments(msg)
+            records.append(record)
+        local_store.save(account.name, records, view)
+        return fetched, ''
+    
+    def _offline_banner(self, synced_at) -> str:
+        return f"""
+                <div style="padding: 12px 20px; background-color: #44403c; border: 1px solid #78716c; border-radius: 8px; margin: 10px 0 20px; color: #fafaf9; font-size: 14px;">
+                    <span style="color: #f59e0b; margin-right: 8px;">⚠️</span>
+                    <strong>Offline</strong>: showing saved emails ({describe_age(synced_at)}). Gmail will be checked again shortly.
+                </div>
+                """
+    
+    def get_body_text(self, account, message_id: str) -> str:
+        """Get a message's decoded body, fetching the full message on first use
+        
+        Fetched bodies are also saved locally; while Gmail is unreachable the
+        saved copy is used instead.
+        """
+        key = (account.name, message_id)
+        with self._bodies_lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+        metrics.record_cache('message_body', body is not None)
+        if body is not None:
+            return body
+        
+        try:
+            msg = self.service.users().messages().get(
+                userId='me',
+                id=message_id,
+                format=BODY_FORMAT
+            ).execute()
+        except Exception as e:
+            saved = local_store.get_record(account.name, message_id) if is_network_error(e) else None
+            if saved is None or saved.body is None:
+                raise
+            return saved.body
+        body = self._get_email_body(msg)
+        local_store.put_body(account.name, message_id, body)
+        with self._bodies_lock:
+            self._bodies[key] = body
+            while len(self._bodies) > self.BODY_CACHE_SIZE:
+                self._bodies.popitem(last=False)
+        return body
+    
+    @metrics.instrument_handler('show_body')
+    @tracing.traced('show_body')
+    def show_body(self, message_id: str) -> str:
+        """Body of one message for the expanded card view"""
+        message_id = (message_id or '').strip()
+        if not message_id:
+            return "Enter a message ID, or click Show Body on an email."
+        try:
+            self._ensure_service()
+            body = self.get_body_text(self.account_manager.get_active_account(), message_id)
+            return body.strip() or "This email has no text content."
+        except Exception as e:
+            if is_network_error(e):
+                return "Offline: this email's body isn't saved locally. It can be opened once Gmail is reachable again."
+            return f"Error fetching email body: {str(e)}"
+    
+    def add_sync_listener(self, listener):
+        """Register a callback run with the fetched messages after each inbox refresh
+        
+        Messages are ``format='metadata'`` responses (headers, labels, snippet).
+        """
+        self._sync_listeners.append(listener)
+    
+    def _notify_sync(self, messages):
+        """Invalidate today's view and notify sync listeners"""
+        self.invalidate_day(datetime.now().strftime("%Y-%m-%d"))
+        for listener in self._sync_listeners:
+            try:
+                listener(messages)
+            except Exception as e:
+                print(f"Error in sync listener: {str(e)}")
+    
+    def get_cached_day(self, date_str):
+        """Get the cached view for a date if it is still fresh"""
+        active_account = self.account_manager.get_active_account()
+        if not active_account:
+            return None
+        
+        with self._day_cache_lock:
+            entry = self._day_cache.get((active_account.name, date_str))
+        if not entry:
+            return None
+        
+        stored_at, html = entry
+        is_today = date_str == datetime.now().strftime("%Y-%m-%d")
+        ttl = self.TODAY_CACHE_TTL if is_today else self.DAY_CACHE_TTL
+        if datetime.now().timestamp() - stored_at > ttl:
+            return None
+        return html
+    
+    def _store_day(self, account, date_str, html):
+        with self._day_cache_lock:
+            self._day_cache[(account.name, date_str)] = (datetime.now().timestamp(), html)
+    
+    def invalidate_day(self, date_str):
+        """Drop the cached view for a date for every account"""
+        with self._day_cache_lock:
+            for key in [key for key in self._day_cache if key[1] == date_str]:
+                del self._day_cache[key]
     
     def get_past_10_days(self):
         """Get list of past 10 days in YYYY-MM-DD format"""
@@ -121,17 +336,72 @@ class EmailViewer:
             dates.append(date.strftime("%Y-%m-%d"))
         return dates
     
-    def _format_email_html(self, msg, message_id: str) -> str:
+    def _prioritize(self, account, messages):
+        """Order fetched messages by triage score and pick which ones get a summary
+        
+        Returns (message, score, summarize) tuples, highest score first. Without
+        a trained model the order is unchanged and scores are None.
+        """
+        records = [EmailRecord.from_message(msg) for msg in messages]
+        scores = triage.rank(account.name, records)
+        # Stable sort keeps Gmail's order for ties (and when there is no model)
+        order = sorted(range(len(messages)), key=lambda i: -(scores[i] or 0.0))
+        
+        prioritized = []
+        for position, i in enumerate(order):
+            within_budget = not self.SUMMARY_BUDGET or position < self.SUMMARY_BUDGET
+            worth_it = scores[i] is None or scores[i] >= self.MIN_SUMMARY_SCORE
+            prioritized.append((messages[i], scores[i], within_budget and worth_it))
+        return prioritized
+    
+    def _summary_text(self, account, msg, summarize: bool) -> str:
+        """Summarize a message, or fall back to its snippet when it isn't worth a Gemini call
+        
+        The body is only fetched when a summary will actually be generated.
+        """
+        if not summarize:
+            return f"(Low priority, not summarized) {msg.get('snippet', '')}"
+        saved = local_store.get_summary(account.name, msg['id'])
+        if saved:
+            return saved
+        if not self.model:
+            return self._get_email_summary("")
+        if connectivity.offline:
+            return f"(Offline, not summarized) {msg.get('snippet', '')}"
+        try:
+            body_text = self.get_body_text(account, msg['id'])
+        except Exception as e:
+            if not is_network_error(e):
+                raise
+            return f"(Offline, not summarized) {msg.get('snippet', '')}"
+        if not body_text:
+            return "No content to summarize"
+        return self._get_email_summary(body_text, cache_key=(account.name, msg['id']))
+    
+    def _show_body_button(self, message_id: str, css_class: str) -> str:
+        """Button that loads a message's body into the viewer's body panel"""
+        return f"""<button onclick="const input = document.querySelector('#body-message-id textarea'); input.value = '{message_id}'; input.dispatchEvent(new Event('input')); setTimeout(() => document.querySelector('#show-body-button').click(), 50);" class="{css_class}">
+                        <span class="tool-icon">📄</span>
+                        <span class="tool-text">Show Body</span>
+                    </button>"""
+    
+    def _priority_field(self, score) -> str:
+        if score is None:
+            return ""
+        return f"""
+                <div class="email-field">
+                    <span class="email-label">Priority:</span>
+                    <span class="email-value">{score:.0%}</span>
+                </div>"""
+    
+    def _format_email_html(self, msg, score, summary: str) -> str:
         """Format a single email as HTML"""
+        message_id = msg['id']
         headers = msg['payload']['headers']
         subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No Subject')
         sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown Sender')
         date = next((h['value'] for h in headers if h['name'].lower() == 'date'), 'Unknown Date')
         
-        # Get email body and generate summary
-        body_text = self._get_email_body(msg)
-        summary = self._get_email_summary(body_text) if body_text else "No content to summarize"
-        
         # Check for attachments
         has_attachments = self._has_attachments(msg)
         
@@ -158,7 +428,7 @@ class EmailViewer:
                     <span class="{'attachment-yes' if has_attachments else 'attachment-no'}">
                         {' Yes' if has_attachments else ' No'}
                     </span>
-                </div>
+                </div>{self._priority_field(score)}
             </div>
             <div class="tools-section">
                 <div class="tools-header">Tools & Actions</div>
@@ -171,6 +441,7 @@ class EmailViewer:
                         <span class="tool-icon">📋</span>
                         <span class="tool-text">Copy Message ID</span>
                     </button>
+                    {self._show_body_button(message_id, 'tool-button')}
                     {f'''
                     <a href="{gmail_link}/attachments" target="_blank" class="tool-button" style="background-color: #34d399;">
                         <span class="tool-icon">📎</span>
@@ -188,8 +459,100 @@ class EmailViewer:
         </div>
         """
     
-    def get_recent_emails(self, max_results=10):
-        """Get recent emails"""
+    def _format_day_card(self, msg, score, summary: str) -> str:
+        """Format a single email of a day view as HTML"""
+        headers = msg['payload']['headers']
+        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
+        sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown Sender')
+        date = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date')
+        has_attachments = self._has_attachments(msg)
+        gmail_link = f"https://mail.google.com/mail/u/0/#inbox/{msg['id']}"
+        
+        return f"""
+        <div class="email-container">
+            <div class="email-header">
+                <div class="email-field">
+                    <span class="email-label">From:</span>
+                    <span class="email-value">{sender}</span>
+                </div>
+                <div class="email-field">
+                    <span class="email-label">Subject:</span>
+                    <span class="email-value">{subject}</span>
+                </div>
+                <div class="email-field">
+                    <span class="email-label">Date:</span>
+                    <span class="email-value">{date}</span>
+                </div>
+                <div class="email-field">
+                    <span class="email-label">Attachments:</span>
+                    <span class="{'attachment-yes' if has_attachments else 'attachment-no'}">
+                        {' Yes' if has_attachments else ' No'}
+                    </span>
+                </div>{self._priority_field(score)}
+            </div>
+            <div class="action-buttons">
+                <a href="{gmail_link}" target="_blank" class="gmail-link">Open in Gmail</a>
+                <span class="copy-id" onclick="navigator.clipboard.writeText('{msg['id']}')">
+                    Copy Message ID
+                </span>
+                {self._show_body_button(msg['id'], 'copy-id')}
+            </div>
+            <div class="email-summary">
+                <div class="email-field">
+                    <span class="email-label">Summary:</span>
+                    <span class="email-value">{summary}</span>
+                </div>
+            </div>
+        </div>
+        """
+    
+    def _render_cards(self, account, messages, render, job=None) -> list:
+        """Render cards highest priority first, publishing them before any summary is made
+        
+        Each card is first shown with a saved summary or its snippet, so a
+        view needs nothing beyond the metadata fetch to appear. Summaries for
+        the cards within the budget are then generated in triage order and
+        replace those cards (in ``job``'s partial results too). When rendering
+        at idle priority (the prefetcher), each summary waits until no user
+        request is running, as background Gmail requests do. ``render`` is
+        called as ``render(msg, score, summary)``.
+        """
+        offset = len(job.partial_results()) if job else 0
+        cards = []
+        pending = []
+        for msg, score, summarize in self._prioritize(account, messages):
+            if job:
+                job.check_cancelled()
+            saved = local_store.get_summary(account.name, msg['id']) if summarize else None
+            if saved:
+                summary = saved
+            elif summarize and self.model and not connectivity.offline:
+                summary = f"(Summarizing...) {msg.get('snippet', '')}"
+                pending.append((len(cards), msg, score))
+            else:
+                # Nothing to fetch: low priority, no Gemini key or offline
+                summary = self._summary_text(account, msg, summarize)
+            cards.append(render(msg, score, summary))
+            if job:
+                job.add_result(cards[-1])
+        
+        for index, msg, score in pending:
+            if job:
+                job.check_cancelled()
+            if quota_scheduler.is_background:
+                quota_scheduler.wait_until_idle()
+            else:
+                quota_scheduler.note_interactive()
+            cards[index] = render(msg, score, self._summary_text(account, msg, True))
+            if job:
+                job.set_result(offset + index, cards[index])
+                job.increment('summarized')
+        return cards
+    
+    @metrics.instrument_handler('get_recent_emails')
+    @tracing.traced('get_recent_emails')
+    def get_recent_emails(self, max_results=10, job=None):
+        """Get recent emails, publishing progress to ``job`` when given"""
         try:
             # Check if we have any active account first
             active_account = self.account_manager.get_active_account()
@@ -206,19 +569,14 @@ class EmailViewer:
                 </div>
                 """
 
-            self._ensure_service()
-            
-            # Get messages
-            results = self.service.users().messages().list(
-                userId='me',
-                maxResults=max_results,
-                labelIds=['INBOX']
-            ).execute()
-            
-            messages = results.get('messages', [])
+            # Get card metadata (from the local store while offline)
+            fetched, banner = self._fetch_cards(
+                active_account, 'inbox', lambda: local_store.recent(active_account.name, 'INBOX', max_results),
+                job=job, maxResults=max_results, labelIds=['INBOX']
+            )
             
-            if not messages:
-                return "No emails found."
+            if not fetched:
+                return banner + "No emails found."
             
             # Add CSS styles for email formatting
             email_style = """
@@ -351,24 +709,26 @@ class EmailViewer:
                 </div>
                 """
             
-            # Get full message details and format output
-            email_details = [email_style]
-            for message in messages:
-                msg = self.service.users().messages().get(
-                    userId='me',
-                    id=message['id'],
-                    format='full'
-                ).execute()
-                
-                email_details.append(self._format_email_html(msg, message['id']))
+            # Format output
+            email_details = [email_style, banner]
+            if job:
+                job.add_result(email_style + banner)
+            
+            # Cards first, then summaries for the highest-priority mail
+            email_details.extend(self._render_cards(active_account, fetched, self._format_email_html, job))
             
+            if not banner:
+                self._notify_sync(fetched)
             return "\n".join(email_details)
             
+        except JobCancelled:
+            raise
         except Exception as e:
             return f"Error fetching emails: {str(e)}"
     
-    def get_emails_by_date(self, date_str):
-        """Get emails from a specific date"""
+    @tracing.traced('get_emails_by_date')
+    def get_emails_by_date(self, date_str, job=None, use_cache=True):
+        """Get emails from a specific date, publishing progress to ``job`` when given"""
         try:
             # Check if we have any active account first
             active_account = self.account_manager.get_active_account()
@@ -385,23 +745,30 @@ class EmailViewer:
                 </div>
                 """
 
-            self._ensure_service()
-            
+            # Serve prefetched/previously rendered views straight from the cache
+            if use_cache:
+                cached = self.get_cached_day(date_str)
+                metrics.record_cache('day_view', cached is not None)
+                if cached is not None:
+                    return cached
+
             # Create date range query
             date = datetime.strptime(date_str, "%Y-%m-%d")
             next_date = date + timedelta(days=1)
             query = f"after:{date.strftime('%Y/%m/%d')} before:{next_date.strftime('%Y/%m/%d')}"
             
-            # Get messages
-            results = self.service.users().messages().list(
-                userId='me',
-                q=query,
-                labelIds=['INBOX']
-            ).execute()
-            
-            messages = results.get('messages', [])
+            # Get card metadata (from the local store while offline)
+            fetched, banner = self._fetch_cards(
+                active_account, f"day:{date_str}",
+                lambda: local_store.recent(active_account.name, 'INBOX', 500,
+                                           int(date.timestamp() * 1000), int(next_date.timestamp() * 1000)),
+                job=job, q=query, labelIds=['INBOX']
+            )
             
-            if not messages:
+            if not fetched:
+                if banner:
+                    return banner + f"No saved emails for {date_str}"
+                self._store_day(active_account, date_str, f"No emails found for {date_str}")
                 return f"No emails found for {date_str}"
             
             # Add CSS styles for email formatting
@@ -499,72 +866,93 @@ class EmailViewer:
             </style>
             """
             
-            # Get full message details and format output
-            email_details = [email_style]
-            for message in messages:
-                msg = self.service.users().messages().get(
-                    userId='me',
-                    id=message['id'],
-                    format='full'
-                ).execute()
-                
-                headers = msg['payload']['headers']
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-                sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown Sender')
-                date = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date')
-                
-                # Get email body and generate summary
-                body_text = self._get_email_body(msg)
-                summary = self._get_email_summary(body_text) if body_text else "No content to summarize"
-                
-                # Check for attachments
-                has_attachments = self._has_attachments(msg)
-                
-                # Create Gmail link
-                gmail_link = f"https://mail.google.com/mail/u/0/#inbox/{message['id']}"
-                
-                email_details.append(f"""
-                <div class="email-container">
-                    <div class="email-header">
-                        <div class="email-field">
-                            <span class="email-label">From:</span>
-                            <span class="email-value">{sender}</span>
-                        </div>
-                        <div class="email-field">
-                            <span class="email-label">Subject:</span>
-                            <span class="email-value">{subject}</span>
-                        </div>
-                        <div class="email-field">
-                            <span class="email-label">Date:</span>
-                            <span class="email-value">{date}</span>
-                        </div>
-                        <div class="email-field">
-                            <span class="email-label">Attachments:</span>
-                            <span class="{'attachment-yes' if has_attachments else 'attachment-no'}">
-                                {' Yes' if has_attachments else ' No'}
-                            </span>
-                        </div>
-                    </div>
-                    <div class="action-buttons">
-                        <a href="{gmail_link}" target="_blank" class="gmail-link">Open in Gmail</a>
-                        <span class="copy-id" onclick="navigator.clipboard.writeText('{message['id']}')">
-                            Copy Message ID
-                        </span>
-                    </div>
-                    <div class="email-summary">
-                        <div class="email-field">
-                            <span class="email-label">Summary:</span>
-                            <span class="email-value">{summary}</span>
-                        </div>
-                    </div>
-                </div>
-                """)
+            # Format output
+            email_details = [email_style, banner]
+            if job:
+                job.add_result(email_style + banner)
             
-            return "\n".join(email_details)
+            # Cards first, then summaries for the highest-priority mail
+            email_details.extend(self._render_cards(active_account, fetched, self._format_day_card, job))
+            
+            html = "\n".join(email_details)
+            # Saved copies aren't cached, so the live view replaces them once back online
+            if not banner:
+                self._store_day(active_account, date_str, html)
+            return html
             
+        except JobCancelled:
+            raise
         except Exception as e:
             return f"Error fetching emails: {str(e)}"
     
+    def _label_metrics(self):
+        """Attribute metrics of this handler (and the jobs it starts) to the active account"""
+        active_account = self.account_manager.get_active_account()
+        metrics.set_account(active_account.name if active_account else None)
+    
+    def _render_job(self, job, title: str) -> str:
+        """Render a running or finished email job as HTML"""
+        if job.status == 'done':
+            return job.result
+        if job.status == 'failed':
+            return f"Error fetching emails: {job.error}"
+        
+        if job.status == 'cancelled':
+            banner = f"Stopped loading {title} ({job.progress_text()}). Showing partial results."
+        else:
+            banner = f"Loading {title}: {job.progress_text()}"
+        
+        return f"""
+        <div style="padding: 10px 15px; background-color: #363636; border: 1px solid #404040; border-radius: 6px; margin-bottom: 15px; color: #9ca3af; font-size: 14px;">
+            {banner}
+        </div>
+        """ + "\n".join(job.partial_results())
+    
+    @metrics.instrument_handler('stream_recent_emails')
+    @tracing.traced('stream_recent_emails')
+    def stream_recent_emails(self, max_results=10):
+        """Load recent emails in the background, yielding progress and partial results"""
+        self._label_metrics()
+        job = job_manager.submit('recent_emails', lambda job: self.get_recent_emails(max_results, job=job))
+        for job in job_manager.follow(job):
+            yield self._render_job(job, "recent emails")
+    
+    @metrics.instrument_handler('stream_date_selection')
+    @tracing.traced('stream_date_selection')
+    def stream_date_selection(self, manual_date, dropdown_date):
+        """Streaming variant of handle_date_selection"""
+        self._label_metrics()
+        selected_date = manual_date if manual_date else dropdown_date
+        if not selected_date:
+            yield "No date selected", "Please select a date"
+            return
+        
+        try:
+            # Validate date format
+            datetime.strptime(selected_date, "%Y-%m-%d")
+        except ValueError:
+            yield "Invalid date format", "Please use YYYY-MM-DD format"
+            return
+        
+        # Prefetched days render instantly
+        cached = self.get_cached_day(selected_date)
+        metrics.record_cache('day_view', cached is not None)
+        if cached is not None:
+            yield f"Selected: {selected_date}", cached
+            return
+        
+        job = job_manager.submit('emails_by_date', lambda job: self.get_emails_by_date(selected_date, job=job, use_cache=False))
+        for job in job_manager.follow(job):
+            yield f"Selected: {selected_date}", self._render_job(job, f"emails for {selected_date}")
+    
+    def stream_dropdown_selection(self, dropdown_date):
+        """Load a Quick Select date as soon as it is chosen"""
+        if not dropdown_date:
+            return
+        yield from self.stream_date_selection(None, dropdown_date)
+    
+    @metrics.instrument_handler('handle_date_selection')
+    @tracing.traced('handle_date_selection')
     def handle_date_selection(self, manual_date, dropdown_date):
         """Handle date selection from either input"""
         selected_date = manual_date if manual_date else dropdown_date
@@ -582,8 +970,9 @@ class EmailViewer:
         """Create the email viewer interface"""
         with gr.Column() as email_viewer:
             with gr.Row():
-                # Compact refresh button
+                # Compact refresh and stop buttons
                 refresh_btn = gr.Button("🔄 Refresh", size="sm")
+                stop_btn = gr.Button("⏹ Stop", size="sm", variant="stop")
             
             with gr.Row():
                 # Manual date input
@@ -610,17 +999,43 @@ class EmailViewer:
                 value="Please click Refresh to load emails."
             )
             
-            # Connect refresh button to update emails
-            refresh_btn.click(
-                fn=self.get_recent_emails,
+            # Expanded view: the full body is fetched on demand and cached
+            with gr.Row():
+                body_id_input = gr.Textbox(
+                    placeholder="Message ID",
+                    label="Show Email Body",
+                    elem_id="body-message-id",
+                    scale=4
+                )
+                show_body_btn = gr.Button("📄 Show Body", size="sm", elem_id="show-body-button", scale=1)
+            body_display = gr.Textbox(label="Email Body", lines=12, interactive=False)
+            show_body_btn.click(fn=self.show_body, inputs=body_id_input, outputs=body_display)
+            body_id_input.submit(fn=self.show_body, inputs=body_id_input, outputs=body_display)
+            
+            # Connect refresh button to stream emails as they load
+            refresh_event = refresh_btn.click(
+                fn=self.stream_recent_emails,
                 outputs=emails_display
             )
             
             # Handle OK button click
-            ok_btn.click(
-                fn=self.handle_date_selection,
+            date_event = ok_btn.click(
+                fn=self.stream_date_selection,
                 inputs=[date_input, dates_dropdown],
                 outputs=[date_label, emails_display]
             )
             
+            # Choosing a Quick Select date loads it right away (usually from the prefetch cache)
+            dropdown_event = dates_dropdown.change(
+                fn=self.stream_dropdown_selection,
+                inputs=[dates_dropdown],
+                outputs=[date_label, emails_display]
+            )
+            
+            # Stop cancels the running load; its job stops before the next API call
+            stop_btn.click(
+                fn=None,
+                cancels=[refresh_event, date_event, dropdown_event]
+            )
+            
         return email_viewer 
\ No newline at end of file
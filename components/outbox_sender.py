@@ -0,0 +1,91 @@
+import threading
+from googleapiclient.errors import HttpError
+from tools import SessionCache, tracing
+from tools.connectivity import connectivity, is_network_error
+from tools.outbox import MAX_ATTEMPTS, outbox
+
+# Longest wait between checks, so scheduled messages go out on time
+POLL_SECONDS = 30.0
+
+def _is_transient(error: Exception) -> bool:
+    """Rate limits and server errors are worth retrying; local errors (a missing file) are not"""
+    if isinstance(error, HttpError):
+        return error.resp.status == 429 or error.resp.status >= 500
+    return False
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff: 10s, 20s, 40s, ... capped at an hour"""
+    return min(2 ** attempts * 5, 3600)
+
+class OutboxSender:
+    """Delivers queued outbox messages on a background thread
+
+    Messages are sent one at a time through each account's pooled Gmail
+    service, so sends are paced by the quota scheduler like any other
+    request. Transient failures are retried with exponential backoff up to
+    ``MAX_ATTEMPTS``; anything else marks the message failed so it can be
+    retried from the chat. Messages left mid-send by a previous run are
+    requeued on start, so delivery is at-least-once. While offline nothing
+    is claimed, and sends that can't reach Gmail are deferred without
+    using up attempts.
+    """
+
+    def __init__(self, account_manager):
+        self.account_manager = account_manager
+        self._sessions = SessionCache()
+        self._thread = None
+
+    def start(self):
+        """Requeue interrupted sends, then start delivering"""
+        if self._thread and self._thread.is_alive():
+            return
+        outbox.recover()
+        outbox.accepting = True
+        self._thread = threading.Thread(target=self._run, name="outbox-sender", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                while self.deliver_next():
+                    pass
+                wait = outbox.next_due_in()
+            except Exception as e:
+                print(f"Error delivering outbox: {str(e)}")
+                wait = None
+            outbox.changed.wait(POLL_SECONDS if wait is None else min(wait, POLL_SECONDS))
+            outbox.changed.clear()
+
+    def _find_account(self, name: str):
+        for account in self.account_manager.accounts:
+            if account.name == name:
+                return account
+        return None
+
+    @tracing.traced('outbox_send')
+    def deliver_next(self) -> bool:
+        """Send the next due message; returns False when none is due (or while offline)"""
+        if connectivity.offline:
+            return False
+        row = outbox.claim_due()
+        if row is None:
+            return False
+
+        account = self._find_account(row['account'])
+        if account is None or not account.token_pickle:
+            outbox.mark_failed(row['id'], f"Account {row['account']!r} is not set up", None)
+            return True
+
+        try:
+            sent = self._sessions.get(account)['email_drafter'].send_file(row['file'])
+        except Exception as e:
+            if is_network_error(e):
+                outbox.defer(row['id'], str(e), connectivity.retry_after)
+                return True
+            attempts = row['attempts'] + 1
+            retry_in = retry_delay(attempts) if _is_transient(e) and attempts < MAX_ATTEMPTS else None
+            outbox.mark_failed(row['id'], str(e), retry_in)
+            return True
+
+        outbox.mark_sent(row['id'], sent['id'])
+        return True
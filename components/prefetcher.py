@@ -0,0 +1,82 @@
+import threading
+from datetime import datetime
+from tools.quota import quota_scheduler
+from tools.records import EmailRecord
+from tools import tracing, triage
+
+class DatePrefetcher:
+    """Warms EmailViewer's per-day cache for the Quick Select dates
+
+    Runs on a background thread at startup and after every inbox refresh.
+    Days holding the highest-scored mail of the last refresh (per the
+    triage model) go first, then the rest newest first. All Gmail requests
+    are made at idle priority through the quota scheduler, and the Gemini
+    summaries for each day (within the viewer's summary budget) wait until
+    no user request is running, so prefetching only uses quota nobody else
+    needs.
+    """
+
+    def __init__(self, email_viewer, scheduler=quota_scheduler):
+        self.email_viewer = email_viewer
+        self.scheduler = scheduler
+        self._wake = threading.Event()
+        self._thread = None
+        # Best triage score seen per YYYY-MM-DD in the last inbox refresh
+        self._day_scores = {}
+
+    def start(self):
+        """Start the prefetch thread and warm the cache once"""
+        if self._thread and self._thread.is_alive():
+            return
+        self.email_viewer.add_sync_listener(self._on_sync)
+        self._thread = threading.Thread(target=self._run, name="date-prefetcher", daemon=True)
+        self._thread.start()
+        self.request_prefetch()
+
+    def _on_sync(self, messages):
+        """Score the refreshed messages by day, then re-warm the cache"""
+        active_account = self.email_viewer.account_manager.get_active_account()
+        records = [EmailRecord.from_message(msg) for msg in messages]
+        day_scores = {}
+        for record, score in zip(records, triage.rank(active_account.name if active_account else None, records)):
+            if score is None:
+                continue
+            day = datetime.fromtimestamp(record.internal_date / 1000).strftime("%Y-%m-%d")
+            day_scores[day] = max(score, day_scores.get(day, 0.0))
+        self._day_scores = day_scores
+        self.request_prefetch()
+
+    def prefetch_order(self):
+        """Quick Select dates, highest-priority days first, otherwise newest first"""
+        day_scores = self._day_scores
+        dates = self.email_viewer.get_past_10_days()
+        return sorted(dates, key=lambda date_str: -day_scores.get(date_str, 0.0))
+
+    def request_prefetch(self):
+        """Ask the prefetch thread to (re)warm the cache"""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.prefetch()
+            except Exception as e:
+                print(f"Error prefetching emails: {str(e)}")
+
+    @tracing.traced('prefetch')
+    def prefetch(self):
+        """Load every uncached Quick Select date in priority order"""
+        active_account = self.email_viewer.account_manager.get_active_account()
+        if not active_account or not active_account.is_active or not active_account.token_pickle:
+            return
+
+        with self.scheduler.background():
+            for date_str in self.prefetch_order():
+                # A new sync arrived; start over from the top
+                if self._wake.is_set():
+                    return
+                if self.email_viewer.get_cached_day(date_str) is not None:
+                    continue
+                self.email_viewer.get_emails_by_date(date_str, use_cache=False)
@@ -0,0 +1,95 @@
+import os
+import threading
+from tools import SessionCache, tracing, triage
+from tools.quota import quota_scheduler
+from tools.raw_message import BODY_FORMAT
+from tools.records import EmailRecord
+from tools.reply_cache import reply_cache
+
+class ReplyPrecomputer:
+    """Drafts reply suggestions for high-priority unread mail after each sync
+
+    Runs on a background thread fed by EmailViewer's sync listener. Synced
+    threads that changed invalidate their cached drafts first; then the top
+    ``top_n`` unread messages from important senders (Gmail's IMPORTANT
+    label or a high triage score) get a suggestion drafted, so
+    ``suggest response: <id>`` is usually a cache hit. Syncs only fetch
+    metadata, so each candidate's full message is fetched here at idle
+    priority through the quota scheduler.
+    """
+
+    def __init__(self, email_viewer, top_n: int = None, min_score: float = 0.5):
+        self.email_viewer = email_viewer
+        self.top_n = top_n if top_n is not None else int(os.getenv("GMAIL_AI_PRECOMPUTE_REPLIES", "5"))
+        self.min_score = min_score
+        self._sessions = SessionCache()
+        self._pending = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the background thread and listen for syncs"""
+        if self.top_n <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self.email_viewer.add_sync_listener(self._on_sync)
+        self._thread = threading.Thread(target=self._run, name="reply-precomputer", daemon=True)
+        self._thread.start()
+
+    def _on_sync(self, messages):
+        active_account = self.email_viewer.account_manager.get_active_account()
+        if not active_account:
+            return
+        # Invalidate right away so a stale draft is never served after a sync
+        reply_cache.observe(active_account.name, messages)
+        with self._lock:
+            self._pending = (active_account, list(messages))
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                account, messages = self._pending
+            try:
+                self.precompute(account, messages)
+            except Exception as e:
+                print(f"Error precomputing replies: {str(e)}")
+
+    def candidates(self, account, messages):
+        """Unread messages from important senders, most important first"""
+        unread = [msg for msg in messages if 'UNREAD' in msg.get('labelIds', [])]
+        records = [EmailRecord.from_message(msg) for msg in unread]
+        scores = triage.rank(account.name, records)
+
+        ranked = []
+        for msg, score in zip(unread, scores):
+            important = 'IMPORTANT' in msg.get('labelIds', [])
+            if important or (score is not None and score >= self.min_score):
+                ranked.append((score if score is not None else 1.0, int(msg.get('internalDate', 0)), msg))
+        ranked.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [msg for _, _, msg in ranked[:self.top_n]]
+
+    @tracing.traced('precompute_replies')
+    def precompute(self, account, messages):
+        """Draft and cache suggestions for the sync's top candidates"""
+        if not account.token_pickle:
+            return
+        suggester = self._sessions.get(account)['response_suggester']
+        for msg in self.candidates(account, messages):
+            # A newer sync arrived; start over with its messages
+            if self._wake.is_set():
+                return
+            if reply_cache.contains(account.name, msg['id']):
+                continue
+            suggester._ensure_service()
+            with quota_scheduler.background():
+                full = suggester.service.users().messages().get(
+                    userId='me',
+                    id=msg['id'],
+                    format=BODY_FORMAT
+                ).execute()
+            # Gemini doesn't go through the quota bucket; still yield to users
+            quota_scheduler.wait_until_idle()
+            suggester.build_suggestion(full)
@@ -0,0 +1,82 @@
+import threading
+from tools import SessionCache, tracing
+from tools.connectivity import connectivity, is_network_error
+from tools.local_store import local_store
+
+# How often queued writes are retried when nothing signals a reconnect
+POLL_SECONDS = 30.0
+# Writes that keep failing with Gmail reachable are dropped after this many attempts
+MAX_ATTEMPTS = 5
+
+class WriteReplayer:
+    """Applies label changes and drafts queued while offline
+
+    Runs on a background thread that wakes when connectivity is restored,
+    or every ``POLL_SECONDS``. Writes are replayed oldest first through each
+    account's pooled tools; a network error stops the pass (the rest wait
+    for the next one), while a write that fails with Gmail reachable is
+    retried up to ``MAX_ATTEMPTS`` times and then dropped.
+    """
+
+    def __init__(self, account_manager):
+        self.account_manager = account_manager
+        self._sessions = SessionCache()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="write-replayer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.replay_pending()
+            except Exception as e:
+                print(f"Error replaying queued writes: {str(e)}")
+            connectivity.restored.wait(POLL_SECONDS)
+            connectivity.restored.clear()
+
+    def _find_account(self, name: str):
+        for account in self.account_manager.accounts:
+            if account.name == name:
+                return account
+        return None
+
+    def _apply(self, tools, kind: str, args: dict):
+        if kind == 'add_label':
+            tools['label_manager'].add_label(args['label_name'], args['email_id'])
+        elif kind == 'remove_label':
+            tools['label_manager'].remove_label(args['label_name'], args['email_id'])
+        elif kind == 'draft':
+            tools['email_drafter'].create_draft(args['to'], args['subject'], args['context'],
+                                                args['attachments'] or None)
+        else:
+            raise ValueError(f"Unknown queued write {kind!r}")
+
+    @tracing.traced('replay_writes')
+    def replay_pending(self) -> int:
+        """Replay queued writes in order; returns how many were applied"""
+        if connectivity.offline:
+            return 0
+        applied = 0
+        for write in local_store.pending_writes():
+            try:
+                account = self._find_account(write['account'])
+                if account is None or not account.token_pickle:
+                    raise ValueError(f"Account {write['account']!r} is not set up")
+                self._apply(self._sessions.get(account), write['kind'], write['args'])
+            except Exception as e:
+                if is_network_error(e):
+                    # Still offline; keep this and later writes in order for the next pass
+                    return applied
+                if write['attempts'] + 1 >= MAX_ATTEMPTS:
+                    print(f"Dropping queued {write['kind']} #{write['id']}: {str(e)}")
+                    local_store.complete_write(write['id'])
+                else:
+                    local_store.fail_write(write['id'], str(e))
+                continue
+            local_store.complete_write(write['id'])
+            applied += 1
+        return applied
@@ -0,0 +1,334 @@
+"""Command line entry point for scripted Gmail AI use
+
+    python -m gmail_ai batch commands.txt --workers 8 --output results.jsonl
+
+``batch`` runs a file of chat commands (one per line, the same grammar as
+the chat window; blank lines and ``#`` comments are skipped) on a worker
+pool and writes one JSON result per command.
+
+    python -m gmail_ai export mail.mbox --query "label:work" --zstd
+
+``export`` streams every matching message to an mbox or JSONL file. Run the
+same command again after an interruption to resume from its checkpoint.
+
+    python -m gmail_ai import ~/OldMail --label Migrated
+
+``import`` loads an mbox/JSONL file or a directory of .eml and mbox files
+into the account, labelling messages by folder. Already imported messages
+are skipped on reruns.
+
+    python -m gmail_ai rules rules.json --query "in:inbox newer_than:30d" --dry-run
+
+``rules`` matches a rule file against a backlog locally and applies the
+resulting label changes in grouped batchModify calls.
+
+    python -m gmail_ai triage-train
+
+``triage-train`` fits the account's priority model from its label history;
+the app uses it to order emails and decide which ones to summarize.
+
+    python -m gmail_ai merge people.csv --subject "Hi {name}" --body-file invite.txt
+
+``merge`` drafts (or with ``--send``, sends) one templated message per
+recipient row and logs each outcome to a JSONL results file.
+
+    python -m gmail_ai index --top 20
+
+``index`` builds the account's compact columnar metadata index of the whole
+mailbox (or a query) and prints who sends the most mail.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+def _open_output(path: str):
+    return sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+
+def _load_account(accounts_file: str):
+    from components.account_manager import AccountManager
+
+    account = AccountManager(accounts_file).get_active_account()
+    if not account or not account.token_pickle:
+        raise SystemExit("No authenticated Gmail account selected. Set one up in the app first.")
+    return account
+
+def read_commands(path: str):
+    """Yield (line number, command) for each command in a script"""
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for number, line in enumerate(stream, start=1):
+            command = line.strip()
+            if command and not command.startswith("#"):
+                yield number, command
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def run_command(session, number: int, command: str) -> dict:
+    """Run one command through the chat router and describe the outcome"""
+    from tools import metrics
+    from tools.command_router import CommandFormatError, route_command
+
+    metrics.set_account(session.account_name)
+    start = time.perf_counter()
+    try:
+        response = route_command(command, session)
+        status = "error" if response.startswith("Error") else "ok"
+    except CommandFormatError as e:
+        response, status = str(e), "format_error"
+    except Exception as e:
+        response, status = str(e), "error"
+    return {
+        "line": number,
+        "command": command,
+        "status": status,
+        "response": response,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+
+def batch(args) -> int:
+    from tools import SessionCache
+
+    commands = list(read_commands(args.script))
+    # One session for the whole batch: shared tools, transports and quota scheduler
+    session = SessionCache().get(_load_account(args.accounts_file))
+
+    counts = {"ok": 0, "error": 0, "format_error": 0}
+    output = _open_output(args.output)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(run_command, session, number, command) for number, command in commands]
+            # Completion order streams results soonest; --ordered keeps script order
+            for future in (futures if args.ordered else as_completed(futures)):
+                result = future.result()
+                counts[result["status"]] += 1
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"{len(commands)} commands in {time.perf_counter() - start:.1f}s: "
+          f"{counts['ok']} ok, {counts['error']} errors, {counts['format_error']} format errors",
+          file=sys.stderr)
+    return 1 if args.fail_on_error and (counts["error"] or counts["format_error"]) else 0
+
+def export(args) -> int:
+    from tools import SessionCache
+
+    exporter = SessionCache().get(_load_account(args.accounts_file))['mailbox_exporter']
+    start = time.perf_counter()
+    try:
+        result = exporter.export(
+            args.output,
+            query=args.query,
+            label_ids=args.label,
+            format=args.format,
+            compress=args.zstd,
+            workers=args.workers
+        )
+    except ValueError as e:
+        raise SystemExit(str(e))
+    except KeyboardInterrupt:
+        print("Export interrupted; run the same command again to resume.", file=sys.stderr)
+        return 130
+
+    print(f"{'Resumed and e' if result['resumed'] else 'E'}xported {result['exported']} messages "
+          f"to {result['output']} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+def import_messages(args) -> int:
+    from tools import SessionCache
+
+    session = SessionCache().get(_load_account(args.accounts_file))
+    start = time.perf_counter()
+    try:
+        result = session['mailbox_importer'].import_path(
+            args.source,
+            session['label_manager'],
+            extra_labels=args.label,
+            ledger_path=args.ledger,
+            workers=args.workers
+        )
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    for error in result['errors']:
+        print(f"Failed: {error}", file=sys.stderr)
+    print(f"{result['imported']} imported, {result['skipped']} already imported, {result['failed']} failed "
+          f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 1 if result['failed'] else 0
+
+def apply_rules(args) -> int:
+    from tools import RuleSet, SessionCache
+
+    try:
+        rule_set = RuleSet.load(args.rules)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Could not load rules: {e}")
+
+    session = SessionCache().get(_load_account(args.accounts_file))
+    start = time.perf_counter()
+    result = session['rules_engine'].run(
+        rule_set,
+        session['label_manager'],
+        query=args.query,
+        limit=args.limit,
+        dry_run=args.dry_run,
+        workers=args.workers
+    )
+
+    verb = "Would change" if result['dry_run'] else "Changed"
+    for change in result['changes']:
+        print(f"{verb} {change['messages']} messages: +{','.join(change['add']) or '-'} "
+              f"-{','.join(change['remove']) or '-'}", file=sys.stderr)
+    print(f"{result['matched']} of {result['scanned']} messages matched {len(rule_set.rules)} rules "
+          f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+def triage_train(args) -> int:
+    from tools import SessionCache
+
+    account = _load_account(args.accounts_file)
+    start = time.perf_counter()
+    try:
+        result = SessionCache().get(account)['triage_classifier'].train(
+            account.name,
+            max_per_class=args.max_per_class,
+            workers=args.workers
+        )
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    print(f"Trained on {result['positives']} priority and {result['negatives']} other messages "
+          f"in {time.perf_counter() - start:.1f}s; saved to {result['path']}", file=sys.stderr)
+    return 0
+
+def merge(args) -> int:
+    from tools import SessionCache
+    from tools.mail_merge import load_recipients
+
+    try:
+        recipients = load_recipients(args.recipients)
+        with open(args.body_file, "r", encoding="utf-8") as f:
+            body_template = f.read()
+    except (OSError, ValueError) as e:
+        raise SystemExit(str(e))
+
+    account = _load_account(args.accounts_file)
+    start = time.perf_counter()
+    try:
+        counts = SessionCache().get(account)['mail_merge'].merge(
+            recipients,
+            args.subject,
+            body_template,
+            args.results,
+            send=args.send,
+            personalize=args.personalize,
+            gemini_api_key=account.gemini_api_key,
+            workers=args.workers,
+            processes=args.processes,
+            dry_run=args.dry_run
+        )
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    done = ", ".join(f"{count} {status}" for status, count in counts.items() if count)
+    print(f"{len(recipients)} recipients in {time.perf_counter() - start:.1f}s: {done or 'nothing to do'}. "
+          f"Results in {args.results}", file=sys.stderr)
+    return 1 if counts['failed'] else 0
+
+def build_index(args) -> int:
+    from tools import SessionCache
+    from tools.message_index import index_path
+
+    account = _load_account(args.accounts_file)
+    start = time.perf_counter()
+    try:
+        index = SessionCache().get(account)['message_indexer'].build(
+            query=args.query or None,
+            limit=args.limit,
+            workers=args.workers
+        )
+    except ValueError as e:
+        raise SystemExit(str(e))
+    index.save(index_path(account.name))
+
+    for sender, count in index.sender_counts(top=args.top):
+        print(f"{count:>8}  {sender}")
+    print(f"Indexed {len(index)} messages in {time.perf_counter() - start:.1f}s "
+          f"({index.nbytes / 2 ** 20:.1f} MB in memory); saved to {index_path(account.name)}", file=sys.stderr)
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m gmail_ai", description="Gmail AI command line tools")
+    parser.add_argument("--accounts-file", default="gmail_accounts.json")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="Run a file of chat commands in parallel")
+    batch_parser.add_argument("script", help="Command file, one command per line ('-' for stdin)")
+    batch_parser.add_argument("--workers", type=int, default=8, help="Commands run at the same time")
+    batch_parser.add_argument("--output", default="-", help="JSONL results file ('-' for stdout)")
+    batch_parser.add_argument("--ordered", action="store_true", help="Write results in script order")
+    batch_parser.add_argument("--fail-on-error", action="store_true", help="Exit with 1 if any command failed")
+    batch_parser.set_defaults(handler=batch)
+
+    export_parser = subparsers.add_parser("export", help="Export messages to an mbox or JSONL file (resumable)")
+    export_parser.add_argument("output", help="Output file; a .checkpoint.json file is kept beside it until done")
+    export_parser.add_argument("--query", default="", help="Gmail search query (default: all mail)")
+    export_parser.add_argument("--label", action="append", help="Label ID to export (repeatable)")
+    export_parser.add_argument("--format", choices=["mbox", "jsonl"], default="mbox")
+    export_parser.add_argument("--zstd", action="store_true", help="Compress with zstd (needs zstandard)")
+    export_parser.add_argument("--workers", type=int, default=8, help="Messages fetched at the same time")
+    export_parser.set_defaults(handler=export)
+
+    import_parser = subparsers.add_parser("import", help="Import an mbox file or a directory of .eml/mbox files")
+    import_parser.add_argument("source", help="mbox, JSONL or .eml file, or a directory of them")
+    import_parser.add_argument("--label", action="append", help="Extra label for every message (repeatable)")
+    import_parser.add_argument("--ledger", help="Ledger of imported Message-IDs (default: import_ledger.sqlite3 in the data directory)")
+    import_parser.add_argument("--workers", type=int, default=4, help="Uploads run at the same time")
+    import_parser.set_defaults(handler=import_messages)
+
+    rules_parser = subparsers.add_parser("rules", help="Apply a rule file to matching messages")
+    rules_parser.add_argument("rules", help="JSON rule file")
+    rules_parser.add_argument("--query", default="in:inbox", help="Gmail search for the messages to check")
+    rules_parser.add_argument("--limit", type=int, help="Check at most this many messages")
+    rules_parser.add_argument("--dry-run", action="store_true", help="Report changes without applying them")
+    rules_parser.add_argument("--workers", type=int, default=8, help="Messages fetched at the same time")
+    rules_parser.set_defaults(handler=apply_rules)
+
+    triage_parser = subparsers.add_parser("triage-train", help="Train the priority model from your label history")
+    triage_parser.add_argument("--max-per-class", type=int, default=500, help="Messages sampled per class")
+    triage_parser.add_argument("--workers", type=int, default=8, help="Messages fetched at the same time")
+    triage_parser.set_defaults(handler=triage_train)
+
+    merge_parser = subparsers.add_parser("merge", help="Draft or send a templated email to a recipient list")
+    merge_parser.add_argument("recipients", help="CSV (with a header row) or JSON list; needs a 'to' or 'email' field")
+    merge_parser.add_argument("--subject", required=True, help="Subject template, e.g. 'Hi {name}'")
+    merge_parser.add_argument("--body-file", required=True, help="Body template file with {field} placeholders")
+    merge_parser.add_argument("--send", action="store_true", help="Send instead of creating drafts")
+    merge_parser.add_argument("--personalize", help="Instruction for Gemini to personalize each body")
+    merge_parser.add_argument("--results", default="merge_results.jsonl", help="JSONL results file (reruns skip done rows)")
+    merge_parser.add_argument("--workers", type=int, default=8, help="Gmail/Gemini requests at the same time")
+    merge_parser.add_argument("--processes", type=int, help="MIME rendering processes (default: CPU count)")
+    merge_parser.add_argument("--dry-run", action="store_true", help="Render and log without calling Gmail")
+    merge_parser.set_defaults(handler=merge)
+
+    index_parser = subparsers.add_parser("index", help="Build a compact metadata index of the mailbox")
+    index_parser.add_argument("--query", default="", help="Gmail search query (default: all mail)")
+    index_parser.add_argument("--limit", type=int, help="Index at most this many messages")
+    index_parser.add_argument("--top", type=int, default=10, help="Top senders to print")
+    index_parser.add_argument("--workers", type=int, default=8, help="Messages fetched at the same time")
+    index_parser.set_defaults(handler=build_index)
+
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+"""Model Context Protocol server exposing the Gmail tools
+
+Serves JSON-RPC 2.0 over stdio (the default, for agents that launch the
+server themselves) or streamable HTTP (for a shared long-lived process):
+
+    python mcp_server.py
+    python mcp_server.py --http --port 8808
+
+Tool calls run concurrently on a thread pool against one shared tool
+session per account, so they reuse the pooled Gmail transports, the quota
+scheduler and any warm caches instead of starting cold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from components.account_manager import AccountManager
+from components.outbox_sender import OutboxSender
+from tools import SessionCache, metrics, tracing
+
+PROTOCOL_VERSION = "2025-03-26"
+SUPPORTED_PROTOCOL_VERSIONS = ("2024-11-05", "2025-03-26", "2025-06-18")
+SERVER_INFO = {"name": "gmail-ai", "version": "1.0.0"}
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+class ToolSpec:
+    """An MCP tool: JSON schema for its arguments and the session call it makes"""
+
+    def __init__(self, name: str, description: str, properties: dict, required: list,
+                 call: Callable[[Any, dict], str], read_only: bool = True):
+        self.name = name
+        self.description = description
+        self.input_schema = {
+            "type": "object",
+            "properties": properties,
+            "required": required,
+            "additionalProperties": False
+        }
+        self.call = call
+        self.read_only = read_only
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "inputSchema": self.input_schema,
+            "annotations": {"readOnlyHint": self.read_only}
+        }
+
+    def validate(self, arguments: dict) -> Optional[str]:
+        """Check arguments against the schema, returning an error message if invalid"""
+        if not isinstance(arguments, dict):
+            return "arguments must be an object"
+        missing = [name for name in self.input_schema["required"] if name not in arguments]
+        if missing:
+            return f"missing required arguments: {', '.join(missing)}"
+        properties = self.input_schema["properties"]
+        for name, value in arguments.items():
+            if name not in properties:
+                return f"unknown argument: {name}"
+            schema = properties[name]
+            expected = schema["type"]
+            if expected == "integer" and (not isinstance(value, int) or isinstance(value, bool)):
+                return f"{name} must be an integer"
+            if expected == "number" and (not isinstance(value, (int, float)) or isinstance(value, bool)):
+                return f"{name} must be a number"
+            if expected == "string" and not isinstance(value, str):
+                return f"{name} must be a string"
+            if "minimum" in schema and value < schema["minimum"]:
+                return f"{name} must be at least {schema['minimum']}"
+            if "maximum" in schema and value > schema["maximum"]:
+                return f"{name} must be at most {schema['maximum']}"
+            if "enum" in schema and value not in schema["enum"]:
+                return f"{name} must be one of: {', '.join(map(str, schema['enum']))}"
+        return None
+
+_EMAIL_ID = {"type": "string", "description": "Gmail message ID"}
+_LABEL = {"type": "string", "description": "Label name; created if it does not exist"}
+_COUNT = {"type": "integer", "minimum": 1, "maximum": 500, "description": "Maximum number of emails"}
+
+TOOLS = {tool.name: tool for tool in [
+    ToolSpec(
+        "find_emails",
+        "Search emails by sender name, address or Gmail query and list their IDs, senders, dates and subjects.",
+        {"query": {"type": "string", "description": "Name, email address or Gmail search query"}, "count": _COUNT},
+        ["query"],
+        lambda session, args: session['email_finder'].find_emails(args["query"], args.get("count", 5))
+    ),
+    ToolSpec(
+        "list_recent_emails",
+        "List the most recent emails.",
+        {"count": _COUNT},
+        [],
+        lambda session, args: session['email_analyzer'].list_recent_emails(args.get("count", 5))
+    ),
+    ToolSpec(
+        "analyze_email",
+        "Show an email's sender, date, subject, attachments and body.",
+        {"email_id": _EMAIL_ID},
+        ["email_id"],
+        lambda session, args: session['email_analyzer'].analyze_email(args["email_id"])
+    ),
+    ToolSpec(
+        "suggest_response",
+        "Suggest a reply to an email.",
+        {"email_id": _EMAIL_ID},
+        ["email_id"],
+        lambda session, args: session['response_suggester'].suggest_response(args["email_id"])
+    ),
+    ToolSpec(
+        "list_labels",
+        "List all Gmail labels.",
+        {},
+        [],
+        lambda session, args: session['label_manager'].list_labels()
+    ),
+    ToolSpec(
+        "add_label_to_email",
+        "Add a label to an email.",
+        {"label_name": _LABEL, "email_id": _EMAIL_ID},
+        ["label_name", "email_id"],
+        lambda session, args: session['label_manager'].add_label_to_email(args["label_name"], args["email_id"]),
+        read_only=False
+    ),
+    ToolSpec(
+        "remove_label_from_email",
+        "Remove a label from an email.",
+        {"label_name": {"type": "string", "description": "Label name"}, "email_id": _EMAIL_ID},
+        ["label_name", "email_id"],
+        lambda session, args: session['label_manager'].remove_label_from_email(args["label_name"], args["email_id"]),
+        read_only=False
+    ),
+    ToolSpec(
+        "draft_email",
+        "Create a draft email.",
+        {
+            "to": {"type": "string", "description": "Recipient address"},
+            "subject": {"type": "string"},
+            "context": {"type": "string", "description": "Body of the email"}
+        },
+        ["to", "subject", "context"],
+        lambda session, args: session['email_drafter'].draft_email(args["to"], args["subject"], args["context"]),
+        read_only=False
+    ),
+    ToolSpec(
+        "send_email",
+        "Send an email. When the server runs with --outbox the message is queued in the outbox and "
+        "delivered in the background, retrying rate limits and server errors, and the result is its "
+        "outbox number rather than a Gmail message ID; otherwise it is sent immediately. "
+        "send_at schedules delivery for later and needs --outbox.",
+        {
+            "to": {"type": "string", "description": "Recipient address"},
+            "subject": {"type": "string"},
+            "context": {"type": "string", "description": "Body of the email"},
+            "send_at": {"type": "number", "minimum": 0, "description": "When to send, as a Unix timestamp"}
+        },
+        ["to", "subject", "context"],
+        lambda session, args: session['email_drafter'].send_email(args["to"], args["subject"], args["context"],
+                                                                  send_at=args.get("send_at")),
+        read_only=False
+    ),
+    ToolSpec(
+        "list_unread_important_starred",
+        "List unread, important or starred emails, or the inbox emails ranked highest by the triage model.",
+        {"category": {"type": "string", "enum": ["unread", "important", "starred", "priority"]}},
+        ["category"],
+        lambda session, args: session['email_processor'].process_email_request(args["category"])
+    ),
+]}
+
+class JsonRpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+class MCPServer:
+    """Transport-independent MCP request handling"""
+
+    def __init__(self, account_manager: AccountManager, max_workers: int = 8):
+        self.account_manager = account_manager
+        self.sessions = SessionCache()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-tool")
+        self.tracer = tracing.get_tracer(__name__)
+
+    async def handle_payload(self, payload: Any):
+        """Handle a parsed JSON-RPC message or batch; returns the response(s) or None"""
+        if isinstance(payload, list):
+            if not payload:
+                return self._error(None, INVALID_REQUEST, "Empty batch")
+            responses = await asyncio.gather(*(self.handle_message(message) for message in payload))
+            responses = [response for response in responses if response is not None]
+            return responses or None
+        return await self.handle_message(payload)
+
+    async def handle_message(self, message: Any) -> Optional[dict]:
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0":
+            return self._error(None, INVALID_REQUEST, "Invalid JSON-RPC 2.0 message")
+
+        # Responses to server requests and notifications get no reply
+        if "method" not in message:
+            return None
+        is_notification = "id" not in message
+        request_id = message.get("id")
+
+        try:
+            result = await self.dispatch(message["method"], message.get("params") or {})
+        except JsonRpcError as e:
+            return None if is_notification else self._error(request_id, e.code, e.message)
+        except Exception as e:
+            return None if is_notification else self._error(request_id, INTERNAL_ERROR, str(e))
+        return None if is_notification else {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    async def dispatch(self, method: str, params: dict):
+        if method == "initialize":
+            requested = params.get("protocolVersion")
+            return {
+                "protocolVersion": requested if requested in SUPPORTED_PROTOCOL_VERSIONS else PROTOCOL_VERSION,
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": SERVER_INFO,
+                "instructions": "Gmail tools for the active account configured in the Gmail AI app."
+            }
+        if method == "ping":
+            return {}
+        if method.startswith("notifications/"):
+            return None
+        if method == "tools/list":
+            return {"tools": [tool.to_dict() for tool in TOOLS.values()]}
+        if method == "tools/call":
+            return await self.call_tool(params.get("name"), params.get("arguments") or {})
+        raise JsonRpcError(METHOD_NOT_FOUND, f"Method not found: {method}")
+
+    async def call_tool(self, name: str, arguments: dict) -> dict:
+        tool = TOOLS.get(name)
+        if tool is None:
+            raise JsonRpcError(INVALID_PARAMS, f"Unknown tool: {name}")
+        error = tool.validate(arguments)
+        if error:
+            raise JsonRpcError(INVALID_PARAMS, f"Invalid arguments for {name}: {error}")
+
+        loop = asyncio.get_running_loop()
+        try:
+            text = await loop.run_in_executor(self.executor, self._run_tool, tool, arguments)
+        except Exception as e:
+            return {"content": [{"type": "text", "text": str(e)}], "isError": True}
+
+        # The tools report failures as text, e.g. "Error listing labels: ..."
+        is_error = text.startswith("Error") or text.startswith("Please")
+        return {"content": [{"type": "text", "text": text}], "isError": is_error}
+
+    @metrics.instrument_handler('mcp_tool_call')
+    def _run_tool(self, tool: ToolSpec, arguments: dict) -> str:
+        account = self.account_manager.get_active_account()
+        if not account:
+            raise ValueError("Please set up and select a Gmail account in the Gmail AI app first")
+        metrics.set_account(account.name)
+        with self.tracer.start_as_current_span(f"mcp {tool.name}"):
+            return tool.call(self.sessions.get(account), arguments)
+
+    @staticmethod
+    def _error(request_id, code: int, message: str) -> dict:
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+async def serve_stdio(server: MCPServer):
+    """Newline-delimited JSON-RPC on stdin/stdout, requests handled concurrently"""
+    # The tools print diagnostics; keep stdout for protocol messages only
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    write_lock = asyncio.Lock()
+    loop = asyncio.get_running_loop()
+    pending = set()
+
+    async def respond(line: str):
+        try:
+            payload = json.loads(line)
+        except ValueError:
+            response = MCPServer._error(None, PARSE_ERROR, "Parse error")
+        else:
+            response = await server.handle_payload(payload)
+        if response is not None:
+            async with write_lock:
+                protocol_out.write(json.dumps(response) + "\n")
+                protocol_out.flush()
+
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            break
+        if line.strip():
+            task = asyncio.create_task(respond(line))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+    if pending:
+        await asyncio.gather(*pending)
+
+def create_http_app(server: MCPServer):
+    """Streamable HTTP transport: JSON-RPC over POST /mcp with JSON responses"""
+    from fastapi import FastAPI, Request, Response
+    from fastapi.responses import JSONResponse
+
+    app = FastAPI(title="Gmail AI MCP server")
+
+    @app.post("/mcp")
+    async def mcp_endpoint(request: Request):
+        try:
+            payload = json.loads(await request.body())
+        except ValueError:
+            return JSONResponse(MCPServer._error(None, PARSE_ERROR, "Parse error"), status_code=400)
+
+        response = await server.handle_payload(payload)
+        if response is None:
+            # Only notifications or responses were sent
+            return Response(status_code=202)
+
+        headers = {}
+        messages = payload if isinstance(payload, list) else [payload]
+        if any(isinstance(m, dict) and m.get("method") == "initialize" for m in messages):
+            headers["Mcp-Session-Id"] = uuid.uuid4().hex
+        return JSONResponse(response, headers=headers)
+
+    @app.get("/mcp")
+    async def mcp_stream():
+        # No server-initiated messages, so there is no SSE stream to offer
+        return Response(status_code=405, headers={"Allow": "POST"})
+
+    @app.delete("/mcp")
+    async def mcp_close():
+        return Response(status_code=204)
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Gmail tools over the Model Context Protocol")
+    parser.add_argument("--http", action="store_true", help="Use streamable HTTP instead of stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("GMAIL_AI_MCP_WORKERS", "8")),
+                        help="Concurrent tool calls")
+    parser.add_argument("--accounts-file", default="gmail_accounts.json")
+    parser.add_argument("--outbox", action="store_true",
+                        help="Queue sends in the outbox and deliver them from this process "
+                             "(not while the app is running on the same data directory)")
+    args = parser.parse_args()
+
+    account_manager = AccountManager(args.accounts_file)
+    server = MCPServer(account_manager, max_workers=args.workers)
+    if args.outbox:
+        OutboxSender(account_manager).start()
+    if args.http:
+        import uvicorn
+        uvicorn.run(create_http_app(server), host=args.host, port=args.port)
+    else:
+        asyncio.run(serve_stdio(server))
+
+if __name__ == "__main__":
+    main()
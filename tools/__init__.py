@@ -4,6 +4,14 @@ from .response_suggester import ResponseSuggester
 from .email_processor import EmailProcessor
 from .email_finder import EmailFinder
 from .label_manager import LabelManager
+from .mailbox_export import MailboxExporter
+from .mailbox_import import MailboxImporter
+from .rules import RulesEngine, RuleSet
+from .triage import TriageClassifier
+from .mail_merge import MailMerge
+from .message_index import MessageIndex, MessageIndexer
+from .session import ToolSession, SessionCache
+from .records import EmailRecord
 
 __all__ = [
     'EmailDrafter',
@@ -11,5 +19,16 @@ __all__ = [
     'ResponseSuggester',
     'EmailProcessor',
     'EmailFinder',
-    'LabelManager'
+    'LabelManager',
+    'MailboxExporter',
+    'MailboxImporter',
+    'RulesEngine',
+    'RuleSet',
+    'TriageClassifier',
+    'MailMerge',
+    'MessageIndex',
+    'MessageIndexer',
+    'ToolSession',
+    'SessionCache',
+    'EmailRecord'
 ] 
\ No newline at end of file
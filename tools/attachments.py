@@ -0,0 +1,100 @@
+import base64
+import mimetypes
+import os
+import time
+import uuid
+from email.header import Header
+from email.mime.text import MIMEText
+from email.policy import SMTP
+from email.utils import encode_rfc2231
+from typing import BinaryIO, List, Optional
+import httplib2
+from googleapiclient.errors import HttpError
+
+# Gmail rejects uploaded messages above 35 MB (attachments are ~4/3 larger once encoded)
+MAX_MESSAGE_BYTES = 35 * 1024 * 1024
+# Must be a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# Raw bytes per read; a multiple of 57 so every read encodes to whole 76-character lines
+_ENCODE_BLOCK = 57 * 1024
+
+def _header(name: str, value: str) -> bytes:
+    if value.isascii():
+        return f"{name}: {value}\r\n".encode()
+    return f"{name}: {Header(value, 'utf-8', header_name=name).encode()}\r\n".encode()
+
+def _filename_param(name: str, filename: str) -> str:
+    if filename.isascii() and '"' not in filename:
+        return f'{name}="{filename}"'
+    return f"{name}*={encode_rfc2231(filename, 'utf-8')}"
+
+def write_mime_message(out: BinaryIO, to: str, subject: str, body: str, attachments: List[str],
+                       sender: Optional[str] = None) -> int:
+    """Write a multipart message with file attachments to ``out``; returns its size
+
+    Attachments are read and base64-encoded block by block, so memory use
+    does not depend on their size.
+    """
+    for path in attachments:
+        if not os.path.isfile(path):
+            raise ValueError(f"Attachment not found: {path}")
+
+    boundary = f"=_{uuid.uuid4().hex}"
+    start = out.tell()
+    out.write(_header('To', to))
+    if sender:
+        out.write(_header('From', sender))
+    out.write(_header('Subject', subject))
+    out.write(b"MIME-Version: 1.0\r\n")
+    out.write(f'Content-Type: multipart/mixed; boundary="{boundary}"\r\n\r\n'.encode())
+
+    # The text part is small; let the email package encode it
+    out.write(f"--{boundary}\r\n".encode())
+    text = MIMEText(body, 'plain', 'utf-8')
+    del text['MIME-Version']
+    out.write(text.as_bytes(policy=SMTP))
+    out.write(b"\r\n")
+
+    for path in attachments:
+        filename = os.path.basename(path)
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        out.write(f"--{boundary}\r\n".encode())
+        out.write(f"Content-Type: {content_type}; {_filename_param('name', filename)}\r\n".encode())
+        out.write(f"Content-Disposition: attachment; {_filename_param('filename', filename)}\r\n".encode())
+        out.write(b"Content-Transfer-Encoding: base64\r\n\r\n")
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(_ENCODE_BLOCK)
+                if not block:
+                    break
+                out.write(base64.encodebytes(block).replace(b'\n', b'\r\n'))
+        out.write(b"\r\n")
+
+    out.write(f"--{boundary}--\r\n".encode())
+    size = out.tell() - start
+    if size > MAX_MESSAGE_BYTES:
+        raise ValueError(f"Message is {size / 2 ** 20:.1f} MB; Gmail accepts at most 35 MB. Share large files by link instead.")
+    return size
+
+def run_resumable(request, num_retries: int = 3, max_interruptions: int = 5):
+    """Drive a resumable media upload to completion and return the response
+
+    Server errors and dropped connections don't restart the upload: calling
+    ``next_chunk()`` again continues the same upload session, up to
+    ``max_interruptions`` times. After a server error the client first asks
+    the server how much it already has; after a dropped connection it
+    re-sends the chunk that was in flight from the last acknowledged offset.
+    """
+    interruptions = 0
+    response = None
+    while response is None:
+        try:
+            _, response = request.next_chunk(num_retries=num_retries)
+        except (OSError, httplib2.HttpLib2Error, HttpError) as e:
+            if isinstance(e, HttpError) and e.resp.status < 500:
+                raise
+            interruptions += 1
+            if interruptions > max_interruptions:
+                raise
+            time.sleep(min(2 ** interruptions, 30))
+    return response
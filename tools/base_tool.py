@@ -3,22 +3,37 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 import pickle
 import os
+import threading
 from typing import Optional
+from .connectivity import OfflineError, connectivity, is_network_error
+from .service_pool import get_gmail_service
+from .raw_message import BODY_FORMAT
+from .records import EmailRecord
+from .tracing import get_tracer
+
+tracer = get_tracer(__name__)
 
 class BaseTool:
     """Base class for Gmail tools with authentication handling"""
     
     SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
     
+    # Serializes token refreshes and token.pickle writes across worker threads
+    _auth_lock = threading.RLock()
+    
     def __init__(self):
         self.credentials = None
         self.connected_email = None
         self._client_id = None
         self._client_secret = None
         self._token_pickle = None
+        # Name of the configured account, used to key local data
+        self.account_name = None
     
-    def set_credentials(self, client_id: str, client_secret: str, token_pickle: Optional[str] = None):
+    def set_credentials(self, client_id: str, client_secret: str, token_pickle: Optional[str] = None,
+                        account_name: Optional[str] = None):
         """Set OAuth credentials for the tool"""
+        self.account_name = account_name
         self._client_id = client_id
         self._client_secret = client_secret
         
@@ -46,11 +61,49 @@ class BaseTool:
         """Set the email address to connect to"""
         self.connected_email = email
     
+    @property
+    def service(self):
+        """Gmail service bound to the calling thread"""
+        if not self.credentials:
+            return None
+        return get_gmail_service(self.credentials)
+    
+    def _ensure_service(self):
+        """Ensure we have an authenticated Gmail service"""
+        self.ensure_authenticated()
+    
+    def _fetch_record(self, email_id: str, full: bool = False) -> EmailRecord:
+        """Fetch a message as a record (headers only unless ``full``)"""
+        with tracer.start_as_current_span("fetch_record", attributes={'full': full}):
+            return self._fetch_record_untraced(email_id, full)
+    
+    def _fetch_record_untraced(self, email_id: str, full: bool) -> EmailRecord:
+        if full:
+            message = self.service.users().messages().get(
+                userId='me',
+                id=email_id,
+                format=BODY_FORMAT
+            ).execute()
+        else:
+            message = self.service.users().messages().get(
+                userId='me',
+                id=email_id,
+                format='metadata',
+                metadataHeaders=['From', 'Subject', 'Date']
+            ).execute()
+        return EmailRecord.from_message(message, full=full)
+    
     def ensure_authenticated(self):
         """Ensure we have valid credentials"""
         if not self._client_id or not self._client_secret:
             raise ValueError("Client credentials not set. Please configure account first.")
         
+        with tracer.start_as_current_span("auth.ensure"):
+            with self._auth_lock:
+                self._ensure_credentials()
+    
+    def _ensure_credentials(self):
+        """Load, refresh or create credentials (caller holds the auth lock)"""
         try:
             if not self.credentials:
                 flow = InstalledAppFlow.from_client_config(
@@ -73,8 +126,11 @@ class BaseTool:
                     pickle.dump(self.credentials, token)
             
             elif not self.credentials.valid:
+                if connectivity.offline:
+                    raise OfflineError("Can't refresh credentials while offline")
                 if self.credentials.expired and self.credentials.refresh_token:
-                    self.credentials.refresh(Request())
+                    with tracer.start_as_current_span("auth.refresh"):
+                        self.credentials.refresh(Request())
                     # Save the refreshed credentials
                     with open("token.pickle", "wb") as token:
                         pickle.dump(self.credentials, token)
@@ -100,6 +156,10 @@ class BaseTool:
                         pickle.dump(self.credentials, token)
         
         except Exception as e:
+            # Network failures aren't authentication failures; callers fall back to local data
+            if is_network_error(e):
+                connectivity.record_failure()
+                raise
             print(f"Authentication error: {str(e)}")
             raise ValueError(f"Authentication failed: {str(e)}")
     
@@ -0,0 +1,162 @@
+import json
+from datetime import datetime
+from .connectivity import connectivity
+from .local_store import describe_age, local_store
+from .outbox import outbox
+
+class CommandFormatError(Exception):
+    """Raised when a chat command cannot be parsed; the message is the usage hint"""
+
+def _split_send_at(context: str):
+    """Split a trailing 'send at: YYYY-MM-DD HH:MM' off a message context"""
+    if "send at:" not in context:
+        return context, None
+    context, when = context.split("send at:", 1)
+    return context.strip(), datetime.strptime(when.strip(), "%Y-%m-%d %H:%M").timestamp()
+
+def _split_attachments(context: str):
+    """Split a trailing 'attach: path1, path2' off a message context"""
+    if "attach:" not in context:
+        return context, None
+    context, paths = context.split("attach:", 1)
+    return context.strip(), [path.strip() for path in paths.split(",") if path.strip()]
+
+def _offline_status(account_name: str) -> str:
+    """Offline mode and the writes waiting to be replayed"""
+    if connectivity.forced:
+        mode = "Offline mode is on (GMAIL_AI_OFFLINE): emails are read from the local store."
+    elif connectivity.offline:
+        mode = "Gmail is unreachable: emails are read from the local store until it responds again."
+    else:
+        mode = "Online."
+    lines = [mode, f"Local store {describe_age(local_store.synced_at(account_name))}."]
+    writes = local_store.pending_writes(account_name)
+    if writes:
+        lines.append(f"\n{len(writes)} change(s) waiting to be applied:")
+        for write in writes:
+            error = f" (last error: {write['error']})" if write['error'] else ""
+            details = json.dumps(write['args'])
+            if len(details) > 80:
+                details = details[:77] + "..."
+            lines.append(f"#{write['id']} {write['kind']} {details}{error}")
+    return "\n".join(lines)
+
+def route_command(message: str, session, job=None) -> str:
+    """Run a chat command against a tool session and return the response text
+
+    ``job`` is passed to long-running commands so they can report progress
+    and stop early when cancelled.
+    """
+    # Convert message to lowercase for easier processing
+    msg = message.lower()
+
+    if "connect email" in msg:
+        try:
+            email = message.split("connect email:")[1].strip()
+            # Set email for all tools
+            session.set_connected_email(email)
+            return f"Successfully connected to {email}"
+        except:
+            raise CommandFormatError("Please format your message as: 'connect email: your.email@example.com'")
+
+    elif "draft email" in msg:
+        try:
+            # Extract email details from the message
+            parts = message.split("to:")[1].split("subject:")[0].strip()
+            subject = message.split("subject:")[1].split("context:")[0].strip()
+            context, attachments = _split_attachments(message.split("context:")[1].strip())
+
+            return session['email_drafter'].draft_email(parts, subject, context, attachments)
+        except:
+            raise CommandFormatError("Please format your message as: 'draft email to: recipient@email.com subject: your subject context: your context' (optionally ending with 'attach: /path/to/file, ...')")
+
+    elif "send email" in msg:
+        try:
+            # Extract email details from the message
+            parts = message.split("to:")[1].split("subject:")[0].strip()
+            subject = message.split("subject:")[1].split("context:")[0].strip()
+            context, send_at = _split_send_at(message.split("context:")[1].strip())
+            context, attachments = _split_attachments(context)
+
+            return session['email_drafter'].send_email(parts, subject, context, attachments, send_at)
+        except:
+            raise CommandFormatError("Please format your message as: 'send email to: recipient@email.com subject: your subject context: your context' (optionally ending with 'attach: /path/to/file, ...' and/or 'send at: YYYY-MM-DD HH:MM')")
+
+    elif "analyze email" in msg:
+        try:
+            email_content = message.split("analyze email:")[1].strip()
+            return session['email_analyzer'].analyze_email(email_content)
+        except:
+            raise CommandFormatError("Please format your message as: 'analyze email: [paste email content or message ID]'")
+
+    elif "suggest response" in msg:
+        try:
+            email_content = message.split("suggest response:")[1].strip()
+            return session['response_suggester'].suggest_response(email_content)
+        except:
+            raise CommandFormatError("Please format your message as: 'suggest response: [paste email to respond to]'")
+
+    elif "list emails" in msg:
+        try:
+            return session['email_analyzer'].list_recent_emails(5)
+        except:
+            raise CommandFormatError("Error listing recent emails. Please try again.")
+
+    elif "find email" in msg:
+        try:
+            parts = message.split("find email:")[1].split("count:")[0].strip()
+            count = int(message.split("count:")[1].strip()) if "count:" in message else 1
+        except:
+            raise CommandFormatError("Please format your message as: 'find email: name_or_email count: number_of_emails'")
+        # Outside the bare except so a cancelled job isn't reported as a format error
+        return session['email_finder'].find_emails(parts, count, job=job)
+
+    elif "list labels" in msg:
+        try:
+            return session['label_manager'].list_labels()
+        except:
+            raise CommandFormatError("Error listing labels. Please try again.")
+
+    elif "add label" in msg:
+        try:
+            label = message.split("add label:")[1].split("to:")[0].strip()
+            email_id = message.split("to:")[1].strip()
+            return session['label_manager'].add_label_to_email(label, email_id)
+        except:
+            raise CommandFormatError("Please format your message as: 'add label: label_name to: email_id'")
+
+    elif "remove label" in msg:
+        try:
+            label = message.split("remove label:")[1].split("from:")[0].strip()
+            email_id = message.split("from:")[1].strip()
+            return session['label_manager'].remove_label_from_email(label, email_id)
+        except:
+            raise CommandFormatError("Please format your message as: 'remove label: label_name from: email_id'")
+
+    elif "cancel send" in msg or "retry send" in msg:
+        action = "cancel" if "cancel send" in msg else "retry"
+        try:
+            message_id = int(message.split(":", 1)[1].strip().lstrip("#"))
+        except:
+            raise CommandFormatError(f"Please format your message as: '{action} send: outbox_id'")
+        if action == "cancel":
+            if outbox.cancel(message_id, session.account_name):
+                return f"Cancelled outbox #{message_id}."
+            return f"Outbox #{message_id} can't be cancelled (it isn't waiting to be sent)."
+        if outbox.retry(message_id, session.account_name):
+            return f"Outbox #{message_id} queued for another attempt."
+        return f"Outbox #{message_id} can't be retried (only failed messages can)."
+
+    elif msg.strip() in ("outbox", "show outbox"):
+        return outbox.format_status(session.account_name)
+
+    elif msg.strip() == "offline" or msg.strip().startswith("offline:"):
+        # Offline mode is process-wide, so it is only set at startup (GMAIL_AI_OFFLINE)
+        if msg.strip()[len("offline"):].strip(" :") not in ("", "status"):
+            raise CommandFormatError("Please format your message as: 'offline: status' "
+                                     "(offline mode is switched on for the whole app with GMAIL_AI_OFFLINE=1)")
+        return _offline_status(session.account_name)
+
+    else:
+        # Use the general email request processor
+        return session['email_processor'].process_email_request(message)
@@ -0,0 +1,68 @@
+import errno
+import os
+import socket
+import threading
+import time
+import httplib2
+from google.auth.exceptions import TransportError
+
+class OfflineError(ConnectionError):
+    """Raised instead of making a Gmail request while offline"""
+
+# OSErrors that are only raised as a plain OSError for an unreachable network
+_NETWORK_ERRNOS = {errno.ENETUNREACH, errno.ENETDOWN, errno.EHOSTUNREACH, errno.EHOSTDOWN}
+
+def is_network_error(error: Exception) -> bool:
+    """Whether an exception means Gmail couldn't be reached
+
+    Only connection, DNS, timeout and transport errors count. Other
+    OSErrors (a missing attachment, a permission problem) are local
+    failures and must not switch the app to offline mode.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError, socket.gaierror, socket.herror,
+                          httplib2.HttpLib2Error, TransportError)):
+        return True
+    return isinstance(error, OSError) and error.errno in _NETWORK_ERRNOS
+
+class Connectivity:
+    """Tracks whether Gmail is reachable
+
+    After a network failure, Gmail requests fail fast with OfflineError for
+    ``retry_after`` seconds, so views fall back to the local store at once
+    instead of each waiting out its own timeout; the first request after
+    that finds out whether the network is back. ``forced`` (set from
+    ``GMAIL_AI_OFFLINE``) keeps the whole process offline.
+    """
+
+    def __init__(self, forced: bool = False, retry_after: float = 60.0):
+        self.forced = forced
+        self.retry_after = retry_after
+        self._failed_at = None
+        self._lock = threading.Lock()
+        # Set when Gmail becomes reachable again, so queued writes replay promptly
+        self.restored = threading.Event()
+
+    @property
+    def offline(self) -> bool:
+        if self.forced:
+            return True
+        with self._lock:
+            return self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_after
+
+    def record_failure(self):
+        with self._lock:
+            self._failed_at = time.monotonic()
+        self.restored.clear()
+
+    def record_success(self):
+        with self._lock:
+            was_offline = self._failed_at is not None
+            self._failed_at = None
+        if was_offline:
+            self.restored.set()
+
+# Shared by every Gmail transport in the process
+connectivity = Connectivity(
+    forced=os.getenv("GMAIL_AI_OFFLINE", "").lower() in ("1", "true", "yes"),
+    retry_after=float(os.getenv("GMAIL_AI_OFFLINE_RETRY", "60"))
+)
@@ -0,0 +1,18 @@
+import os
+
+def data_path(name: str) -> str:
+    """Path of a runtime file or directory (databases, caches, indexes)
+
+    Everything the app writes at runtime lives under ``GMAIL_AI_DATA_DIR``
+    (the working directory when unset). The variable is read on every call,
+    so stores that resolve their path on first use follow it even when it
+    is set after import.
+    """
+    directory = os.getenv("GMAIL_AI_DATA_DIR")
+    return os.path.join(directory, name) if directory else name
+
+def ensure_parent(path: str):
+    """Create the directory a runtime file goes in"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
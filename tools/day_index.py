@@ -0,0 +1,139 @@
+import calendar
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+from .data_dir import data_path, ensure_parent
+
+class DayCountIndex:
+    """Per-day message counts, optionally by label (UNREAD, IMPORTANT, ...)
+    
+    For every account and day the index keeps the message IDs seen and the
+    labels known for each, so counts can be maintained incrementally from
+    synced messages without double counting, and refreshed in bulk from
+    cheap ID-only ``messages.list`` scans. A whole month is answered from
+    memory in a single call, which is what the calendar heatmap renders.
+    """
+    
+    def __init__(self, index_file: Optional[str] = None):
+        self.index_file = index_file or data_path("day_index.json")
+        self._lock = threading.Lock()
+        # Serializes writes of the index file so they land in snapshot order
+        self._save_lock = threading.Lock()
+        # account -> date -> message id -> list of label IDs
+        self._days = self._load_index()
+    
+    def _load_index(self) -> dict:
+        """Load the saved index from file"""
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, "r") as f:
+                    return json.load(f)
+            return {}
+        except Exception as e:
+            print(f"Error loading day index: {str(e)}")
+            return {}
+    
+    def _save_index(self):
+        """Save the index to file (via a temporary file, so it is never left half written)"""
+        try:
+            with self._save_lock:
+                with self._lock:
+                    data = json.dumps(self._days)
+                ensure_parent(self.index_file)
+                temp_path = self.index_file + '.tmp'
+                with open(temp_path, "w") as f:
+                    f.write(data)
+                os.replace(temp_path, self.index_file)
+        except Exception as e:
+            print(f"Error saving day index: {str(e)}")
+    
+    def record_messages(self, account: str, records: Iterable):
+        """Add or update messages (EmailRecords with internal_date) in the index"""
+        with self._lock:
+            days = self._days.setdefault(account, {})
+            for record in records:
+                if not record.internal_date:
+                    continue
+                date_str = datetime.fromtimestamp(record.internal_date / 1000).strftime("%Y-%m-%d")
+                days.setdefault(date_str, {})[record.id] = list(record.label_ids)
+        self._save_index()
+    
+    def scan_day(self, service, account: str, date_str: str, labels: Iterable[str] = ('UNREAD',)):
+        """Rebuild one day from ID-only list calls (one per label)"""
+        labels = tuple(labels)
+        date = datetime.strptime(date_str, "%Y-%m-%d")
+        next_date = date + timedelta(days=1)
+        # Gmail reads after:YYYY/MM/DD in Pacific time; epoch seconds match the
+        # local days record_messages files messages under
+        query = f"after:{int(date.timestamp())} before:{int(next_date.timestamp())}"
+        
+        messages = {message_id: [] for message_id in self._list_ids(service, query)}
+        for label in labels:
+            for message_id in self._list_ids(service, query, label):
+                messages.setdefault(message_id, []).append(label)
+        
+        with self._lock:
+            days = self._days.setdefault(account, {})
+            # Keep labels learned from synced messages that this scan didn't cover
+            previous = days.get(date_str, {})
+            for message_id, scanned_labels in messages.items():
+                known = [l for l in previous.get(message_id, []) if l not in labels]
+                messages[message_id] = known + scanned_labels
+            days[date_str] = messages
+    
+    def scan_month(self, service, account: str, year: int, month: int, labels: Iterable[str] = ('UNREAD',)):
+        """Rebuild every day of a month (up to today) from ID-only scans"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        for day in range(1, calendar.monthrange(year, month)[1] + 1):
+            date_str = f"{year}-{month:02d}-{day:02d}"
+            if date_str > today:
+                break
+            self.scan_day(service, account, date_str, labels)
+        self._save_index()
+    
+    def _list_ids(self, service, query: str, label: Optional[str] = None) -> list:
+        """List message IDs only, following pagination"""
+        ids = []
+        page_token = None
+        while True:
+            params = {
+                'userId': 'me',
+                'q': query,
+                'maxResults': 500,
+                'fields': 'messages/id,nextPageToken'
+            }
+            if label:
+                params['labelIds'] = [label]
+            if page_token:
+                params['pageToken'] = page_token
+            
+            results = service.users().messages().list(**params).execute()
+            ids.extend(message['id'] for message in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return ids
+    
+    def day_count(self, account: str, date_str: str, label: Optional[str] = None) -> int:
+        """Count messages on a day, optionally only those carrying ``label``"""
+        with self._lock:
+            messages = self._days.get(account, {}).get(date_str, {})
+            if label is None:
+                return len(messages)
+            return sum(1 for labels in messages.values() if label in labels)
+    
+    def month_counts(self, account: str, year: int, month: int, label: Optional[str] = None) -> Dict[int, int]:
+        """Get {day of month: count} for a whole month in one call"""
+        prefix = f"{year}-{month:02d}-"
+        counts = {}
+        with self._lock:
+            for date_str, messages in self._days.get(account, {}).items():
+                if not date_str.startswith(prefix):
+                    continue
+                if label is None:
+                    count = len(messages)
+                else:
+                    count = sum(1 for labels in messages.values() if label in labels)
+                counts[int(date_str[len(prefix):])] = count
+        return counts
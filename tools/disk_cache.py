@@ -0,0 +1,68 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+from .data_dir import ensure_parent
+
+class DiskCache:
+    """Small JSON key/value cache in SQLite, shared by every process using the file
+
+    Used by the REST API so all uvicorn workers see each other's fetched
+    messages and summaries. WAL mode lets readers proceed while one
+    process writes.
+    """
+
+    def __init__(self, path: str = "api_cache.sqlite3", default_ttl: Optional[float] = 300.0):
+        self.path = path
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, creating the database on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            ensure_parent(self.path)
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=30)
+            with self._schema_lock:
+                if not self._schema_ready:
+                    with connection:
+                        connection.execute("PRAGMA journal_mode=WAL")
+                        connection.execute(
+                            "CREATE TABLE IF NOT EXISTS cache ("
+                            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+                        )
+                    self._schema_ready = True
+        return connection
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = -1):
+        """Store a value; ``ttl=None`` never expires, the default uses ``default_ttl``"""
+        if ttl == -1:
+            ttl = self.default_ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+
+    def delete(self, key: str):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
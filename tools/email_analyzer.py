@@ -1,114 +1,77 @@
-from googleapiclient.discovery import build
+from typing import List
 from .base_tool import BaseTool
+from .connectivity import is_network_error
+from .local_store import local_store, offline_notice
+from .records import EmailRecord
 
 class EmailAnalyzer(BaseTool):
     """Tool for analyzing emails"""
     
-    def __init__(self):
-        super().__init__()
-        self.service = None
+    def get_record(self, email_id: str, full: bool = True) -> EmailRecord:
+        """Fetch an email as a record, with its body unless ``full`` is False"""
+        self._ensure_service()
+        record = self._fetch_record(email_id, full=full)
+        local_store.save(self.account_name, [record])
+        return record
     
-    def _ensure_service(self):
-        """Ensure we have an authenticated Gmail service"""
-        self.ensure_authenticated()
-        if not self.service:
-            self.service = build('gmail', 'v1', credentials=self.credentials)
-    
-    def analyze_email(self, email_id: str) -> str:
-        """Analyze an email by its ID"""
-        try:
-            self._ensure_service()
-            
-            # Get the email
-            message = self.service.users().messages().get(
-                userId='me',
-                id=email_id,
-                format='full'
-            ).execute()
-            
-            # Extract headers
-            headers = message['payload']['headers']
-            subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No subject')
-            from_email = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown sender')
-            date = next((h['value'] for h in headers if h['name'].lower() == 'date'), 'Unknown date')
-            
-            # Extract body
-            if 'parts' in message['payload']:
-                parts = message['payload']['parts']
-                body = next((
-                    part['body'].get('data', '')
-                    for part in parts
-                    if part['mimeType'] == 'text/plain'
-                ), '')
-            else:
-                body = message['payload']['body'].get('data', '')
-            
-            import base64
-            import quopri
-            
-            # Decode body
-            try:
-                decoded_body = base64.urlsafe_b64decode(body.encode('ASCII')).decode('utf-8')
-            except:
-                try:
-                    decoded_body = quopri.decodestring(body).decode('utf-8')
-                except:
-                    decoded_body = "Could not decode email body"
-            
-            analysis = f"""
+    def format_analysis(self, record: EmailRecord) -> str:
+        """Format the analysis of an already fetched email"""
+        body = record.body or ''
+        return f"""
 Email Analysis:
 --------------
-From: {from_email}
-Date: {date}
-Subject: {subject}
+From: {record.sender}
+Date: {record.date}
+Subject: {record.subject}
 
 Content Summary:
-{decoded_body[:500]}{'...' if len(decoded_body) > 500 else ''}
+{body[:500]}{'...' if len(body) > 500 else ''}
 """
-            return analysis
+    
+    def analyze_email(self, email_id: str) -> str:
+        """Analyze an email by its ID"""
+        try:
+            return self.format_analysis(self.get_record(email_id))
             
         except Exception as e:
+            if is_network_error(e) and self.account_name:
+                record = local_store.get_record(self.account_name, email_id)
+                notice = offline_notice(local_store.synced_at(self.account_name))
+                if record is None:
+                    return notice + f"Email {email_id} isn't saved locally."
+                return notice + self.format_analysis(record)
             return f"Error analyzing email: {str(e)}"
     
+    def recent_records(self, count: int = 5) -> List[EmailRecord]:
+        """Get recent inbox emails as header-only records"""
+        self._ensure_service()
+        
+        # Get recent messages
+        results = self.service.users().messages().list(
+            userId='me',
+            maxResults=count,
+            labelIds=['INBOX']
+        ).execute()
+        
+        records = [self._fetch_record(msg['id']) for msg in results.get('messages', [])]
+        local_store.save(self.account_name, records, 'inbox')
+        return records
+    
     def list_recent_emails(self, count: int = 5) -> str:
         """List recent emails"""
         try:
-            self._ensure_service()
-            
-            # Get recent messages
-            results = self.service.users().messages().list(
-                userId='me',
-                maxResults=count,
-                labelIds=['INBOX']
-            ).execute()
+            records = self.recent_records(count)
             
-            messages = results.get('messages', [])
-            
-            if not messages:
+            if not records:
                 return "No recent emails found."
             
-            email_list = []
-            for msg in messages:
-                message = self.service.users().messages().get(
-                    userId='me',
-                    id=msg['id'],
-                    format='metadata',
-                    metadataHeaders=['From', 'Subject', 'Date']
-                ).execute()
-                
-                headers = message['payload']['headers']
-                subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No subject')
-                from_email = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown sender')
-                date = next((h['value'] for h in headers if h['name'].lower() == 'date'), 'Unknown date')
-                
-                email_list.append(f"""
-Email ID: {msg['id']}
-From: {from_email}
-Date: {date}
-Subject: {subject}
-""")
-            
-            return "\n".join(email_list)
+            return "\n".join(record.format_summary() for record in records)
             
         except Exception as e:
-            return f"Error listing emails: {str(e)}" 
\ No newline at end of file
+            if is_network_error(e) and self.account_name:
+                records = local_store.recent(self.account_name, 'INBOX', count)
+                notice = offline_notice(local_store.synced_at(self.account_name, 'inbox'))
+                if not records:
+                    return notice + "No saved emails found."
+                return notice + "\n".join(record.format_summary() for record in records)
+            return f"Error listing emails: {str(e)}"
@@ -1,45 +1,78 @@
-from googleapiclient.discovery import build
+import base64
+import os
+import tempfile
+from email.mime.text import MIMEText
+from typing import List, Optional
+from googleapiclient.http import MediaIoBaseUpload
+from .attachments import UPLOAD_CHUNK_SIZE, run_resumable, write_mime_message
 from .base_tool import BaseTool
+from .connectivity import is_network_error
+from .local_store import local_store
+from .outbox import outbox
+
+def render_message(to: str, subject: str, body: str, sender: Optional[str] = None) -> str:
+    """Render a plain text email as base64url for the Gmail API
+
+    A module-level function so bulk sends can render in a process pool.
+    """
+    message = MIMEText(body)
+    message['to'] = to
+    message['subject'] = subject
+    if sender:
+        message['from'] = sender
+    
+    # Encode the message
+    return base64.urlsafe_b64encode(message.as_bytes()).decode()
 
 class EmailDrafter(BaseTool):
     """Tool for drafting and sending emails"""
     
-    def __init__(self):
-        super().__init__()
-        self.service = None
-    
-    def _ensure_service(self):
-        """Ensure we have an authenticated Gmail service"""
-        self.ensure_authenticated()
-        if not self.service:
-            self.service = build('gmail', 'v1', credentials=self.credentials)
+    def create_draft(self, to: str, subject: str, context: str, attachments: Optional[List[str]] = None) -> dict:
+        """Create a draft and return the draft resource"""
+        self._ensure_service()
+        if attachments:
+            return self._upload_message('draft', to, subject, context, attachments)
+        
+        # Create the email message
+        message = {
+            'message': {
+                'raw': self._create_message(to, subject, context)
+            }
+        }
+        
+        # Save the draft
+        return self.service.users().drafts().create(
+            userId='me',
+            body=message
+        ).execute()
     
-    def draft_email(self, to: str, subject: str, context: str) -> str:
+    def draft_email(self, to: str, subject: str, context: str, attachments: Optional[List[str]] = None) -> str:
         """Draft an email with the given parameters"""
         try:
-            self._ensure_service()
-            
-            # Create the email message
-            message = {
-                'message': {
-                    'raw': self._create_message(to, subject, context)
-                }
-            }
-            
-            # Save the draft
-            draft = self.service.users().drafts().create(
-                userId='me',
-                body=message
-            ).execute()
-            
+            draft = self.create_draft(to, subject, context, attachments)
             return f"Draft created successfully. Draft ID: {draft['id']}"
         except Exception as e:
+            if is_network_error(e) and self.account_name:
+                write_id = local_store.queue_write(self.account_name, 'draft', to=to, subject=subject,
+                                                   context=context, attachments=attachments or [])
+                return f"Offline: draft saved locally and will be created in Gmail when back online (pending write #{write_id})."
             return f"Error creating draft: {str(e)}"
     
-    def send_email(self, to: str, subject: str, context: str) -> str:
-        """Send an email with the given parameters"""
+    def send_email(self, to: str, subject: str, context: str, attachments: Optional[List[str]] = None,
+                   send_at: Optional[float] = None) -> str:
+        """Send an email with the given parameters
+        
+        While an outbox sender is running (or for a scheduled ``send_at``),
+        the rendered message is queued and delivered in the background.
+        """
         try:
+            if outbox.accepting or send_at:
+                return self._queue_message(to, subject, context, attachments, send_at)
+            
             self._ensure_service()
+            if attachments:
+                sent_message = self._upload_message('send', to, subject, context, attachments)
+                return f"Email sent successfully. Message ID: {sent_message['id']}"
             
             # Create the email message
             message = {
@@ -56,16 +89,55 @@ class EmailDrafter(BaseTool):
         except Exception as e:
             return f"Error sending email: {str(e)}"
     
+    def _queue_message(self, to: str, subject: str, body: str, attachments: Optional[List[str]],
+                       send_at: Optional[float]) -> str:
+        """Render a message into the outbox and return without contacting Gmail"""
+        if not outbox.accepting:
+            raise ValueError("Scheduled sending needs the app's outbox sender to be running")
+        path = outbox.new_file()
+        try:
+            with open(path, 'wb') as f:
+                if attachments:
+                    write_mime_message(f, to, subject, body, attachments, self.connected_email)
+                else:
+                    f.write(base64.urlsafe_b64decode(self._create_message(to, subject, body)))
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            os.remove(path)
+            raise
+        message_id = outbox.enqueue(self.account_name, to, subject, path, send_at)
+        if send_at:
+            return f"Email scheduled (outbox #{message_id})."
+        return f"Email queued for sending (outbox #{message_id}). Type 'outbox' to check its status."
+    
+    def send_file(self, path: str) -> dict:
+        """Send a message already rendered to ``path`` and return the sent message
+        
+        Not retried here: the outbox sender decides whether to try again.
+        """
+        self._ensure_service()
+        with open(path, 'rb') as f:
+            media = MediaIoBaseUpload(f, mimetype='message/rfc822', chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+            request = self.service.users().messages().send(userId='me', body={}, media_body=media)
+            return run_resumable(request, num_retries=0)
+    
     def _create_message(self, to: str, subject: str, body: str) -> str:
         """Create a base64 encoded email message"""
-        from email.mime.text import MIMEText
-        import base64
-        
-        message = MIMEText(body)
-        message['to'] = to
-        message['subject'] = subject
-        if self.connected_email:
-            message['from'] = self.connected_email
+        return render_message(to, subject, body, self.connected_email)
+    
+    def _upload_message(self, method: str, to: str, subject: str, body: str, attachments: List[str]) -> dict:
+        """Draft or send a message with attachments through a resumable media upload
         
-        # Encode the message
-        return base64.urlsafe_b64encode(message.as_bytes()).decode() 
\ No newline at end of file
+        The MIME message is streamed to a temporary file and uploaded from it
+        in chunks, so neither step holds the attachments in memory.
+        """
+        with tempfile.TemporaryFile() as spool:
+            write_mime_message(spool, to, subject, body, attachments, self.connected_email)
+            spool.seek(0)
+            media = MediaIoBaseUpload(spool, mimetype='message/rfc822', chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+            if method == 'draft':
+                request = self.service.users().drafts().create(userId='me', body={}, media_body=media)
+            else:
+                request = self.service.users().messages().send(userId='me', body={}, media_body=media)
+            return run_resumable(request) 
\ No newline at end of file
@@ -1,58 +1,83 @@
-from googleapiclient.discovery import build
+from typing import List, Optional, Tuple
 from .base_tool import BaseTool
+from .connectivity import is_network_error
+from .jobs import JobCancelled
+from .local_store import local_store, offline_notice
+from .records import EmailRecord
 
 class EmailFinder(BaseTool):
     """Tool for finding emails"""
     
-    def __init__(self):
-        super().__init__()
-        self.service = None
+    def search(self, query: str, count: int = 5, full: bool = False, job=None) -> List[EmailRecord]:
+        """Find emails matching the query as records
+        
+        With ``full=True`` each message is fetched once with its body so
+        callers never need to fetch it again. Records are published to
+        ``job`` as partial results when given.
+        """
+        self._ensure_service()
+        
+        # Search for messages
+        results = self.service.users().messages().list(
+            userId='me',
+            q=query,
+            maxResults=count
+        ).execute()
+        
+        messages = results.get('messages', [])
+        
+        records = []
+        if job:
+            job.update(total=len(messages), fetched=0)
+        for msg in messages:
+            if job:
+                job.check_cancelled()
+            record = self._fetch_record(msg['id'], full=full)
+            records.append(record)
+            if job:
+                job.increment('fetched')
+                job.add_result(record)
+        
+        local_store.save(self.account_name, records, 'search')
+        return records
     
-    def _ensure_service(self):
-        """Ensure we have an authenticated Gmail service"""
-        self.ensure_authenticated()
-        if not self.service:
-            self.service = build('gmail', 'v1', credentials=self.credentials)
+    def list_ids(self, query: str = '', label_ids: Optional[List[str]] = None, page_size: int = 20,
+                 page_token: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """Get one page of matching message IDs plus the next page token"""
+        self._ensure_service()
+        
+        params = {'userId': 'me', 'q': query, 'maxResults': page_size}
+        if label_ids:
+            params['labelIds'] = label_ids
+        if page_token:
+            params['pageToken'] = page_token
+        results = self.service.users().messages().list(**params).execute()
+        
+        return [msg['id'] for msg in results.get('messages', [])], results.get('nextPageToken')
     
-    def find_emails(self, query: str, count: int = 5) -> str:
-        """Find emails matching the query"""
+    def find_emails(self, query: str, count: int = 5, job=None) -> str:
+        """Find emails matching the query, publishing progress to ``job`` when given"""
         try:
-            self._ensure_service()
+            records = self.search(query, count, job=job)
             
-            # Search for messages
-            results = self.service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=count
-            ).execute()
-            
-            messages = results.get('messages', [])
-            
-            if not messages:
+            if not records:
                 return f"No emails found matching query: {query}"
             
-            email_list = []
-            for msg in messages:
-                message = self.service.users().messages().get(
-                    userId='me',
-                    id=msg['id'],
-                    format='metadata',
-                    metadataHeaders=['From', 'Subject', 'Date']
-                ).execute()
-                
-                headers = message['payload']['headers']
-                subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No subject')
-                from_email = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown sender')
-                date = next((h['value'] for h in headers if h['name'].lower() == 'date'), 'Unknown date')
-                
-                email_list.append(f"""
-Email ID: {msg['id']}
-From: {from_email}
-Date: {date}
-Subject: {subject}
-""")
-            
+            email_list = [record.format_summary() for record in records]
             return f"Search Results for '{query}':\n\n" + "\n".join(email_list)
             
+        except JobCancelled:
+            raise
         except Exception as e:
-            return f"Error finding emails: {str(e)}" 
\ No newline at end of file
+            if is_network_error(e) and self.account_name:
+                return self._find_saved(query, count)
+            return f"Error finding emails: {str(e)}"
+    
+    def _find_saved(self, query: str, count: int) -> str:
+        """Answer a search from the local store while Gmail is unreachable"""
+        records = local_store.search(self.account_name, query, count)
+        notice = offline_notice(local_store.synced_at(self.account_name))
+        if not records:
+            return notice + f"No saved emails found matching query: {query}"
+        email_list = [record.format_summary() for record in records]
+        return notice + f"Search Results for '{query}':\n\n" + "\n".join(email_list)
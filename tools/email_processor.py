@@ -1,19 +1,9 @@
-from googleapiclient.discovery import build
 from .base_tool import BaseTool
+from . import triage
 
 class EmailProcessor(BaseTool):
     """Tool for processing general email requests"""
     
-    def __init__(self):
-        super().__init__()
-        self.service = None
-    
-    def _ensure_service(self):
-        """Ensure we have an authenticated Gmail service"""
-        self.ensure_authenticated()
-        if not self.service:
-            self.service = build('gmail', 'v1', credentials=self.credentials)
-    
     def process_email_request(self, request: str) -> str:
         """Process a general email request"""
         try:
@@ -28,8 +18,10 @@ class EmailProcessor(BaseTool):
                 return self._get_important_emails()
             elif "starred" in request:
                 return self._get_starred_emails()
+            elif "priority" in request:
+                return self._get_priority_emails()
             else:
-                return "I can help you with: unread emails, important emails, or starred emails"
+                return "I can help you with: unread emails, important emails, starred emails, or priority emails"
             
         except Exception as e:
             return f"Error processing request: {str(e)}"
@@ -73,30 +65,34 @@ class EmailProcessor(BaseTool):
         except Exception as e:
             return f"Error getting starred emails: {str(e)}"
     
+    def _get_priority_emails(self) -> str:
+        """Get the recent inbox emails the triage model ranks highest"""
+        try:
+            results = self.service.users().messages().list(
+                userId='me',
+                labelIds=['INBOX'],
+                maxResults=25
+            ).execute()
+            
+            records = [self._fetch_record(msg['id']) for msg in results.get('messages', [])]
+            scores = triage.rank(self.account_name, records)
+            if records and scores[0] is None:
+                return "No triage model trained yet. Run: python -m gmail_ai triage-train"
+            
+            ranked = sorted(zip(scores, records), key=lambda pair: -pair[0])[:5]
+            if not ranked:
+                return "No priority emails found."
+            
+            email_list = [f"{record.format_summary()}Priority: {score:.0%}\n" for score, record in ranked]
+            return "Priority Emails:\n\n" + "\n".join(email_list)
+        except Exception as e:
+            return f"Error getting priority emails: {str(e)}"
+    
     def _format_email_list(self, messages: list, category: str) -> str:
         """Format a list of email messages"""
         if not messages:
             return f"No {category.lower()} emails found."
         
-        email_list = []
-        for msg in messages:
-            message = self.service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='metadata',
-                metadataHeaders=['From', 'Subject', 'Date']
-            ).execute()
-            
-            headers = message['payload']['headers']
-            subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No subject')
-            from_email = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown sender')
-            date = next((h['value'] for h in headers if h['name'].lower() == 'date'), 'Unknown date')
-            
-            email_list.append(f"""
-Email ID: {msg['id']}
-From: {from_email}
-Date: {date}
-Subject: {subject}
-""")
+        email_list = [self._fetch_record(msg['id']).format_summary() for msg in messages]
         
         return f"{category} Emails:\n\n" + "\n".join(email_list) 
\ No newline at end of file
@@ -0,0 +1,121 @@
+import os
+import re
+import threading
+import time
+import requests
+from . import metrics
+from .tracing import get_tracer
+
+tracer = get_tracer(__name__)
+
+GEMINI_API_ROOT = os.getenv("GEMINI_API_ENDPOINT", "https://generativelanguage.googleapis.com").rstrip("/")
+
+_MODEL_PATH = re.compile(r'/models/([^/:]+):')
+
+_local = threading.local()
+
+# Optional requests transport adapter mounted on every session (e.g. a cassette)
+_transport_adapter = None
+_generation = 0
+
+class MeteredSession(requests.Session):
+    """requests.Session recording Gemini latency, bytes, status and retries"""
+
+    def __init__(self):
+        super().__init__()
+        self._last_failure = None
+
+    def request(self, method, url, *args, **kwargs):
+        match = _MODEL_PATH.search(url)
+        model = match.group(1) if match else 'other'
+        with tracer.start_as_current_span(f"HTTP {method}", attributes={'gemini.model': model}) as span:
+            return self._request(span, model, method, url, *args, **kwargs)
+
+    def _request(self, span, model, method, url, *args, **kwargs):
+        account = metrics.current_account()
+        if self._last_failure == (method, url):
+            metrics.gemini_retries.inc(account=account, model=model)
+            span.set_attribute('retry', True)
+
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            status = str(response.status_code)
+            sent = response.request.body or b''
+            metrics.gemini_bytes.inc(len(sent), account=account, model=model, direction='sent')
+            metrics.gemini_bytes.inc(len(response.content), account=account, model=model, direction='received')
+            span.set_attributes({
+                'http.status_code': response.status_code,
+                'http.request_bytes': len(sent),
+                'http.response_bytes': len(response.content)
+            })
+            return response
+        finally:
+            metrics.gemini_latency.observe(time.perf_counter() - start, account=account, model=model)
+            metrics.gemini_requests.inc(account=account, model=model, status=status)
+            failed = status == 'error' or status == '429' or status.startswith('5')
+            self._last_failure = (method, url) if failed else None
+
+def get_http_session() -> requests.Session:
+    """Get the pooled HTTP session for the calling thread"""
+    session = getattr(_local, 'session', None)
+    if session is None or getattr(_local, 'generation', None) != _generation:
+        session = _local.session = MeteredSession()
+        _local.generation = _generation
+        if _transport_adapter is not None:
+            session.mount("http://", _transport_adapter)
+            session.mount("https://", _transport_adapter)
+    return session
+
+def set_transport_adapter(adapter):
+    """Send Gemini traffic through a requests adapter (None restores the default)
+
+    Sessions already created on any thread are replaced on their next use.
+    """
+    global _transport_adapter, _generation
+    _transport_adapter = adapter
+    _generation += 1
+
+class GeminiClient:
+    """Minimal Gemini REST client
+
+    Unlike ``genai.configure`` the API key lives on the client instead of in
+    module-global state, so sessions using different accounts can summarize
+    concurrently without overwriting each other's key.
+    """
+
+    def __init__(self, api_key: str, model: str = 'gemini-2.0-flash-001'):
+        self.api_key = api_key
+        self.model = model
+
+    @property
+    def api_url(self) -> str:
+        return f"{GEMINI_API_ROOT}/v1beta/models/{self.model}:generateContent"
+
+    def generate_content(self, prompt: str, generation_config: dict = None, safety_settings: list = None) -> str:
+        """Generate text for a prompt, raising on HTTP errors"""
+        payload = {
+            "contents": [{
+                "parts": [{"text": prompt}]
+            }]
+        }
+        if generation_config:
+            payload["generationConfig"] = generation_config
+        if safety_settings:
+            payload["safetySettings"] = safety_settings
+
+        with tracer.start_as_current_span("gemini generateContent", attributes={'gemini.model': self.model}) as span:
+            span.set_attribute('prompt_chars', len(prompt))
+            response = get_http_session().post(
+                self.api_url,
+                params={'key': self.api_key},
+                json=payload,
+                timeout=60
+            )
+            response.raise_for_status()
+
+            result = response.json()
+            if 'candidates' in result and len(result['candidates']) > 0:
+                return result['candidates'][0]['content']['parts'][0]['text']
+            return "No response generated."
@@ -0,0 +1,262 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+from .data_dir import data_path, ensure_parent
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been cancelled or abandoned"""
+
+@dataclass
+class Job:
+    """A long-running mailbox operation with progress and partial results"""
+    id: str
+    kind: str
+    status: str = 'queued'  # queued, running, done, failed, cancelled, interrupted
+    progress: dict = field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    # Runtime-only state (not persisted)
+    result: Any = field(default=None, repr=False)
+    results: List[Any] = field(default_factory=list, repr=False)
+    last_seen: float = field(default_factory=time.time, repr=False)
+    followed: bool = field(default=False, repr=False)
+    abandon_after: float = field(default=30.0, repr=False)
+    version: int = field(default=0, repr=False)
+    _cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    _changed: threading.Condition = field(default_factory=threading.Condition, repr=False)
+
+    FINISHED = ('done', 'failed', 'cancelled', 'interrupted')
+
+    @property
+    def finished(self) -> bool:
+        return self.status in self.FINISHED
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Ask the job to stop at its next checkpoint"""
+        self._cancel_event.set()
+        self._notify()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the job was cancelled or abandoned; call between API requests"""
+        if self.followed and time.time() - self.last_seen > self.abandon_after:
+            # Whoever was watching went away without closing the stream
+            self._cancel_event.set()
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.id} cancelled")
+
+    def update(self, **progress):
+        """Merge progress counters (e.g. total=50, fetched=23)"""
+        with self._changed:
+            self.progress.update(progress)
+        self._notify()
+
+    def increment(self, key: str, amount: int = 1):
+        """Increment a single progress counter"""
+        with self._changed:
+            self.progress[key] = self.progress.get(key, 0) + amount
+        self._notify()
+
+    def add_result(self, item):
+        """Publish a partial result"""
+        with self._changed:
+            self.results.append(item)
+        self._notify()
+
+    def set_result(self, index: int, item):
+        """Replace a partial result published earlier (e.g. once its details are filled in)"""
+        with self._changed:
+            self.results[index] = item
+        self._notify()
+
+    def partial_results(self) -> list:
+        """Get a copy of the partial results published so far"""
+        with self._changed:
+            return list(self.results)
+
+    def progress_text(self) -> str:
+        """Human readable progress, e.g. '23/50 fetched, 10 summarized'"""
+        progress = dict(self.progress)
+        total = progress.pop('total', None)
+        parts = []
+        for key, value in progress.items():
+            if total is not None and not parts:
+                parts.append(f"{value}/{total} {key}")
+            else:
+                parts.append(f"{value} {key}")
+        return ", ".join(parts) if parts else self.status
+
+    def wait_for_update(self, version: int, timeout: float) -> int:
+        """Block until the job changes after ``version`` (or timeout) and return the new version"""
+        with self._changed:
+            if self.version == version and not self.finished:
+                self._changed.wait(timeout)
+            return self.version
+
+    def _notify(self):
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+class JobManager:
+    """Runs long mailbox operations on a worker pool and tracks their state
+
+    Job state is persisted to ``state_file`` so it survives restarts (jobs
+    that were running when the process died are marked ``interrupted``).
+    Handlers follow a job with :meth:`follow`, which cancels it when the
+    follower goes away so abandoned requests stop spending API quota.
+    """
+
+    def __init__(self, max_workers: int = 4, state_file: Optional[str] = None,
+                 abandon_after: float = 30.0, keep_jobs: int = 100):
+        self.state_file = state_file or data_path("jobs.json")
+        self.abandon_after = abandon_after
+        self.keep_jobs = keep_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gmail-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # Serializes writes of the state file so they land in snapshot order
+        self._save_lock = threading.Lock()
+        self._history = self._load_history()
+
+    def _load_history(self) -> List[dict]:
+        """Load persisted job state from file"""
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, "r") as f:
+                    history = json.load(f)
+                for job in history:
+                    if job['status'] in ('queued', 'running'):
+                        job['status'] = 'interrupted'
+                return history
+            return []
+        except Exception as e:
+            print(f"Error loading jobs: {str(e)}")
+            return []
+
+    def _save_state(self):
+        """Save job state to file
+
+        Written to a temporary file and swapped in, so a crash (or another
+        worker's save) never leaves a truncated or interleaved file behind.
+        """
+        try:
+            with self._save_lock:
+                with self._lock:
+                    live = [job.to_dict() for job in self._jobs.values()]
+                    live_ids = {job['id'] for job in live}
+                    history = [job for job in self._history if job['id'] not in live_ids]
+                    jobs_data = (history + live)[-self.keep_jobs:]
+                ensure_parent(self.state_file)
+                temp_path = self.state_file + '.tmp'
+                with open(temp_path, "w") as f:
+                    json.dump(jobs_data, f, indent=2)
+                os.replace(temp_path, self.state_file)
+        except Exception as e:
+            print(f"Error saving jobs: {str(e)}")
+
+    def submit(self, kind: str, fn: Callable, *args, **kwargs) -> Job:
+        """Run ``fn(job, *args, **kwargs)`` on the worker pool"""
+        job = Job(id=uuid.uuid4().hex[:12], kind=kind, abandon_after=self.abandon_after)
+        with self._lock:
+            self._jobs[job.id] = job
+            # Move finished jobs beyond the retention limit to the persisted history
+            finished = [j for j in self._jobs.values() if j.finished]
+            evicted = finished[:max(0, len(finished) - self.keep_jobs)]
+            if evicted:
+                evicted_ids = {old.id for old in evicted}
+                history = [j for j in self._history if j['id'] not in evicted_ids]
+                self._history = (history + [old.to_dict() for old in evicted])[-self.keep_jobs:]
+                for old in evicted:
+                    del self._jobs[old.id]
+        self._save_state()
+        # Run in a copy of the caller's context so metrics labels carry over
+        context = contextvars.copy_context()
+        self._executor.submit(context.run, self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn: Callable, args, kwargs):
+        if job.cancelled:
+            self._finish(job, 'cancelled')
+            return
+
+        job.status = 'running'
+        self._save_state()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            self._finish(job, 'done')
+        except JobCancelled:
+            self._finish(job, 'cancelled')
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, 'failed')
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        job._notify()
+        self._save_state()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job by ID"""
+        job = self.get(job_id)
+        if not job:
+            return False
+        job.cancel()
+        return True
+
+    def list_jobs(self) -> List[dict]:
+        """Get persisted and live job state, newest last"""
+        with self._lock:
+            live = [job.to_dict() for job in self._jobs.values()]
+            live_ids = {job['id'] for job in live}
+            return [job for job in self._history if job['id'] not in live_ids] + live
+
+    def follow(self, job: Job, poll_interval: float = 0.5):
+        """Yield the job every time it changes until it finishes
+
+        Closing the generator (Gradio does this when the client disconnects
+        or the event is cancelled) cancels the job.
+        """
+        version = -1
+        job.followed = True
+        try:
+            while True:
+                job.last_seen = time.time()
+                new_version = job.wait_for_update(version, poll_interval)
+                if new_version != version or job.finished:
+                    version = new_version
+                    yield job
+                if job.finished:
+                    return
+        finally:
+            if not job.finished:
+                job.cancel()
+
+# Shared job manager used by the UI handlers
+job_manager = JobManager()
@@ -1,27 +1,21 @@
-from googleapiclient.discovery import build
 from .base_tool import BaseTool
+from .connectivity import is_network_error
+from .local_store import local_store
 
 class LabelManager(BaseTool):
     """Tool for managing Gmail labels"""
     
-    def __init__(self):
-        super().__init__()
-        self.service = None
-    
-    def _ensure_service(self):
-        """Ensure we have an authenticated Gmail service"""
-        self.ensure_authenticated()
-        if not self.service:
-            self.service = build('gmail', 'v1', credentials=self.credentials)
+    def get_labels(self) -> list:
+        """Get all Gmail labels as label resources"""
+        self._ensure_service()
+        results = self.service.users().labels().list(userId='me').execute()
+        return results.get('labels', [])
     
     def list_labels(self) -> str:
         """List all Gmail labels"""
         try:
-            self._ensure_service()
-            
             # Get all labels
-            results = self.service.users().labels().list(userId='me').execute()
-            labels = results.get('labels', [])
+            labels = self.get_labels()
             
             if not labels:
                 return "No labels found."
@@ -40,48 +34,93 @@ Type: {label['type']}
         except Exception as e:
             return f"Error listing labels: {str(e)}"
     
+    def add_label(self, label_name: str, email_id: str):
+        """Add a label to an email, creating the label if needed"""
+        self._ensure_service()
+        
+        # Get or create the label
+        label_id = self._get_or_create_label(label_name)
+        
+        # Modify the email's labels
+        self.service.users().messages().modify(
+            userId='me',
+            id=email_id,
+            body={'addLabelIds': [label_id]}
+        ).execute()
+    
+    def remove_label(self, label_name: str, email_id: str) -> bool:
+        """Remove a label from an email; False if the label doesn't exist"""
+        self._ensure_service()
+        
+        # Get the label ID
+        label_id = self._get_label_id(label_name)
+        if not label_id:
+            return False
+        
+        # Modify the email's labels
+        self.service.users().messages().modify(
+            userId='me',
+            id=email_id,
+            body={'removeLabelIds': [label_id]}
+        ).execute()
+        return True
+    
     def add_label_to_email(self, label_name: str, email_id: str) -> str:
         """Add a label to an email"""
         try:
-            self._ensure_service()
-            
-            # Get or create the label
-            label_id = self._get_or_create_label(label_name)
-            
-            # Modify the email's labels
-            self.service.users().messages().modify(
-                userId='me',
-                id=email_id,
-                body={'addLabelIds': [label_id]}
-            ).execute()
-            
+            self.add_label(label_name, email_id)
             return f"Successfully added label '{label_name}' to email {email_id}"
             
         except Exception as e:
+            if is_network_error(e) and self.account_name:
+                return self._queue_change('add_label', label_name, email_id)
             return f"Error adding label: {str(e)}"
     
     def remove_label_from_email(self, label_name: str, email_id: str) -> str:
         """Remove a label from an email"""
         try:
-            self._ensure_service()
-            
-            # Get the label ID
-            label_id = self._get_label_id(label_name)
-            if not label_id:
+            if not self.remove_label(label_name, email_id):
                 return f"Label '{label_name}' not found"
-            
-            # Modify the email's labels
-            self.service.users().messages().modify(
-                userId='me',
-                id=email_id,
-                body={'removeLabelIds': [label_id]}
-            ).execute()
-            
             return f"Successfully removed label '{label_name}' from email {email_id}"
             
         except Exception as e:
+            if is_network_error(e) and self.account_name:
+                return self._queue_change('remove_label', label_name, email_id)
             return f"Error removing label: {str(e)}"
     
+    def _queue_change(self, kind: str, label_name: str, email_id: str) -> str:
+        """Queue a label change made while offline for replay"""
+        write_id = local_store.queue_write(self.account_name, kind, label_name=label_name, email_id=email_id)
+        return (f"Offline: label change on email {email_id} saved locally and will be applied "
+                f"when back online (pending write #{write_id}).")
+    
+    def resolve_label_ids(self, label_names: list) -> dict:
+        """Map label names to IDs with a single list call, creating missing labels"""
+        self._ensure_service()
+        existing = {label['name'].lower(): label['id'] for label in self.get_labels()}
+        
+        label_ids = {}
+        for label_name in label_names:
+            label_id = existing.get(label_name.lower())
+            if not label_id:
+                label_id = existing[label_name.lower()] = self._create_label(label_name)
+            label_ids[label_name] = label_id
+        return label_ids
+    
+    def batch_modify(self, email_ids: list, add_label_ids: list = (), remove_label_ids: list = ()) -> int:
+        """Apply one label change to many emails, 1000 per batchModify call"""
+        self._ensure_service()
+        for start in range(0, len(email_ids), 1000):
+            self.service.users().messages().batchModify(
+                userId='me',
+                body={
+                    'ids': email_ids[start:start + 1000],
+                    'addLabelIds': list(add_label_ids),
+                    'removeLabelIds': list(remove_label_ids)
+                }
+            ).execute()
+        return len(email_ids)
+    
     def _get_or_create_label(self, label_name: str) -> str:
         """Get a label ID by name or create it if it doesn't exist"""
         # Try to get existing label
@@ -89,7 +128,10 @@ Type: {label['type']}
         if label_id:
             return label_id
         
-        # Create new label
+        return self._create_label(label_name)
+    
+    def _create_label(self, label_name: str) -> str:
+        """Create a visible label and return its ID"""
         label = self.service.users().labels().create(
             userId='me',
             body={
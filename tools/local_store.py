@@ -0,0 +1,293 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional
+from .data_dir import data_path, ensure_parent
+from .records import EmailRecord
+
+_COLUMNS = "id, thread_id, sender, subject, date, snippet, label_ids, internal_date, body, has_attachments"
+_QUERY_TERM = re.compile(r'(\w+):("[^"]*"|\S+)|"([^"]*)"|(\S+)')
+_LABEL_ALIASES = {'unread': 'UNREAD', 'starred': 'STARRED', 'important': 'IMPORTANT'}
+
+def _like(value: str) -> str:
+    escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+def describe_age(synced_at: Optional[float]) -> str:
+    """'5 minutes ago' style age of a sync time"""
+    if synced_at is None:
+        return "never synced"
+    age = max(0, time.time() - synced_at)
+    for unit, seconds in (('day', 86400), ('hour', 3600), ('minute', 60)):
+        if age >= seconds:
+            count = int(age // seconds)
+            return f"synced {count} {unit}{'s' if count != 1 else ''} ago"
+    return "synced just now"
+
+def offline_notice(synced_at: Optional[float]) -> str:
+    """Prefix for chat responses answered from the local store"""
+    return f"[Offline: showing saved emails, {describe_age(synced_at)}]\n\n"
+
+class LocalStore:
+    """SQLite copy of recently seen mail for offline reads, plus a write queue
+
+    Message metadata from every refresh and search, bodies fetched for
+    summaries or analysis, and generated summaries are saved here as they
+    are seen. When Gmail can't be reached, views and chat tools answer
+    from this store with how long ago it was synced. Label changes and
+    drafts made while offline are queued in ``pending_writes`` and replayed
+    by ``components.write_replayer`` once Gmail is reachable again.
+
+    The path defaults to ``GMAIL_AI_LOCAL_STORE`` or the data directory and
+    is resolved on first use; the database is created by the first write.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    @property
+    def path(self) -> str:
+        # Resolved once, on first use
+        if self._path is None:
+            self._path = os.getenv("GMAIL_AI_LOCAL_STORE") or data_path("local_store.sqlite3")
+        return self._path
+
+    def _exists(self) -> bool:
+        """Whether the database has been created; reads of a missing one are empty"""
+        return self._schema_ready or os.path.exists(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, creating the database on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            ensure_parent(self.path)
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self._create_schema(connection)
+                    self._schema_ready = True
+        return connection
+
+    def _create_schema(self, connection: sqlite3.Connection):
+        with connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "account TEXT NOT NULL, id TEXT NOT NULL, thread_id TEXT, sender TEXT, subject TEXT, "
+                "date TEXT, snippet TEXT, label_ids TEXT NOT NULL DEFAULT '', internal_date INTEGER NOT NULL DEFAULT 0, "
+                "body TEXT, has_attachments INTEGER, stored_at REAL NOT NULL, PRIMARY KEY (account, id))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS messages_date ON messages (account, internal_date)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "account TEXT NOT NULL, id TEXT NOT NULL, summary TEXT NOT NULL, stored_at REAL NOT NULL, "
+                "PRIMARY KEY (account, id))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS syncs ("
+                "account TEXT NOT NULL, view TEXT NOT NULL, synced_at REAL NOT NULL, PRIMARY KEY (account, view))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS pending_writes ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, account TEXT NOT NULL, kind TEXT NOT NULL, "
+                "args TEXT NOT NULL, created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, error TEXT)"
+            )
+
+    # Messages
+
+    def put_records(self, account: str, records: Iterable[EmailRecord]):
+        """Save records, keeping a previously saved body when a record has none"""
+        now = time.time()
+        rows = [(
+            account, record.id, record.thread_id, record.sender, record.subject, record.date, record.snippet,
+            f" {' '.join(record.label_ids)} ", record.internal_date, record.body,
+            None if record.has_attachments is None else int(record.has_attachments), now
+        ) for record in records]
+        if not account or not rows:
+            return
+        with self._connect() as connection:
+            connection.executemany(
+                f"INSERT INTO messages ({_COLUMNS}, account, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (account, id) DO UPDATE SET thread_id = excluded.thread_id, sender = excluded.sender, "
+                "subject = excluded.subject, date = excluded.date, snippet = excluded.snippet, "
+                "label_ids = excluded.label_ids, internal_date = excluded.internal_date, "
+                "body = COALESCE(excluded.body, messages.body), "
+                "has_attachments = COALESCE(excluded.has_attachments, messages.has_attachments), "
+                "stored_at = excluded.stored_at",
+                [row[1:11] + (row[0], row[11]) for row in rows]
+            )
+
+    def save(self, account: Optional[str], records: Iterable[EmailRecord], view: Optional[str] = None):
+        """Write-through from online reads; a local store error never fails the read"""
+        if not account:
+            return
+        try:
+            self.put_records(account, records)
+            if view:
+                self.mark_synced(account, view)
+        except sqlite3.Error as e:
+            print(f"Error saving emails locally: {str(e)}")
+
+    def put_body(self, account: str, message_id: str, body: str):
+        with self._connect() as connection:
+            connection.execute("UPDATE messages SET body = ? WHERE account = ? AND id = ?", (body, account, message_id))
+
+    def _record(self, row: sqlite3.Row) -> EmailRecord:
+        return EmailRecord(
+            id=row['id'], thread_id=row['thread_id'], sender=row['sender'], subject=row['subject'],
+            date=row['date'], snippet=row['snippet'], label_ids=tuple(row['label_ids'].split()),
+            internal_date=row['internal_date'], body=row['body'],
+            has_attachments=None if row['has_attachments'] is None else bool(row['has_attachments'])
+        )
+
+    def get_record(self, account: str, message_id: str) -> Optional[EmailRecord]:
+        if not self._exists():
+            return None
+        row = self._connect().execute(
+            f"SELECT {_COLUMNS} FROM messages WHERE account = ? AND id = ?", (account, message_id)
+        ).fetchone()
+        return self._record(row) if row else None
+
+    def recent(self, account: str, label: Optional[str] = 'INBOX', limit: int = 10,
+               start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> List[EmailRecord]:
+        """Newest saved messages, optionally with a label and within [start_ms, end_ms)"""
+        if not self._exists():
+            return []
+        conditions, args = ["account = ?"], [account]
+        if label:
+            conditions.append("label_ids LIKE ?")
+            args.append(f"% {label} %")
+        if start_ms is not None:
+            conditions.append("internal_date >= ?")
+            args.append(start_ms)
+        if end_ms is not None:
+            conditions.append("internal_date < ?")
+            args.append(end_ms)
+        rows = self._connect().execute(
+            f"SELECT {_COLUMNS} FROM messages WHERE {' AND '.join(conditions)} "
+            "ORDER BY internal_date DESC LIMIT ?", (*args, limit)
+        ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def search(self, account: str, query: str, limit: int = 10) -> List[EmailRecord]:
+        """Approximate a Gmail search over saved messages
+
+        Supports from:, subject:, label:, in:, is:unread/starred/important,
+        after: and before: (YYYY/MM/DD); other words must appear in the
+        sender, subject, snippet or saved body.
+        """
+        if not self._exists():
+            return []
+        conditions, args = ["account = ?"], [account]
+        for match in _QUERY_TERM.finditer(query):
+            operator, value, phrase, word = match.groups()
+            value = (value or '').strip('"')
+            operator = (operator or '').lower()
+            if operator in ('from', 'subject'):
+                conditions.append(f"{'sender' if operator == 'from' else 'subject'} LIKE ? ESCAPE '\\'")
+                args.append(_like(value))
+            elif operator in ('label', 'in', 'is'):
+                label = _LABEL_ALIASES.get(value.lower(), value.upper() if operator != 'label' else value)
+                conditions.append("(label_ids LIKE ? OR label_ids LIKE ?)")
+                args.extend([f"% {label} %", f"% {label.upper()} %"])
+            elif operator in ('after', 'before'):
+                try:
+                    moment = int(datetime.strptime(value, "%Y/%m/%d").timestamp() * 1000)
+                except ValueError:
+                    continue
+                conditions.append("internal_date >= ?" if operator == 'after' else "internal_date < ?")
+                args.append(moment)
+            else:
+                text = phrase if phrase is not None else (match.group(0) if operator else word)
+                conditions.append("(sender LIKE ? ESCAPE '\\' OR subject LIKE ? ESCAPE '\\' "
+                                  "OR snippet LIKE ? ESCAPE '\\' OR body LIKE ? ESCAPE '\\')")
+                args.extend([_like(text)] * 4)
+        rows = self._connect().execute(
+            f"SELECT {_COLUMNS} FROM messages WHERE {' AND '.join(conditions)} "
+            "ORDER BY internal_date DESC LIMIT ?", (*args, limit)
+        ).fetchall()
+        return [self._record(row) for row in rows]
+
+    # Summaries
+
+    def put_summary(self, account: str, message_id: str, summary: str):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO summaries (account, id, summary, stored_at) VALUES (?, ?, ?, ?)",
+                (account, message_id, summary, time.time())
+            )
+
+    def get_summary(self, account: str, message_id: str) -> Optional[str]:
+        if not self._exists():
+            return None
+        row = self._connect().execute(
+            "SELECT summary FROM summaries WHERE account = ? AND id = ?", (account, message_id)
+        ).fetchone()
+        return row['summary'] if row else None
+
+    # Sync times, for staleness
+
+    def mark_synced(self, account: str, view: str):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO syncs (account, view, synced_at) VALUES (?, ?, ?)",
+                (account, view, time.time())
+            )
+
+    def synced_at(self, account: str, view: Optional[str] = None) -> Optional[float]:
+        """When a view (or, by default, anything) was last synced"""
+        if not self._exists():
+            return None
+        if view:
+            row = self._connect().execute(
+                "SELECT synced_at FROM syncs WHERE account = ? AND view = ?", (account, view)
+            ).fetchone()
+        else:
+            row = self._connect().execute(
+                "SELECT MAX(synced_at) AS synced_at FROM syncs WHERE account = ?", (account,)
+            ).fetchone()
+        return row['synced_at'] if row else None
+
+    # Writes made while offline
+
+    def queue_write(self, account: str, kind: str, **args) -> int:
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO pending_writes (account, kind, args, created_at) VALUES (?, ?, ?, ?)",
+                (account, kind, json.dumps(args), time.time())
+            )
+        return cursor.lastrowid
+
+    def pending_writes(self, account: Optional[str] = None) -> List[dict]:
+        """Queued writes, oldest first"""
+        if not self._exists():
+            return []
+        if account:
+            rows = self._connect().execute(
+                "SELECT * FROM pending_writes WHERE account = ? ORDER BY id", (account,)
+            ).fetchall()
+        else:
+            rows = self._connect().execute("SELECT * FROM pending_writes ORDER BY id").fetchall()
+        return [dict(row, args=json.loads(row['args'])) for row in rows]
+
+    def complete_write(self, write_id: int):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM pending_writes WHERE id = ?", (write_id,))
+
+    def fail_write(self, write_id: int, error: str):
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE pending_writes SET attempts = attempts + 1, error = ? WHERE id = ?", (error, write_id)
+            )
+
+# Shared by every session in the process
+local_store = LocalStore()
@@ -0,0 +1,157 @@
+import csv
+import json
+import os
+import string
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from .base_tool import BaseTool
+from .email_drafter import render_message
+from .gemini_client import GeminiClient
+
+# Rows taken through the pipeline at a time; bounds memory for large lists
+CHUNK_SIZE = 100
+DONE_STATUSES = ('drafted', 'sent')
+
+def load_recipients(path: str) -> List[Dict[str, str]]:
+    """Read a recipient list from CSV (with a header row) or JSON (a list of objects)
+
+    Every row needs a ``to`` (or ``email``) field; other fields are template
+    variables.
+    """
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+    else:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+
+    recipients = []
+    for number, row in enumerate(rows, start=1):
+        row = {str(key).strip(): '' if value is None else str(value) for key, value in row.items()}
+        row.setdefault('to', row.get('email', ''))
+        if not row['to'].strip():
+            raise ValueError(f"Recipient row {number} has no 'to' or 'email' value")
+        recipients.append(row)
+    return recipients
+
+def fill_template(template: str, row: Dict[str, str]) -> str:
+    """Substitute ``{field}`` placeholders, failing on unknown fields"""
+    try:
+        return string.Formatter().vformat(template, (), row)
+    except KeyError as e:
+        raise ValueError(f"Template variable {e} is missing from the recipient row")
+
+def _render(job: tuple) -> str:
+    # Runs in a worker process
+    return render_message(*job)
+
+class MailMerge(BaseTool):
+    """Tool for personalized bulk drafting or sending
+
+    Each chunk of recipients goes through three stages: optional Gemini
+    personalization on a thread pool, MIME rendering on a process pool, and
+    draft creation or sending on a thread pool of pooled Gmail services (so
+    every request passes through the quota scheduler). Every row's outcome
+    is appended to a JSONL results file; rows already drafted or sent there
+    are skipped, so an interrupted run can simply be started again.
+    """
+
+    def merge(self, recipients: List[Dict[str, str]], subject_template: str, body_template: str,
+              results_path: str, send: bool = False, personalize: Optional[str] = None,
+              gemini_api_key: Optional[str] = None, workers: int = 8, processes: Optional[int] = None,
+              dry_run: bool = False, job=None) -> dict:
+        """Draft (or send) one message per recipient; returns counts by status"""
+        if personalize and not gemini_api_key:
+            raise ValueError("Personalization needs a Gemini API key for the account")
+        if not dry_run:
+            self._ensure_service()
+        model = GeminiClient(gemini_api_key) if personalize else None
+
+        done = self._completed_rows(results_path)
+        counts = {'drafted': 0, 'sent': 0, 'rendered': 0, 'failed': 0, 'skipped': len(done)}
+        pending = [(number, row) for number, row in enumerate(recipients, start=1) if number not in done]
+        if job:
+            job.update(total=len(recipients), **counts)
+
+        with open(results_path, 'a', encoding='utf-8') as results, \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix='merge') as threads, \
+                ProcessPoolExecutor(max_workers=processes) as renderers:
+            for start in range(0, len(pending), CHUNK_SIZE):
+                if job:
+                    job.check_cancelled()
+                chunk = pending[start:start + CHUNK_SIZE]
+
+                # Stage 1: fill templates, personalizing bodies with Gemini
+                drafts = list(threads.map(lambda item: self._compose(item[1], subject_template, body_template,
+                                                                     personalize, model), chunk))
+
+                # Stage 2: render MIME in worker processes
+                ready = [draft for draft in drafts if 'error' not in draft]
+                raws = renderers.map(_render, [(draft['to'], draft['subject'], draft['body'], self.connected_email)
+                                               for draft in ready], chunksize=8)
+                for draft, raw in zip(ready, raws):
+                    draft['raw'] = raw
+
+                # Stage 3: create drafts or send through the pooled services
+                outcomes = threads.map(lambda draft: self._deliver(draft, send, dry_run), drafts)
+                for (number, row), outcome in zip(chunk, outcomes):
+                    counts[outcome['status']] += 1
+                    results.write(json.dumps(dict(outcome, row=number, to=row['to'])) + '\n')
+                results.flush()
+                if job:
+                    job.update(**counts)
+
+        return counts
+
+    def _compose(self, row: Dict[str, str], subject_template: str, body_template: str,
+                 personalize: Optional[str], model: Optional[GeminiClient]) -> dict:
+        try:
+            subject = fill_template(subject_template, row)
+            body = fill_template(body_template, row)
+            if model:
+                details = '\n'.join(f"{key}: {value}" for key, value in row.items())
+                body = model.generate_content(
+                    f"Personalize this email for its recipient. {personalize}\n"
+                    f"Keep its meaning and any links; return only the new body.\n\n"
+                    f"Recipient details:\n{details}\n\nEmail:\n{body}",
+                    generation_config={'temperature': 0.5, 'topP': 0.9, 'maxOutputTokens': 800}
+                ).strip()
+            return {'to': row['to'], 'subject': subject, 'body': body}
+        except Exception as e:
+            return {'to': row['to'], 'error': str(e)}
+
+    def _deliver(self, draft: dict, send: bool, dry_run: bool) -> dict:
+        if 'error' in draft:
+            return {'status': 'failed', 'error': draft['error']}
+        if dry_run:
+            return {'status': 'rendered', 'subject': draft['subject']}
+        try:
+            if send:
+                # No automatic retry: a retried send can deliver twice. Failed rows rerun next time.
+                message = self.service.users().messages().send(
+                    userId='me',
+                    body={'raw': draft['raw']}
+                ).execute()
+                return {'status': 'sent', 'id': message['id']}
+            created = self.service.users().drafts().create(
+                userId='me',
+                body={'message': {'raw': draft['raw']}}
+            ).execute(num_retries=3)
+            return {'status': 'drafted', 'id': created['id']}
+        except Exception as e:
+            return {'status': 'failed', 'error': str(e)}
+
+    def _completed_rows(self, results_path: str) -> set:
+        """Row numbers a previous run already drafted or sent"""
+        if not os.path.exists(results_path):
+            return set()
+        done = set()
+        with open(results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                if result.get('status') in DONE_STATUSES:
+                    done.add(result['row'])
+        return done
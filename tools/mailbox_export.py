@@ -0,0 +1,203 @@
+import base64
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from .base_tool import BaseTool
+
+PAGE_SIZE = 500
+# Messages written between checkpoints
+CHECKPOINT_EVERY = 100
+EXPORT_FORMATS = ('mbox', 'jsonl')
+
+_FROM_LINE = re.compile(rb'^(>*From )', re.MULTILINE)
+
+def mbox_entry(message: dict) -> bytes:
+    """Render a format='raw' message as an mboxrd entry"""
+    raw = base64.urlsafe_b64decode(message['raw'])
+    raw = raw.replace(b'\r\n', b'\n')
+    # mboxrd: quote body lines starting with (>*)From
+    raw = _FROM_LINE.sub(rb'>\1', raw)
+    if not raw.endswith(b'\n'):
+        raw += b'\n'
+    received = time.asctime(time.gmtime(int(message.get('internalDate', 0)) / 1000))
+    return f"From MAILER-DAEMON {received}\n".encode() + raw + b'\n'
+
+def jsonl_entry(message: dict) -> bytes:
+    """Render a format='raw' message as one JSON line (raw stays base64url)"""
+    return (json.dumps({
+        'id': message['id'],
+        'threadId': message.get('threadId'),
+        'labelIds': message.get('labelIds', []),
+        'internalDate': message.get('internalDate'),
+        'raw': message['raw']
+    }) + '\n').encode()
+
+class _ExportSink:
+    """Output file that can be checkpointed at an offset and truncated back to it
+
+    With compression each checkpoint ends a zstd frame, so a file cut at any
+    checkpoint offset is a valid (multi-frame) zstd stream.
+    """
+
+    def __init__(self, path: str, compress: bool, resume_offset: Optional[int] = None):
+        if resume_offset is None:
+            self.file = open(path, 'wb')
+        else:
+            self.file = open(path, 'r+b')
+            self.file.truncate(resume_offset)
+            self.file.seek(resume_offset)
+
+        self.writer = None
+        if compress:
+            try:
+                import zstandard
+            except ImportError:
+                self.file.close()
+                raise ValueError("zstd compression needs the 'zstandard' package (pip install zstandard)")
+            self._flush_frame = zstandard.FLUSH_FRAME
+            self.writer = zstandard.ZstdCompressor(level=3).stream_writer(self.file, closefd=False)
+
+    def write(self, data: bytes):
+        (self.writer or self.file).write(data)
+
+    def checkpoint(self) -> int:
+        """Flush everything written so far and return the resumable offset"""
+        if self.writer:
+            self.writer.flush(self._flush_frame)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.file.close()
+
+class MailboxExporter(BaseTool):
+    """Tool for streaming a query's messages out to an mbox or JSONL file
+
+    Pages of IDs are listed and ``format='raw'`` messages fetched by a pool
+    of workers through a bounded in-order window, so memory stays constant
+    no matter how many messages are exported while the workers keep the
+    quota budget busy. Progress is checkpointed (page token, last written
+    ID, output offset) so an interrupted export resumes where it stopped.
+    """
+
+    def export(self, output_path: str, query: str = '', label_ids: Optional[List[str]] = None,
+               format: str = 'mbox', compress: bool = False, workers: int = 8,
+               checkpoint_path: Optional[str] = None, job=None) -> dict:
+        """Export matching messages, resuming from the checkpoint if one exists
+
+        Returns a summary dict with the number of messages exported.
+        """
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {format}")
+        self._ensure_service()
+
+        checkpoint_path = checkpoint_path or output_path + '.checkpoint.json'
+        settings = {'query': query, 'label_ids': label_ids or [], 'format': format, 'compress': compress}
+        state = self._load_checkpoint(checkpoint_path, settings, output_path)
+        resumed = state is not None
+        if not resumed:
+            state = dict(settings, page_token=None, last_id=None, exported=0, offset=None)
+
+        render = mbox_entry if format == 'mbox' else jsonl_entry
+        sink = _ExportSink(output_path, compress, state['offset'])
+        window = max(1, workers) * 4
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export') as executor:
+                page_token = state['page_token']
+                skip_until = state['last_id']
+                while True:
+                    if job:
+                        job.check_cancelled()
+                    ids, next_page_token = self._list_ids(query, label_ids, page_token)
+
+                    # Resuming mid-page: skip what was already written
+                    if skip_until:
+                        if skip_until in ids:
+                            ids = ids[ids.index(skip_until) + 1:]
+                        skip_until = None
+
+                    pending = deque()
+                    for message_id in ids:
+                        pending.append((message_id, executor.submit(self._fetch_raw, message_id)))
+                        if len(pending) >= window:
+                            self._write_next(pending, sink, render, state, page_token, checkpoint_path, job)
+                    while pending:
+                        self._write_next(pending, sink, render, state, page_token, checkpoint_path, job)
+
+                    if not next_page_token:
+                        break
+                    # Page done: the checkpoint moves on to the next page
+                    page_token = next_page_token
+                    state.update(page_token=page_token, last_id=None)
+                    self._save_checkpoint(checkpoint_path, state, sink)
+        except BaseException:
+            # Keep everything up to the last written message resumable
+            self._save_checkpoint(checkpoint_path, state, sink)
+            sink.close()
+            raise
+
+        sink.close()
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return {'exported': state['exported'], 'resumed': resumed, 'output': output_path}
+
+    def _write_next(self, pending: deque, sink: _ExportSink, render, state: dict, page_token,
+                    checkpoint_path: str, job):
+        """Write the oldest fetched message, checkpointing periodically"""
+        message_id, future = pending.popleft()
+        sink.write(render(future.result()))
+        state['exported'] += 1
+        state['last_id'] = message_id
+        state['page_token'] = page_token
+        if job:
+            job.update(exported=state['exported'])
+        if state['exported'] % CHECKPOINT_EVERY == 0:
+            self._save_checkpoint(checkpoint_path, state, sink)
+
+    def _list_ids(self, query: str, label_ids: Optional[List[str]], page_token: Optional[str]):
+        params = {
+            'userId': 'me',
+            'q': query,
+            'maxResults': PAGE_SIZE,
+            'fields': 'messages/id,nextPageToken'
+        }
+        if label_ids:
+            params['labelIds'] = label_ids
+        if page_token:
+            params['pageToken'] = page_token
+        results = self.service.users().messages().list(**params).execute(num_retries=3)
+        return [message['id'] for message in results.get('messages', [])], results.get('nextPageToken')
+
+    def _fetch_raw(self, message_id: str) -> dict:
+        # Runs on a worker thread, which gets its own pooled service
+        return self.service.users().messages().get(
+            userId='me',
+            id=message_id,
+            format='raw'
+        ).execute(num_retries=3)
+
+    def _save_checkpoint(self, checkpoint_path: str, state: dict, sink: _ExportSink):
+        state['offset'] = sink.checkpoint()
+        temp_path = checkpoint_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, checkpoint_path)
+
+    def _load_checkpoint(self, checkpoint_path: str, settings: dict, output_path: str) -> Optional[dict]:
+        if not os.path.exists(checkpoint_path) or not os.path.exists(output_path):
+            return None
+        with open(checkpoint_path, 'r') as f:
+            state = json.load(f)
+        if any(state.get(key) != value for key, value in settings.items()):
+            raise ValueError(
+                f"{checkpoint_path} belongs to a different export; delete it or use another output file"
+            )
+        return state
@@ -0,0 +1,277 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.parser import BytesHeaderParser
+from typing import Iterator, List, Optional, Tuple
+from googleapiclient.http import MediaIoBaseUpload
+from .attachments import UPLOAD_CHUNK_SIZE, run_resumable
+from .base_tool import BaseTool
+from .data_dir import data_path
+from .disk_cache import DiskCache
+
+# Messages above this size use a chunked resumable upload instead of multipart
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+IMPORT_EXTENSIONS = ('.eml', '.mbox', '.mbox.zst', '.jsonl', '.jsonl.zst')
+
+# Common mail client folder names that correspond to Gmail system labels
+SYSTEM_FOLDERS = {
+    'inbox': 'INBOX',
+    'sent': 'SENT',
+    'sent items': 'SENT',
+    'sent mail': 'SENT',
+    'spam': 'SPAM',
+    'junk': 'SPAM',
+    'junk email': 'SPAM',
+    'trash': 'TRASH',
+    'deleted items': 'TRASH',
+    'starred': 'STARRED',
+    'important': 'IMPORTANT'
+}
+
+_QUOTED_FROM = re.compile(rb'^>(>*From )')
+
+def _open_source(path: str):
+    """Open a file for binary reading, decompressing .zst transparently"""
+    f = open(path, 'rb')
+    if not path.endswith('.zst'):
+        return f
+    try:
+        import zstandard
+    except ImportError:
+        f.close()
+        raise ValueError("Reading .zst files needs the 'zstandard' package (pip install zstandard)")
+    # Exports end a frame at every checkpoint
+    reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=True)
+    return io.BufferedReader(reader)
+
+def iter_mbox(path: str) -> Iterator[bytes]:
+    """Yield each message of an mbox file as raw bytes, one at a time
+
+    Handles mboxrd quoting (``>From`` lines are unquoted one level).
+    """
+    with _open_source(path) as f:
+        lines = []
+        previous_blank = True
+        for line in f:
+            if previous_blank and line.startswith(b'From '):
+                if lines:
+                    yield _join_mbox_lines(lines)
+                lines = []
+            else:
+                lines.append(_QUOTED_FROM.sub(rb'\1', line))
+            previous_blank = line in (b'\n', b'\r\n')
+        if lines:
+            yield _join_mbox_lines(lines)
+
+def _join_mbox_lines(lines: List[bytes]) -> bytes:
+    # Drop the blank line that separates entries
+    if lines and lines[-1] in (b'\n', b'\r\n'):
+        lines = lines[:-1]
+    return b''.join(lines)
+
+def iter_jsonl(path: str) -> Iterator[bytes]:
+    """Yield the raw messages of a JSONL export"""
+    with _open_source(path) as f:
+        for line in f:
+            if line.strip():
+                yield base64.urlsafe_b64decode(json.loads(line)['raw'])
+
+def iter_source(path: str) -> Iterator[Tuple[Optional[str], bytes]]:
+    """Yield (folder name, raw message) for a file or a directory tree
+
+    A ``.eml`` file's folder is its directory relative to ``path``; an mbox
+    or JSONL file's folder is its own name without the extension (plus any
+    parent directories), matching how mail clients export folders.
+    """
+    if os.path.isfile(path):
+        yield from _iter_file(path, _folder_name(os.path.basename(path)))
+        return
+
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        relative = os.path.relpath(root, path)
+        parent = None if relative == '.' else relative.replace(os.sep, '/')
+        for name in sorted(files):
+            if not name.lower().endswith(IMPORT_EXTENSIONS):
+                continue
+            if name.lower().endswith('.eml'):
+                folder = parent
+            else:
+                folder = '/'.join(filter(None, [parent, _folder_name(name)]))
+            yield from _iter_file(os.path.join(root, name), folder)
+
+def _folder_name(filename: str) -> str:
+    for extension in sorted(IMPORT_EXTENSIONS, key=len, reverse=True):
+        if filename.lower().endswith(extension):
+            return filename[:-len(extension)]
+    return filename
+
+def _iter_file(path: str, folder: Optional[str]) -> Iterator[Tuple[Optional[str], bytes]]:
+    lowered = path.lower()
+    if lowered.endswith('.eml'):
+        with open(path, 'rb') as f:
+            yield folder, f.read()
+    elif '.jsonl' in lowered:
+        for raw in iter_jsonl(path):
+            yield folder, raw
+    else:
+        for raw in iter_mbox(path):
+            yield folder, raw
+
+def message_key(raw: bytes) -> str:
+    """Dedupe key for a message: its Message-ID, or a content hash without one"""
+    # Only the header block is parsed; the body is never touched
+    end = raw.find(b'\n\n')
+    crlf_end = raw.find(b'\r\n\r\n')
+    if crlf_end != -1 and (end == -1 or crlf_end < end):
+        end = crlf_end
+    headers = BytesHeaderParser().parsebytes(raw if end == -1 else raw[:end])
+    message_id = (headers.get('Message-ID') or '').strip()
+    if message_id:
+        return message_id
+    return 'sha256:' + hashlib.sha256(raw).hexdigest()
+
+class MailboxImporter(BaseTool):
+    """Tool for loading mbox files or .eml directories into the account
+
+    Messages are streamed from disk and handed to a pool of upload workers
+    (each on its own pooled Gmail service, so uploads share the quota
+    scheduler). At most a few messages per worker are held in memory.
+    Every imported message is recorded in a ledger keyed by Message-ID, so
+    rerunning an import skips what is already there without any API calls.
+    Within a run, later copies of a message (client exports often hold the
+    same message in several folders) are not uploaded again; their folder
+    labels are added to the first copy instead.
+    """
+
+    def import_path(self, path: str, label_manager, extra_labels: Optional[List[str]] = None,
+                    ledger_path: Optional[str] = None, workers: int = 4, job=None) -> dict:
+        """Import every message under ``path``; returns counts and the first errors"""
+        self._ensure_service()
+        ledger = DiskCache(ledger_path or data_path('import_ledger.sqlite3'), default_ttl=None)
+        # Key the ledger by address so one ledger file can serve several accounts
+        account = self.service.users().getProfile(userId='me').execute()['emailAddress']
+
+        label_ids = {}
+        extra_label_ids = list(label_manager.resolve_label_ids(extra_labels).values()) if extra_labels else []
+        counts = {'imported': 0, 'skipped': 0, 'failed': 0}
+        errors = []
+        lock = threading.Lock()
+        in_flight = threading.BoundedSemaphore(max(1, workers) * 2)
+        # Keys handed out this run -> message ID once uploaded, label IDs it has
+        # and labels from later copies still waiting for the upload
+        seen = {}
+
+        def upload(key, raw, message_label_ids):
+            try:
+                message = self._import_raw(raw, message_label_ids)
+                ledger.set(f"{account}:{key}", message['id'])
+                with lock:
+                    entry = seen[key]
+                    entry['id'] = message['id']
+                    pending = entry['pending'] - entry['labels']
+                    entry['labels'] |= pending
+                    entry['pending'] = set()
+                outcome, error = 'imported', None
+                if pending:
+                    try:
+                        self._add_labels(message['id'], pending)
+                    except Exception as e:
+                        error = f"{key}: adding labels: {e}"
+            except Exception as e:
+                with lock:
+                    # Let a later copy try again
+                    seen.pop(key, None)
+                outcome, error = 'failed', f"{key}: {e}"
+            finally:
+                in_flight.release()
+            with lock:
+                counts[outcome] += 1
+                if error and len(errors) < 20:
+                    errors.append(error)
+            if job:
+                job.update(**counts)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='import') as executor:
+            futures = []
+            for folder, raw in iter_source(path):
+                if job:
+                    job.check_cancelled()
+                key = message_key(raw)
+                if ledger.get(f"{account}:{key}") is not None and key not in seen:
+                    with lock:
+                        counts['skipped'] += 1
+                    continue
+
+                if folder not in label_ids:
+                    label_ids[folder] = self._folder_label_ids(folder, label_manager)
+                message_label_ids = label_ids[folder] + extra_label_ids
+                with lock:
+                    entry = seen.get(key)
+                    if entry is None:
+                        seen[key] = {'id': None, 'labels': set(message_label_ids), 'pending': set()}
+                    else:
+                        # Another copy of a message from this run: merge its labels
+                        counts['skipped'] += 1
+                        new_labels = set(message_label_ids) - entry['labels'] - entry['pending']
+                        if entry['id'] is None:
+                            entry['pending'] |= new_labels
+                            new_labels = set()
+                        else:
+                            entry['labels'] |= new_labels
+                        message_id = entry['id']
+                if entry is not None:
+                    if new_labels:
+                        try:
+                            self._add_labels(message_id, new_labels)
+                        except Exception as e:
+                            with lock:
+                                if len(errors) < 20:
+                                    errors.append(f"{key}: adding labels: {e}")
+                    continue
+
+                # Bound memory: wait for a slot before reading further ahead
+                in_flight.acquire()
+                futures.append(executor.submit(upload, key, raw, message_label_ids))
+                futures = [future for future in futures if not future.done()]
+            for future in as_completed(futures):
+                future.result()
+
+        return dict(counts, errors=errors)
+
+    def _folder_label_ids(self, folder: Optional[str], label_manager) -> List[str]:
+        if not folder:
+            return []
+        system_label = SYSTEM_FOLDERS.get(folder.lower())
+        if system_label:
+            return [system_label]
+        return list(label_manager.resolve_label_ids([folder]).values())
+
+    def _add_labels(self, message_id: str, label_ids):
+        """Add labels to an imported message (for duplicates found in other folders)"""
+        self.service.users().messages().modify(
+            userId='me',
+            id=message_id,
+            body={'addLabelIds': sorted(label_ids)}
+        ).execute()
+
+    def _import_raw(self, raw: bytes, label_ids: List[str]) -> dict:
+        """Upload one message with messages.import, resumably if it is large"""
+        resumable = len(raw) > RESUMABLE_THRESHOLD
+        media = MediaIoBaseUpload(io.BytesIO(raw), mimetype='message/rfc822',
+                                  chunksize=UPLOAD_CHUNK_SIZE, resumable=resumable)
+        request = self.service.users().messages().import_(
+            userId='me',
+            body={'labelIds': label_ids},
+            media_body=media,
+            internalDateSource='dateHeader',
+            neverMarkSpam=True
+        )
+        if not resumable:
+            return request.execute(num_retries=3)
+        return run_resumable(request)
@@ -0,0 +1,243 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from typing import Callable, Dict, Iterable, Tuple
+
+# Seconds; covers cached views (ms) up to slow summarizing handlers (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_account = contextvars.ContextVar('metrics_account', default=None)
+
+def set_account(name: str):
+    """Label metrics recorded from the current context with this account"""
+    _account.set(name)
+
+def current_account() -> str:
+    return _account.get() or 'unknown'
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class _Metric:
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    @property
+    def sample_name(self) -> str:
+        return self.name
+
+    def header(self) -> list:
+        return [f"# HELP {self.sample_name} {self.documentation}", f"# TYPE {self.sample_name} {self.type_name}"]
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    @property
+    def sample_name(self) -> str:
+        return f"{self.name}_total"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Dict[tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list:
+        lines = self.header()
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.sample_name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [bucket counts..., sum, count]
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> list:
+        lines = self.header()
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+class Gauge(_Metric):
+    """Gauge computed at scrape time by ``fn() -> {label values tuple: value}``"""
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str], fn: Callable[[], dict]):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+
+    def render(self) -> list:
+        lines = self.header()
+        for key, value in sorted(self.fn().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames, fn) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Gmail API
+gmail_requests = registry.counter(
+    'gmail_requests', 'Gmail API requests by HTTP status', ('account', 'operation', 'status'))
+gmail_latency = registry.histogram(
+    'gmail_request_seconds', 'Gmail API request latency, excluding quota waits', ('account', 'operation'))
+gmail_response_bytes = registry.counter(
+    'gmail_response_bytes', 'Bytes received from the Gmail API', ('account', 'operation'))
+gmail_quota_units = registry.counter(
+    'gmail_quota_units', 'Gmail quota units spent', ('account', 'operation'))
+gmail_quota_wait = registry.histogram(
+    'gmail_quota_wait_seconds', 'Time spent waiting for Gmail quota', ('account', 'priority'))
+gmail_retries = registry.counter(
+    'gmail_retries', 'Gmail requests repeated after a failed attempt', ('account', 'operation'))
+
+# Gemini API
+gemini_requests = registry.counter(
+    'gemini_requests', 'Gemini API requests by HTTP status', ('account', 'model', 'status'))
+gemini_latency = registry.histogram(
+    'gemini_request_seconds', 'Gemini API request latency', ('account', 'model'))
+gemini_bytes = registry.counter(
+    'gemini_bytes', 'Bytes exchanged with the Gemini API', ('account', 'model', 'direction'))
+gemini_retries = registry.counter(
+    'gemini_retries', 'Gemini requests repeated after a failed attempt', ('account', 'model'))
+
+# Caches
+cache_requests = registry.counter(
+    'cache_requests', 'Cache lookups by result (hit or miss)', ('cache', 'result'))
+
+def _cache_hit_ratio() -> dict:
+    totals = {}
+    for (cache, result), count in cache_requests.samples().items():
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (count if result == 'hit' else 0), lookups + count)
+    return {(cache,): hits / lookups for cache, (hits, lookups) in totals.items() if lookups}
+
+registry.gauge('cache_hit_ratio', 'Fraction of cache lookups served from cache', ('cache',), _cache_hit_ratio)
+
+# UI handlers
+handler_requests = registry.counter(
+    'handler_requests', 'UI handler calls by outcome', ('account', 'handler', 'status'))
+handler_latency = registry.histogram(
+    'handler_seconds', 'UI handler latency (until the last streamed update)', ('account', 'handler'))
+
+def record_cache(cache: str, hit: bool):
+    cache_requests.inc(cache=cache, result='hit' if hit else 'miss')
+
+def instrument_handler(name: str):
+    """Decorator recording latency and outcome of a UI handler
+
+    Works for plain and generator handlers; the account label is whatever
+    the handler passed to :func:`set_account` while running.
+    """
+    def decorator(fn):
+        def record(start, status, account):
+            handler_requests.inc(account=account, handler=name, status=status)
+            handler_latency.observe(time.perf_counter() - start, account=account, handler=name)
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                account = current_account()
+                status = 'error'
+                try:
+                    for update in fn(*args, **kwargs):
+                        # Gradio may resume the generator in a different context
+                        account = current_account() if _account.get() else account
+                        yield update
+                    status = 'ok'
+                except GeneratorExit:
+                    status = 'cancelled'
+                    raise
+                finally:
+                    record(start, status, account)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                result = fn(*args, **kwargs)
+                status = 'ok'
+                return result
+            finally:
+                record(start, status, current_account())
+        return wrapper
+    return decorator
+
+def render() -> str:
+    """Render all metrics in the Prometheus text format"""
+    return registry.render()
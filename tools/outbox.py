@@ -0,0 +1,222 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional
+from .data_dir import data_path, ensure_parent
+
+# Delivery attempts before a message is marked failed
+MAX_ATTEMPTS = 8
+STATUSES = ('queued', 'sending', 'sent', 'failed', 'cancelled')
+
+class Outbox:
+    """Durable queue of outgoing messages in SQLite
+
+    Each message is stored fully rendered (RFC 822 bytes, attachments
+    included) in ``directory`` and tracked by a row with its status,
+    attempts and the earliest time it may be sent. A message is only
+    removed from disk once Gmail has accepted it, so nothing is lost if the
+    app stops or a send fails. ``accepting`` is set while a sender is
+    running in this process; without one, tools send directly.
+
+    Paths default to ``GMAIL_AI_OUTBOX`` / ``GMAIL_AI_OUTBOX_DIR`` or the
+    data directory and are resolved on first use; nothing is created on
+    disk until a message is queued.
+    """
+
+    def __init__(self, path: Optional[str] = None, directory: Optional[str] = None):
+        self._path = path
+        self._directory = directory
+        self.accepting = False
+        self._local = threading.local()
+        # Set whenever something is queued, so the sender wakes up early
+        self.changed = threading.Event()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    @property
+    def path(self) -> str:
+        # Resolved once, on first use
+        if self._path is None:
+            self._path = os.getenv("GMAIL_AI_OUTBOX") or data_path("outbox.sqlite3")
+        return self._path
+
+    @property
+    def directory(self) -> str:
+        if self._directory is None:
+            self._directory = os.getenv("GMAIL_AI_OUTBOX_DIR") or data_path("outbox")
+        return self._directory
+
+    def _exists(self) -> bool:
+        """Whether the database has been created; reads of a missing one are empty"""
+        return self._schema_ready or os.path.exists(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, creating the database on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            ensure_parent(self.path)
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self._create_schema(connection)
+                    self._schema_ready = True
+        return connection
+
+    def _create_schema(self, connection: sqlite3.Connection):
+        with connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, account TEXT NOT NULL, "
+                "recipient TEXT, subject TEXT, file TEXT NOT NULL, "
+                "status TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, "
+                "send_at REAL NOT NULL, next_attempt_at REAL NOT NULL, created_at REAL NOT NULL, "
+                "sent_id TEXT, error TEXT)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+
+    def new_file(self) -> str:
+        """Path for a new message file"""
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{uuid.uuid4().hex}.eml")
+
+    def enqueue(self, account: str, recipient: str, subject: str, file: str, send_at: Optional[float] = None) -> int:
+        """Queue a rendered message file for delivery (at ``send_at`` if given)"""
+        now = time.time()
+        send_at = send_at or now
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO outbox (account, recipient, subject, file, send_at, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (account, recipient, subject, file, send_at, send_at, now)
+            )
+        self.changed.set()
+        return cursor.lastrowid
+
+    def claim_due(self) -> Optional[sqlite3.Row]:
+        """Mark the next due message as sending and return it, or None"""
+        if not self._exists():
+            return None
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM outbox WHERE status = 'queued' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT 1", (time.time(),)
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = connection.execute(
+                "UPDATE outbox SET status = 'sending' WHERE id = ? AND status = 'queued'", (row['id'],)
+            ).rowcount
+        return row if claimed else None
+
+    def next_due_in(self) -> Optional[float]:
+        """Seconds until the next queued message is due (None if the queue is empty)"""
+        if not self._exists():
+            return None
+        row = self._connect().execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'queued'"
+        ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def mark_sent(self, message_id: int, sent_id: str):
+        with self._connect() as connection:
+            row = connection.execute("SELECT file FROM outbox WHERE id = ?", (message_id,)).fetchone()
+            connection.execute(
+                "UPDATE outbox SET status = 'sent', sent_id = ?, error = NULL, attempts = attempts + 1 WHERE id = ?",
+                (sent_id, message_id)
+            )
+        if row and os.path.exists(row['file']):
+            os.remove(row['file'])
+
+    def mark_failed(self, message_id: int, error: str, retry_in: Optional[float]):
+        """Record a failed attempt; requeue after ``retry_in`` seconds, or give up if None"""
+        with self._connect() as connection:
+            if retry_in is None:
+                connection.execute(
+                    "UPDATE outbox SET status = 'failed', error = ?, attempts = attempts + 1 WHERE id = ?",
+                    (error, message_id)
+                )
+            else:
+                connection.execute(
+                    "UPDATE outbox SET status = 'queued', error = ?, attempts = attempts + 1, "
+                    "next_attempt_at = ? WHERE id = ?",
+                    (error, time.time() + retry_in, message_id)
+                )
+
+    def defer(self, message_id: int, error: str, retry_in: float):
+        """Requeue a message that couldn't reach Gmail without counting it as an attempt"""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE outbox SET status = 'queued', error = ?, next_attempt_at = ? WHERE id = ?",
+                (error, time.time() + retry_in, message_id)
+            )
+
+    def retry(self, message_id: int, account: Optional[str] = None) -> bool:
+        """Requeue a failed message now"""
+        return self._transition(message_id, account, ('failed',), "status = 'queued', next_attempt_at = ?, attempts = 0",
+                                (time.time(),))
+
+    def cancel(self, message_id: int, account: Optional[str] = None) -> bool:
+        """Cancel a message that hasn't been sent yet"""
+        cancelled = self._transition(message_id, account, ('queued', 'failed'), "status = 'cancelled'", ())
+        if cancelled:
+            row = self.get(message_id)
+            if row and os.path.exists(row['file']):
+                os.remove(row['file'])
+        return cancelled
+
+    def _transition(self, message_id: int, account: Optional[str], from_statuses, assignments: str, params) -> bool:
+        query = f"UPDATE outbox SET {assignments} WHERE id = ? AND status IN ({','.join('?' * len(from_statuses))})"
+        args = [*params, message_id, *from_statuses]
+        if account:
+            query += " AND account = ?"
+            args.append(account)
+        with self._connect() as connection:
+            changed = connection.execute(query, args).rowcount
+        self.changed.set()
+        return bool(changed)
+
+    def recover(self):
+        """Requeue messages left 'sending' by a previous run that stopped mid-send"""
+        if not self._exists():
+            return
+        with self._connect() as connection:
+            connection.execute("UPDATE outbox SET status = 'queued' WHERE status = 'sending'")
+
+    def get(self, message_id: int) -> Optional[sqlite3.Row]:
+        if not self._exists():
+            return None
+        return self._connect().execute("SELECT * FROM outbox WHERE id = ?", (message_id,)).fetchone()
+
+    def list(self, account: Optional[str] = None, limit: int = 20) -> List[sqlite3.Row]:
+        """Most recent messages first"""
+        if not self._exists():
+            return []
+        if account:
+            return self._connect().execute(
+                "SELECT * FROM outbox WHERE account = ? ORDER BY id DESC LIMIT ?", (account, limit)
+            ).fetchall()
+        return self._connect().execute("SELECT * FROM outbox ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+    def format_status(self, account: Optional[str] = None, limit: int = 20) -> str:
+        """Describe recent outbox messages the way the chat tools list things"""
+        rows = self.list(account, limit)
+        if not rows:
+            return "Outbox is empty."
+        lines = []
+        for row in rows:
+            status = row['status']
+            if status == 'queued' and row['send_at'] > time.time():
+                status = f"scheduled for {time.strftime('%Y-%m-%d %H:%M', time.localtime(row['send_at']))}"
+            elif status == 'queued' and row['attempts']:
+                status = f"retrying (attempt {row['attempts'] + 1}): {row['error']}"
+            elif status == 'failed':
+                status = f"failed after {row['attempts']} attempts: {row['error']}"
+            lines.append(f"#{row['id']} to {row['recipient']}: {row['subject']} [{status}]")
+        return "Outbox:\n\n" + "\n".join(lines)
+
+# Shared by every session in the process
+outbox = Outbox()
@@ -0,0 +1,146 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Optional, Tuple
+from .data_dir import data_path
+
+# "profile: list emails" runs "list emails" under the profiler
+PROFILE_PREFIX = "profile:"
+
+# GMAIL_AI_PROFILE=1 profiles every command and writes .prof files
+PROFILE_ALL = os.getenv("GMAIL_AI_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_TOP = int(os.getenv("GMAIL_AI_PROFILE_TOP", "15"))
+
+# cProfile and tracemalloc are process-wide; profile one command at a time
+_profile_lock = threading.Lock()
+
+class ProfileReport:
+    """Result of a profiled call: timings, allocation sites and the raw profile"""
+
+    def __init__(self, label: str, profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot,
+                 wall_time: float, peak_memory: int, top: int = PROFILE_TOP):
+        self.label = label
+        self.profiler = profiler
+        self.snapshot = snapshot
+        self.wall_time = wall_time
+        self.peak_memory = peak_memory
+        self.top = top
+        self.prof_file = None
+
+    def top_functions(self) -> str:
+        """Top functions by cumulative time, as printed by pstats"""
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(self.top)
+        lines = stream.getvalue().splitlines()
+        # Drop the preamble before the column header
+        start = next((i for i, line in enumerate(lines) if line.lstrip().startswith('ncalls')), 0)
+        return "\n".join(line for line in lines[start:] if line.strip())
+
+    def top_allocations(self) -> str:
+        """Top allocation sites still alive at the end of the call"""
+        snapshot = self.snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        lines = []
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}")
+        return "\n".join(lines) or "No allocations recorded"
+
+    def format(self) -> str:
+        """Format the report for the chat window"""
+        header = f"Profile of '{self.label}': {self.wall_time * 1000:.1f} ms, peak traced memory {self.peak_memory / 1024 / 1024:.1f} MiB"
+        if self.prof_file:
+            header += f", saved to {self.prof_file}"
+        return f"""
+{header}
+
+Top functions by cumulative time:
+```
+{self.top_functions()}
+```
+
+Top allocation sites:
+```
+{self.top_allocations()}
+```
+"""
+
+    def dump(self, directory: Optional[str] = None) -> str:
+        """Write the cProfile data to a .prof file (for snakeviz, pstats, ...)
+
+        ``directory`` defaults to ``GMAIL_AI_PROFILE_DIR`` or the data
+        directory's ``profiles/``, read when the profile is written.
+        """
+        directory = directory or os.getenv("GMAIL_AI_PROFILE_DIR") or data_path("profiles")
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^a-z0-9]+', '-', self.label.lower()).strip('-')[:40] or "command"
+        self.prof_file = os.path.join(directory, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{slug}.prof")
+        self.profiler.dump_stats(self.prof_file)
+        return self.prof_file
+
+def split_profile_prefix(message: str) -> Tuple[bool, str]:
+    """Strip a leading "profile:" from a command, returning (requested, command)"""
+    if message.lower().startswith(PROFILE_PREFIX):
+        return True, message[len(PROFILE_PREFIX):].strip()
+    return False, message
+
+def profile_call(label: str, fn: Callable, *args, **kwargs) -> Tuple[Any, ProfileReport]:
+    """Run ``fn`` under cProfile and tracemalloc
+
+    Only the calling thread is profiled, so callers should run the command
+    inline rather than as a background job.
+    """
+    with _profile_lock:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if hasattr(tracemalloc, 'reset_peak'):
+            # Python 3.9+; on 3.8 the peak counts from whenever tracing started
+            tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            wall_time = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+
+    return result, ProfileReport(label, profiler, snapshot, wall_time, peak_memory)
+
+def profile_command(message: str, fn: Callable[[str], Any]) -> Tuple[Any, Optional[ProfileReport]]:
+    """Run ``fn(command)`` under the profiler if the message or environment asks for it
+
+    With the "profile:" prefix the report is returned for the chat response
+    (and also saved when GMAIL_AI_PROFILE_DIR is set). With GMAIL_AI_PROFILE
+    every command's profile is saved to a .prof file and only summarized on
+    the console, so users never see it.
+    """
+    requested, command = split_profile_prefix(message)
+    if not requested and not PROFILE_ALL:
+        return fn(command), None
+
+    result, report = profile_call(command, fn, command)
+    try:
+        if PROFILE_ALL or "GMAIL_AI_PROFILE_DIR" in os.environ:
+            report.dump()
+        if not requested:
+            print(f"Profiled '{command}' in {report.wall_time * 1000:.1f} ms -> {report.prof_file}")
+    except Exception as e:
+        print(f"Error saving profile: {str(e)}")
+    return result, report if requested else None
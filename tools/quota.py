@@ -0,0 +1,222 @@
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from . import metrics
+from .connectivity import OfflineError, connectivity, is_network_error
+from .tracing import get_tracer
+
+tracer = get_tracer(__name__)
+
+# Gmail API quota units per method (https://developers.google.com/gmail/api/reference/quota)
+QUOTA_UNITS = {
+    'getProfile': 1,
+    'labels.list': 1,
+    'labels.get': 1,
+    'labels.create': 5,
+    'labels.update': 5,
+    'labels.delete': 5,
+    'messages.list': 5,
+    'messages.get': 5,
+    'messages.modify': 5,
+    'messages.trash': 5,
+    'messages.attachments.get': 5,
+    'messages.insert': 25,
+    'messages.import': 25,
+    'messages.batchModify': 50,
+    'messages.send': 100,
+    'drafts.list': 5,
+    'drafts.get': 5,
+    'drafts.create': 10,
+    'drafts.update': 15,
+    'drafts.send': 100,
+    'threads.list': 10,
+    'threads.get': 10,
+    'history.list': 2,
+    # Chunks and status checks of a resumable upload; the method is charged when the upload starts
+    'upload.chunk': 1,
+}
+DEFAULT_UNITS = 5
+
+_GMAIL_PATH = re.compile(r'^(?:/upload)?/gmail/v1/users/[^/]+/?(.*)$')
+
+def gmail_operation(method: str, uri: str) -> str:
+    """Map an HTTP request to a Gmail API method name such as 'messages.get'"""
+    parsed = urlparse(uri)
+    match = _GMAIL_PATH.match(parsed.path)
+    if not match:
+        return 'other'
+    if 'upload_id=' in parsed.query:
+        return 'upload.chunk'
+
+    segments = [s for s in match.group(1).split('/') if s]
+    if not segments:
+        return 'other'
+    if segments == ['profile']:
+        return 'getProfile'
+
+    resource = segments[0]
+    method = method.upper()
+    if len(segments) == 1:
+        return f"{resource}.{'list' if method == 'GET' else 'create'}"
+
+    if resource == 'messages' and len(segments) == 2 and segments[1] in ('send', 'import', 'batchModify', 'batchDelete'):
+        return f"messages.{segments[1]}"
+    if resource == 'drafts' and segments[1] == 'send':
+        return 'drafts.send'
+    if resource == 'messages' and 'attachments' in segments:
+        return 'messages.attachments.get'
+    if len(segments) >= 3:
+        # e.g. messages/{id}/modify, messages/{id}/trash
+        return f"{resource}.{segments[2]}"
+
+    verbs = {'GET': 'get', 'PUT': 'update', 'PATCH': 'update', 'DELETE': 'delete'}
+    return f"{resource}.{verbs.get(method, 'get')}"
+
+def quota_units(operation: str) -> int:
+    """Get the quota cost of a Gmail API method"""
+    return QUOTA_UNITS.get(operation, DEFAULT_UNITS)
+
+class QuotaScheduler:
+    """Token bucket over Gmail quota units shared by every request in the process
+
+    Interactive requests only wait for the bucket. Background work (run
+    inside :meth:`background`) additionally waits until no interactive
+    request has been made for ``idle_after`` seconds and leaves ``reserve``
+    of the bucket untouched, so prefetching never delays a user.
+    """
+
+    def __init__(self, units_per_second: float = 250.0, idle_after: float = 1.0, reserve: float = 0.5):
+        self.units_per_second = units_per_second
+        self.capacity = units_per_second
+        self.idle_after = idle_after
+        self.reserve = reserve
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._last_interactive = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.units_per_second)
+        self._updated = now
+
+    @property
+    def is_background(self) -> bool:
+        return getattr(self._local, 'background', 0) > 0
+
+    @contextmanager
+    def background(self):
+        """Run the enclosed Gmail requests at idle priority on this thread"""
+        self._local.background = getattr(self._local, 'background', 0) + 1
+        try:
+            yield
+        finally:
+            self._local.background -= 1
+
+    def is_idle(self) -> bool:
+        """Check whether no interactive request has been made recently"""
+        return time.monotonic() - self._last_interactive >= self.idle_after
+
+    def note_interactive(self):
+        """Count non-Gmail work a user is waiting on (e.g. a Gemini call) as interactive"""
+        if not self.is_background:
+            with self._lock:
+                self._last_interactive = time.monotonic()
+
+    def wait_until_idle(self):
+        """Block until no interactive request has been made for ``idle_after`` seconds
+
+        Background work that doesn't go through the bucket (such as Gemini
+        calls) uses this to stay out of the way of users all the same.
+        """
+        while True:
+            with self._lock:
+                wait = self.idle_after - (time.monotonic() - self._last_interactive)
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 1.0))
+
+    def acquire(self, units: int):
+        """Block until ``units`` quota units are available for the calling thread"""
+        background = self.is_background
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if not background:
+                    self._last_interactive = now
+                    if self._tokens >= units:
+                        self._tokens -= units
+                        return
+                    wait = (units - self._tokens) / self.units_per_second
+                else:
+                    floor = self.capacity * self.reserve
+                    idle_wait = self.idle_after - (now - self._last_interactive)
+                    if idle_wait <= 0 and self._tokens - units >= floor:
+                        self._tokens -= units
+                        return
+                    token_wait = (units + floor - self._tokens) / self.units_per_second
+                    wait = max(idle_wait, token_wait, 0.01)
+            time.sleep(min(wait, 1.0))
+
+class QuotaHttp:
+    """HTTP wrapper that charges each Gmail request against the quota scheduler"""
+
+    def __init__(self, http, scheduler: QuotaScheduler):
+        self.http = http
+        self.scheduler = scheduler
+        # (method, uri) of the last failed request, to spot client retries
+        self._last_failure = None
+
+    def request(self, uri, method='GET', *args, **kwargs):
+        operation = gmail_operation(method, uri)
+        with tracer.start_as_current_span(f"gmail {operation}", attributes={'http.method': method}) as span:
+            return self._request(span, operation, uri, method, *args, **kwargs)
+
+    def _request(self, span, operation, uri, method, *args, **kwargs):
+        if connectivity.offline:
+            span.set_attribute('offline', True)
+            raise OfflineError("Gmail is unreachable (offline mode)")
+        units = quota_units(operation)
+        account = metrics.current_account()
+
+        waited = time.perf_counter()
+        self.scheduler.acquire(units)
+        wait = time.perf_counter() - waited
+        priority = 'background' if self.scheduler.is_background else 'interactive'
+        metrics.gmail_quota_wait.observe(wait, account=account, priority=priority)
+        metrics.gmail_quota_units.inc(units, account=account, operation=operation)
+        span.set_attributes({'quota.units': units, 'quota.wait_ms': round(wait * 1000, 1)})
+        if self._last_failure == (method, uri):
+            metrics.gmail_retries.inc(account=account, operation=operation)
+            span.set_attribute('retry', True)
+
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            try:
+                response, content = self.http.request(uri, method, *args, **kwargs)
+            except Exception as e:
+                if is_network_error(e):
+                    connectivity.record_failure()
+                raise
+            connectivity.record_success()
+            status = str(response.status)
+            metrics.gmail_response_bytes.inc(len(content or b''), account=account, operation=operation)
+            span.set_attributes({'http.status_code': response.status, 'http.response_bytes': len(content or b'')})
+            return response, content
+        finally:
+            metrics.gmail_latency.observe(time.perf_counter() - start, account=account, operation=operation)
+            metrics.gmail_requests.inc(account=account, operation=operation, status=status)
+            failed = status == 'error' or status == '429' or status.startswith('5')
+            self._last_failure = (method, uri) if failed else None
+
+    def __getattr__(self, name):
+        # Delegate credentials, close(), timeout, etc. to the wrapped transport
+        return getattr(self.http, name)
+
+# Shared scheduler for all Gmail traffic in the process
+quota_scheduler = QuotaScheduler(float(os.getenv("GMAIL_QUOTA_UNITS_PER_SEC", "250")))
@@ -0,0 +1,191 @@
+import binascii
+import os
+from email.header import decode_header, make_header
+from email.message import Message
+from email.parser import BytesHeaderParser
+from typing import List, Optional, Union
+
+# Format used when a message body is needed: 'full' (Gmail's JSON part tree)
+# or 'raw' (the RFC 822 bytes, parsed lazily by RawMessage)
+BODY_FORMAT = 'raw' if os.getenv("GMAIL_AI_BODY_FORMAT", "full").lower() == 'raw' else 'full'
+
+# compat32 parsing is several times faster than the default policy's header objects
+_header_parser = BytesHeaderParser()
+# Characters of base64url decoded per step, keeping the ASCII copies small
+_DECODE_CHUNK = 1 << 20
+_URLSAFE = bytes.maketrans(b'-_', b'+/')
+
+def decode_base64url(text: str) -> bytearray:
+    """Decode base64url text in chunks straight into one buffer"""
+    data = bytearray()
+    # Padding may be missing; a multiple of 4 keeps every chunk self-contained
+    for start in range(0, len(text), _DECODE_CHUNK):
+        chunk = text[start:start + _DECODE_CHUNK].encode('ascii').translate(_URLSAFE)
+        if start + _DECODE_CHUNK >= len(text):
+            chunk += b'=' * (-len(chunk) % 4)
+        data += binascii.a2b_base64(chunk)
+    return data
+
+def _split_headers(data: bytes, start: int, end: int):
+    """Find where a header block ends and the body starts (a blank line, LF or CRLF)"""
+    if data.startswith(b'\r\n', start, end):
+        return start, start + 2
+    if data.startswith(b'\n', start, end):
+        return start, start + 1
+    crlf = data.find(b'\r\n\r\n', start, end)
+    lf = data.find(b'\n\n', start, end)
+    if crlf >= 0 and (lf < 0 or crlf < lf):
+        return crlf + 2, crlf + 4
+    if lf >= 0:
+        return lf + 1, lf + 2
+    return end, end
+
+def _split_multipart(data: bytes, start: int, end: int, boundary: bytes):
+    """Offsets of each body part between ``--boundary`` delimiter lines"""
+    delimiter = b'--' + boundary
+    spans = []
+    position = data.find(delimiter, start, end)
+    while position >= 0:
+        after = position + len(delimiter)
+        # The close delimiter ends the multipart
+        if data.startswith(b'--', after, end):
+            break
+        line_end = data.find(b'\n', after, end)
+        if line_end < 0:
+            break
+        part_start = line_end + 1
+        following = data.find(b'\n' + delimiter, part_start, end)
+        if following < 0:
+            spans.append((part_start, end))
+            break
+        # The line break before a delimiter belongs to the delimiter
+        part_end = following - 1 if following > part_start and data[following - 1] == 13 else following
+        spans.append((part_start, part_end))
+        position = following + 1
+    return spans
+
+class RawPart:
+    """One MIME entity inside a RawMessage
+
+    Holds its parsed headers and the offsets of its body in the shared
+    buffer; the body is only sliced (as a memoryview) and decoded when
+    asked for.
+    """
+
+    __slots__ = ('_message', 'headers', '_start', '_end', '_children')
+
+    def __init__(self, message: 'RawMessage', headers: Message, start: int, end: int):
+        self._message = message
+        self.headers = headers
+        self._start = start
+        self._end = end
+        self._children = None
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get_content_type()
+
+    @property
+    def filename(self) -> Optional[str]:
+        return self.headers.get_filename()
+
+    @property
+    def is_multipart(self) -> bool:
+        return self.headers.get_content_maintype() == 'multipart'
+
+    @property
+    def body(self) -> memoryview:
+        """The still-encoded body, without copying it"""
+        return self._message.view[self._start:self._end]
+
+    @property
+    def parts(self) -> List['RawPart']:
+        """Child parts of a multipart (parsed on first access)"""
+        if self._children is None:
+            boundary = self.headers.get_boundary()
+            if not self.is_multipart or not boundary:
+                self._children = []
+            else:
+                data = self._message.data
+                self._children = [
+                    self._message._part(start, end)
+                    for start, end in _split_multipart(data, self._start, self._end, boundary.encode('ascii', 'replace'))
+                ]
+        return self._children
+
+    def walk(self):
+        """This part and all its descendants, depth first"""
+        yield self
+        for part in self.parts:
+            yield from part.walk()
+
+    def payload(self) -> Union[bytes, memoryview]:
+        """The decoded body; 7bit/8bit/binary bodies are returned as a view"""
+        encoding = str(self.headers.get('Content-Transfer-Encoding', '')).strip().lower()
+        if encoding == 'base64':
+            return binascii.a2b_base64(self.body)
+        if encoding == 'quoted-printable':
+            return binascii.a2b_qp(self.body)
+        return self.body
+
+    def text(self) -> str:
+        """The body decoded to text with its declared charset"""
+        charset = self.headers.get_content_charset() or 'utf-8'
+        try:
+            return str(self.payload(), charset, 'replace')
+        except LookupError:
+            return str(self.payload(), 'utf-8', 'replace')
+
+class RawMessage(RawPart):
+    """A ``format='raw'`` message decoded once and parsed on demand
+
+    The base64url payload is decoded into a single buffer. Top-level
+    headers are parsed up front with the stdlib header parser; the MIME
+    tree is only scanned when parts are accessed, and part bodies are
+    memoryview slices of the buffer that are decoded individually.
+    """
+
+    __slots__ = ('data', 'view')
+
+    def __init__(self, data: Union[bytes, bytearray]):
+        self.data = data
+        self.view = memoryview(data)
+        header_end, body_start = _split_headers(data, 0, len(data))
+        super().__init__(self, _header_parser.parsebytes(data[:header_end]), body_start, len(data))
+
+    @classmethod
+    def from_resource(cls, message: dict) -> 'RawMessage':
+        """Decode the ``raw`` field of a messages().get(format='raw') response"""
+        return cls(decode_base64url(message['raw']))
+
+    def _part(self, start: int, end: int) -> RawPart:
+        header_end, body_start = _split_headers(self.data, start, end)
+        return RawPart(self, _header_parser.parsebytes(self.data[start:header_end]), body_start, end)
+
+    def header(self, name: str, default: str) -> str:
+        """A decoded top-level header value"""
+        value = self.headers.get(name)
+        if value is None:
+            return default
+        try:
+            return str(make_header(decode_header(value)))
+        except (LookupError, ValueError):
+            return str(value)
+
+    def text_part(self, *content_types: str) -> Optional[RawPart]:
+        """The first non-attachment part with one of the content types"""
+        for part in self.walk():
+            if part.content_type in content_types and not part.filename:
+                return part
+        return None
+
+    def plain_text(self) -> str:
+        """The text/plain body (or the whole body of a single-part message)"""
+        if not self.is_multipart:
+            return self.text()
+        part = self.text_part('text/plain')
+        return part.text() if part else ''
+
+    @property
+    def has_attachments(self) -> bool:
+        return any(part.filename for part in self.walk())
@@ -0,0 +1,180 @@
+import base64
+import quopri
+from typing import Optional, Tuple
+from .raw_message import RawMessage
+from .tracing import get_tracer
+
+tracer = get_tracer(__name__)
+
+def header_value(headers: list, name: str, default: str) -> str:
+    """Get a header value by case-insensitive name"""
+    name = name.lower()
+    return next((h['value'] for h in headers if h['name'].lower() == name), default)
+
+def iter_parts(payload: dict):
+    """Leaf parts of a payload tree, depth first (text bodies are often nested
+    in a multipart/alternative inside multipart/mixed)"""
+    for part in payload.get('parts', ()):
+        if 'parts' in part:
+            yield from iter_parts(part)
+        else:
+            yield part
+
+def decode_plain_text(payload: dict) -> str:
+    """Decode the text/plain body of a message payload"""
+    # Extract body
+    if 'parts' in payload:
+        body = next((
+            part['body'].get('data', '')
+            for part in iter_parts(payload)
+            if part['mimeType'] == 'text/plain'
+        ), '')
+    else:
+        body = payload['body'].get('data', '')
+
+    # Decode body
+    try:
+        return base64.urlsafe_b64decode(body.encode('ASCII')).decode('utf-8')
+    except:
+        try:
+            return quopri.decodestring(body).decode('utf-8')
+        except:
+            return "Could not decode email body"
+
+def has_attachments(payload: dict) -> bool:
+    """Check if a message payload has attachments"""
+    def check_parts(parts):
+        for part in parts:
+            if 'filename' in part and part['filename']:
+                return True
+            if 'parts' in part:
+                if check_parts(part['parts']):
+                    return True
+        return False
+
+    if 'parts' in payload:
+        return check_parts(payload['parts'])
+    return 'body' in payload and 'attachmentId' in payload['body']
+
+class EmailRecord:
+    """Compact, typed view of a Gmail message
+
+    Tools return these instead of pre-formatted text so composite views can
+    reuse what was already fetched. ``body`` and ``has_attachments`` are only
+    set when the message was fetched with ``format='full'`` or ``'raw'``.
+    """
+
+    __slots__ = (
+        'id', 'thread_id', 'sender', 'subject', 'date', 'snippet',
+        'label_ids', 'internal_date', 'body', 'has_attachments'
+    )
+
+    def __init__(self, id: str, thread_id: str = None, sender: str = 'Unknown sender',
+                 subject: str = 'No subject', date: str = 'Unknown date', snippet: str = '',
+                 label_ids: Tuple[str, ...] = (), internal_date: int = 0,
+                 body: Optional[str] = None, has_attachments: Optional[bool] = None):
+        self.id = id
+        self.thread_id = thread_id
+        self.sender = sender
+        self.subject = subject
+        self.date = date
+        self.snippet = snippet
+        self.label_ids = label_ids
+        self.internal_date = internal_date
+        self.body = body
+        self.has_attachments = has_attachments
+
+    @classmethod
+    def from_message(cls, message: dict, full: bool = False) -> 'EmailRecord':
+        """Build a record from a messages().get() response
+
+        Pass ``full=True`` for ``format='full'`` or ``format='raw'`` responses
+        to decode the body.
+        """
+        if full and 'raw' in message:
+            return cls.from_raw(message)
+        payload = message.get('payload', {})
+        headers = payload.get('headers', [])
+        if full:
+            with tracer.start_as_current_span("decode_body"):
+                body = decode_plain_text(payload)
+                attachments = has_attachments(payload)
+        else:
+            body = attachments = None
+        return cls(
+            id=message['id'],
+            thread_id=message.get('threadId'),
+            sender=header_value(headers, 'from', 'Unknown sender'),
+            subject=header_value(headers, 'subject', 'No subject'),
+            date=header_value(headers, 'date', 'Unknown date'),
+            snippet=message.get('snippet', ''),
+            label_ids=tuple(message.get('labelIds', ())),
+            internal_date=int(message.get('internalDate', 0)),
+            body=body,
+            has_attachments=attachments
+        )
+
+    @classmethod
+    def from_raw(cls, message: dict) -> 'EmailRecord':
+        """Build a record from a ``format='raw'`` response"""
+        with tracer.start_as_current_span("decode_body"):
+            raw = RawMessage.from_resource(message)
+            body = raw.plain_text()
+            attachments = raw.has_attachments
+        return cls(
+            id=message['id'],
+            thread_id=message.get('threadId'),
+            sender=raw.header('From', 'Unknown sender'),
+            subject=raw.header('Subject', 'No subject'),
+            date=raw.header('Date', 'Unknown date'),
+            snippet=message.get('snippet', ''),
+            label_ids=tuple(message.get('labelIds', ())),
+            internal_date=int(message.get('internalDate', 0)),
+            body=body,
+            has_attachments=attachments
+        )
+
+    def to_dict(self) -> dict:
+        """Plain dict of the record's fields (JSON serializable)"""
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data['label_ids'] = list(self.label_ids)
+        return data
+
+    def to_message(self) -> dict:
+        """Render the record as a ``format='metadata'`` response, for code written against those"""
+        return {
+            'id': self.id,
+            'threadId': self.thread_id,
+            'labelIds': list(self.label_ids),
+            'snippet': self.snippet,
+            'internalDate': str(self.internal_date),
+            'payload': {
+                # Metadata responses only hint at attachments through the top-level type
+                'mimeType': 'multipart/mixed' if self.has_attachments else 'text/plain',
+                'headers': [
+                    {'name': 'From', 'value': self.sender},
+                    {'name': 'Subject', 'value': self.subject},
+                    {'name': 'Date', 'value': self.date}
+                ]
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'EmailRecord':
+        return cls(**dict(data, label_ids=tuple(data.get('label_ids', ()))))
+
+    @property
+    def is_unread(self) -> bool:
+        return 'UNREAD' in self.label_ids
+
+    def format_summary(self) -> str:
+        """Format the record the way the chat tools list emails"""
+        return f"""
+Email ID: {self.id}
+From: {self.sender}
+Date: {self.date}
+Subject: {self.subject}
+"""
+
+    def __repr__(self):
+        return f"EmailRecord(id={self.id!r}, sender={self.sender!r}, subject={self.subject!r})"
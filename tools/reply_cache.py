@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+class ReplyCache:
+    """Precomputed reply suggestions keyed by (account, message ID)
+
+    Each entry remembers the thread and the thread's history ID when it was
+    drafted. Syncs report the history IDs they see; a newer one means the
+    thread changed (a new message, a reply sent elsewhere, ...) and its
+    entries are dropped. Entries also expire after ``ttl`` seconds to cover
+    changes no sync saw.
+    """
+
+    def __init__(self, ttl: float = 1800.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, account: str, email_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get((account, email_id))
+            if entry is None:
+                return None
+            if time.time() - entry['created'] > self.ttl:
+                del self._entries[(account, email_id)]
+                return None
+            return entry['suggestion']
+
+    def put(self, account: str, email_id: str, thread_id: str, history_id: int, suggestion: str):
+        with self._lock:
+            self._entries[(account, email_id)] = {
+                'thread_id': thread_id,
+                'history_id': history_id,
+                'created': time.time(),
+                'suggestion': suggestion
+            }
+
+    def contains(self, account: str, email_id: str) -> bool:
+        return self.get(account, email_id) is not None
+
+    def observe(self, account: str, messages: Iterable[dict]):
+        """Drop entries whose thread has moved past the history ID they were drafted at"""
+        latest = {}
+        for message in messages:
+            thread_id = message.get('threadId')
+            if thread_id:
+                latest[thread_id] = max(latest.get(thread_id, 0), int(message.get('historyId', 0)))
+
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if key[0] == account and latest.get(entry['thread_id'], 0) > entry['history_id']
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def invalidate_thread(self, account: str, thread_id: str):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items()
+                        if key[0] == account and entry['thread_id'] == thread_id]:
+                del self._entries[key]
+
+# Shared by every session so background drafts serve the chat tools
+reply_cache = ReplyCache(float(os.getenv("GMAIL_AI_REPLY_CACHE_TTL", "1800")))
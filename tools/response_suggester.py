@@ -1,61 +1,84 @@
-from googleapiclient.discovery import build
+from typing import Optional
 from .base_tool import BaseTool
+from .gemini_client import GeminiClient
+from .raw_message import BODY_FORMAT
+from .records import EmailRecord
+from .reply_cache import reply_cache
+from . import metrics
 
 class ResponseSuggester(BaseTool):
-    """Tool for suggesting email responses"""
-    
+    """Tool for suggesting email responses
+
+    With a Gemini key the suggestion is an LLM-drafted reply, otherwise a
+    template. Suggestions precomputed in the background (see
+    ``components.reply_precomputer``) are served from the shared reply cache.
+    """
+
     def __init__(self):
         super().__init__()
-        self.service = None
-    
-    def _ensure_service(self):
-        """Ensure we have an authenticated Gmail service"""
-        self.ensure_authenticated()
-        if not self.service:
-            self.service = build('gmail', 'v1', credentials=self.credentials)
-    
+        self.model = None
+
+    def set_account(self, account_name: str, gemini_api_key: Optional[str] = None):
+        """Set the account used for cache keys and the Gemini key for drafting"""
+        self.account_name = account_name
+        self.model = GeminiClient(gemini_api_key) if gemini_api_key else None
+
     def suggest_response(self, email_id: str) -> str:
         """Suggest a response for an email"""
         try:
+            cached = reply_cache.get(self.account_name, email_id)
+            metrics.record_cache('reply_suggestion', cached is not None)
+            if cached is not None:
+                return cached
+
             self._ensure_service()
-            
+
             # Get the email
             message = self.service.users().messages().get(
                 userId='me',
                 id=email_id,
-                format='full'
+                format=BODY_FORMAT
             ).execute()
-            
-            # Extract headers
-            headers = message['payload']['headers']
-            subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No subject')
-            from_email = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown sender')
-            
-            # Extract body
-            if 'parts' in message['payload']:
-                parts = message['payload']['parts']
-                body = next((
-                    part['body'].get('data', '')
-                    for part in parts
-                    if part['mimeType'] == 'text/plain'
-                ), '')
-            else:
-                body = message['payload']['body'].get('data', '')
-            
-            import base64
-            import quopri
-            
-            # Decode body
-            try:
-                decoded_body = base64.urlsafe_b64decode(body.encode('ASCII')).decode('utf-8')
-            except:
-                try:
-                    decoded_body = quopri.decodestring(body).decode('utf-8')
-                except:
-                    decoded_body = "Could not decode email body"
-            
-            # Generate response suggestion
-            suggestion = f"""
+            return self.build_suggestion(message)
+
+        except Exception as e:
+            return f"Error suggesting response: {str(e)}"
+
+    def build_suggestion(self, message: dict) -> str:
+        """Draft a suggestion for a format='full' (or 'raw') message and cache it"""
+        record = EmailRecord.from_message(message, full=True)
+        suggestion = self._draft_reply(record) if self.model else self._template_reply(record)
+        reply_cache.put(self.account_name, record.id, record.thread_id,
+                        int(message.get('historyId', 0)), suggestion)
+        return suggestion
+
+    def _draft_reply(self, record: EmailRecord) -> str:
+        """Draft a reply with Gemini"""
+        body = ' '.join((record.body or '').split())[:2000]
+        reply = self.model.generate_content(
+            f"Write a concise, polite reply to this email on behalf of its recipient. "
+            f"Return only the reply body, without a subject line. Use [brackets] for any "
+            f"detail the recipient must fill in.\n\n"
+            f"From: {record.sender}\nSubject: {record.subject}\n\n{body}",
+            generation_config={'temperature': 0.4, 'topP': 0.9, 'maxOutputTokens': 400}
+        ).strip()
+        return f"""
+Suggested Response:
+------------------
+To: {record.sender}
+Subject: Re: {record.subject}
+
+{reply}
+"""
+
+    def _template_reply(self, record: EmailRecord) -> str:
+        """Build a fill-in template reply"""
+        from_email = record.sender
+        subject = record.subject
+        decoded_body = record.body
+
+        # Generate response suggestion
+        return f"""
 Suggested Response:
 ------------------
 To: {from_email}
@@ -70,7 +93,3 @@ Thank you for your email regarding {subject}.
 Original Email:
 {decoded_body[:500]}{'...' if len(decoded_body) > 500 else ''}
 """
-            return suggestion
-            
-        except Exception as e:
-            return f"Error suggesting response: {str(e)}" 
\ No newline at end of file
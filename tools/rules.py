@@ -0,0 +1,338 @@
+import json
+import os
+import re
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parseaddr
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .base_tool import BaseTool
+from .records import EmailRecord
+
+try:
+    # Optional C implementation (pip install pyahocorasick)
+    import ahocorasick as _pyahocorasick
+except ImportError:
+    _pyahocorasick = None
+
+# Message fields rules can match on
+FIELDS = ('from', 'subject', 'body')
+PAGE_SIZE = 500
+# System labels, whose presence can be checked from a record's label IDs
+SYSTEM_LABELS = frozenset({'INBOX', 'UNREAD', 'STARRED', 'IMPORTANT', 'SPAM', 'TRASH'})
+
+class AhoCorasick:
+    """Case-insensitive multi-pattern substring matcher
+
+    All literals are compiled into one automaton, so a text is scanned once
+    however many patterns there are. Each pattern carries a payload (here
+    the indexes of the rules that use it). Uses pyahocorasick when it is
+    installed and a pure-Python automaton otherwise.
+    """
+
+    def __init__(self, patterns: Dict[str, Set[int]]):
+        self._automaton = None
+        if _pyahocorasick:
+            self._automaton = _pyahocorasick.Automaton()
+            for pattern, payload in patterns.items():
+                self._automaton.add_word(pattern.lower(), frozenset(payload))
+            self._automaton.make_automaton()
+            return
+
+        # Node 0 is the root; each node has transitions, a failure link and outputs
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+        for pattern, payload in patterns.items():
+            node = 0
+            for char in pattern.lower():
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                node = next_node
+            self._output[node] |= payload
+
+        # Breadth-first failure links; outputs inherit along them
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] |= self._output[self._fail[child]]
+
+    def search(self, text: str) -> Set[int]:
+        """Return the union of the payloads of every pattern found in ``text``"""
+        if self._automaton is not None:
+            found = set()
+            for _, payload in self._automaton.iter(text.lower()):
+                found |= payload
+            return found
+
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found |= output[node]
+        return found
+
+class _RegexMatcher:
+    """All regexes for one field combined into a single alternation
+
+    The combined pattern finds most matches in one scan. Because an
+    alternation reports one branch per position, rules the scan didn't
+    report are re-checked individually, but only for texts where something
+    matched at all (rare for filtering rules). Patterns with groups of
+    their own (whose numbers and backreferences would shift once combined)
+    are always checked individually, as is everything if the combined
+    pattern doesn't compile (e.g. inline flags or duplicate group names).
+    """
+
+    def __init__(self, patterns: List[Tuple[int, List[str]]]):
+        # Every regex is compiled on its own first (this also validates it)
+        self._individual = {index: [re.compile(value, re.IGNORECASE) for value in values]
+                            for index, values in patterns}
+        # One rule's alternatives become one branch
+        branches = [(index, '|'.join(f"(?:{value})" for value in values)) for index, values in patterns
+                    if not any(regex.groups for regex in self._individual[index])]
+        try:
+            self._combined = re.compile(
+                '|'.join(f"(?P<r{index}>{branch})" for index, branch in branches),
+                re.IGNORECASE
+            ) if branches else None
+        except re.error:
+            self._combined = None
+        self._rules = {f"r{index}": index for index, _ in branches} if self._combined else {}
+        self._separate = [index for index in self._individual if index not in self._rules.values()]
+
+    def _matches(self, index: int, text: str) -> bool:
+        return any(regex.search(text) for regex in self._individual[index])
+
+    def search(self, text: str) -> Set[int]:
+        found = set()
+        if self._combined is not None:
+            found = {self._rules[match.lastgroup] for match in self._combined.finditer(text)}
+            if found:
+                for index in self._rules.values():
+                    if index not in found and self._matches(index, text):
+                        found.add(index)
+        for index in self._separate:
+            if self._matches(index, text):
+                found.add(index)
+        return found
+
+class Rule:
+    """One filtering rule
+
+    Conditions are keyed by field: ``<field>`` (substring list),
+    ``<field>_regex`` (regex or list of regexes) and ``from_domain`` (sender
+    domain list; subdomains match too). Values within a condition are
+    alternatives; every condition given must match. Any list can instead
+    be ``"@file.txt"`` to load one entry per line.
+    """
+
+    __slots__ = ('name', 'conditions', 'add_labels', 'remove_labels')
+
+    def __init__(self, name: str, conditions: Dict[str, List[str]],
+                 add_labels: Iterable[str] = (), remove_labels: Iterable[str] = ()):
+        self.name = name
+        self.conditions = conditions
+        self.add_labels = tuple(add_labels)
+        self.remove_labels = tuple(remove_labels)
+
+    @classmethod
+    def from_dict(cls, data: dict, base_dir: str = '.') -> 'Rule':
+        match = data.get('match', {})
+        unknown = set(match) - {*FIELDS, *(f"{field}_regex" for field in FIELDS), 'from_domain'}
+        if unknown:
+            raise ValueError(f"Rule '{data.get('name')}': unknown conditions {sorted(unknown)}")
+        if not match:
+            raise ValueError(f"Rule '{data.get('name')}' has no conditions")
+
+        conditions = {key: _load_values(value, base_dir) for key, value in match.items()}
+        actions = data.get('actions', {})
+        add_labels = list(actions.get('add_labels', []))
+        remove_labels = list(actions.get('remove_labels', []))
+        if actions.get('archive'):
+            remove_labels.append('INBOX')
+        if actions.get('mark_read'):
+            remove_labels.append('UNREAD')
+        if actions.get('star'):
+            add_labels.append('STARRED')
+        if not add_labels and not remove_labels:
+            raise ValueError(f"Rule '{data.get('name')}' has no actions")
+        return cls(data.get('name', 'unnamed'), conditions, add_labels, remove_labels)
+
+def _load_values(value, base_dir: str) -> List[str]:
+    if isinstance(value, str) and value.startswith('@'):
+        with open(os.path.join(base_dir, value[1:]), 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    values = [value] if isinstance(value, str) else list(value)
+    return [v for v in values if v]
+
+def sender_domains(sender: str) -> List[str]:
+    """The sender's domain and each parent domain, e.g. a.b.com, b.com, com"""
+    address = parseaddr(sender)[1].lower()
+    domain = address.rpartition('@')[2]
+    parts = domain.split('.')
+    return ['.'.join(parts[i:]) for i in range(len(parts))] if domain else []
+
+class RuleSet:
+    """Rules compiled for single-pass evaluation
+
+    Per field, every substring pattern of every rule goes into one
+    Aho-Corasick automaton and every regex into one combined matcher;
+    sender domains are a hash lookup. Evaluating a message is a handful of
+    scans whatever the number of rules or patterns.
+    """
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        # Conditions each rule must satisfy
+        self._required = [set(rule.conditions) for rule in rules]
+        self.needs_body = any(key.startswith('body') for rule in rules for key in rule.conditions)
+
+        literals = {field: defaultdict(set) for field in FIELDS}
+        regexes = {field: [] for field in FIELDS}
+        self._domains = defaultdict(set)
+        for index, rule in enumerate(rules):
+            for key, values in rule.conditions.items():
+                if key == 'from_domain':
+                    for domain in values:
+                        self._domains[domain.lower().lstrip('@').lstrip('.')].add(index)
+                elif key.endswith('_regex'):
+                    field = key[:-len('_regex')]
+                    regexes[field].append((index, values))
+                else:
+                    for value in values:
+                        literals[key][value].add(index)
+
+        self._literals = {field: AhoCorasick(patterns) for field, patterns in literals.items() if patterns}
+        self._regexes = {field: _RegexMatcher(patterns) for field, patterns in regexes.items() if patterns}
+
+    @classmethod
+    def load(cls, path: str) -> 'RuleSet':
+        """Load rules from a JSON file (a list of rules, or {"rules": [...]})"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('rules', [])
+        base_dir = os.path.dirname(os.path.abspath(path))
+        return cls([Rule.from_dict(rule, base_dir) for rule in data])
+
+    def match(self, record: EmailRecord) -> List[Rule]:
+        """Return the rules that match a record"""
+        texts = {'from': record.sender or '', 'subject': record.subject or '', 'body': record.body or ''}
+        satisfied = defaultdict(set)
+
+        for domain in sender_domains(texts['from']):
+            for index in self._domains.get(domain, ()):
+                satisfied[index].add('from_domain')
+        for field, automaton in self._literals.items():
+            for index in automaton.search(texts[field]):
+                satisfied[index].add(field)
+        for field, matcher in self._regexes.items():
+            for index in matcher.search(texts[field]):
+                satisfied[index].add(f"{field}_regex")
+
+        return [self.rules[index] for index in sorted(satisfied) if satisfied[index] >= self._required[index]]
+
+    def plan(self, records: Iterable[EmailRecord]) -> Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], List[str]]:
+        """Group message IDs by the label changes their matching rules make
+
+        Returns {(add label names, remove label names): [message IDs]}, one
+        entry per distinct change so each becomes a few batchModify calls.
+        System labels a message already has (or lacks) are left out.
+        """
+        groups = defaultdict(list)
+        for record in records:
+            rules = self.match(record)
+            if not rules:
+                continue
+            add = {label for rule in rules for label in rule.add_labels}
+            remove = {label for rule in rules for label in rule.remove_labels} - add
+            # Skip system label changes that are already in effect
+            remove = {label for label in remove if label not in SYSTEM_LABELS or label in record.label_ids}
+            add = {label for label in add if label not in SYSTEM_LABELS or label not in record.label_ids}
+            if add or remove:
+                groups[(tuple(sorted(add)), tuple(sorted(remove)))].append(record.id)
+        return groups
+
+class RulesEngine(BaseTool):
+    """Tool that runs a rule set over a mailbox backlog
+
+    Messages are fetched concurrently and matched locally; matches are
+    applied as grouped batchModify calls through ``LabelManager``, so a run
+    costs a couple of API calls per distinct label change rather than one
+    per message per rule.
+    """
+
+    def run(self, rule_set: RuleSet, label_manager, query: str = 'in:inbox', limit: Optional[int] = None,
+            dry_run: bool = False, workers: int = 8, job=None) -> dict:
+        """Apply ``rule_set`` to messages matching ``query``
+
+        Returns counts and the planned or applied changes per rule group.
+        """
+        self._ensure_service()
+        records = self._fetch_records(query, limit, rule_set.needs_body, workers, job)
+        groups = rule_set.plan(records)
+
+        changes = []
+        if groups and not dry_run:
+            names = {label for add, remove in groups for label in add + remove}
+            label_ids = label_manager.resolve_label_ids(sorted(names))
+            for (add, remove), message_ids in groups.items():
+                if job:
+                    job.check_cancelled()
+                label_manager.batch_modify(
+                    message_ids,
+                    add_label_ids=[label_ids[label] for label in add],
+                    remove_label_ids=[label_ids[label] for label in remove]
+                )
+        for (add, remove), message_ids in groups.items():
+            changes.append({'add': list(add), 'remove': list(remove), 'messages': len(message_ids)})
+
+        return {
+            'scanned': len(records),
+            'matched': sum(len(message_ids) for message_ids in groups.values()),
+            'changes': changes,
+            'dry_run': dry_run
+        }
+
+    def _fetch_records(self, query: str, limit: Optional[int], full: bool, workers: int, job) -> List[EmailRecord]:
+        ids = []
+        page_token = None
+        while True:
+            params = {'userId': 'me', 'q': query, 'maxResults': PAGE_SIZE, 'fields': 'messages/id,nextPageToken'}
+            if page_token:
+                params['pageToken'] = page_token
+            results = self.service.users().messages().list(**params).execute()
+            ids.extend(message['id'] for message in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token or (limit and len(ids) >= limit):
+                break
+        if limit:
+            ids = ids[:limit]
+        if job:
+            job.update(total=len(ids), fetched=0)
+
+        def fetch(email_id):
+            if job:
+                job.check_cancelled()
+            record = self._fetch_record(email_id, full=full)
+            if job:
+                job.increment('fetched')
+            return record
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rules') as executor:
+            return list(executor.map(fetch, ids))
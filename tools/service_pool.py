@@ -0,0 +1,85 @@
+import os
+import threading
+import httplib2
+import google_auth_httplib2
+from googleapiclient.discovery import build
+from .quota import QuotaHttp, quota_scheduler
+from .tracing import get_tracer
+
+tracer = get_tracer(__name__)
+
+class ServicePool:
+    """Thread-local pool of Gmail API services
+
+    googleapiclient service objects and the httplib2 transport underneath
+    them are not thread-safe, so each worker thread gets its own service
+    (and HTTP connection) per account instead of sharing a single one.
+    """
+
+    def __init__(self, api_endpoint: str = None):
+        self._local = threading.local()
+        # Point the services at another Gmail API host, e.g. a local fake server
+        self.api_endpoint = api_endpoint or os.getenv("GMAIL_API_ENDPOINT")
+        # Optional replacement for the authorized transport (e.g. a cassette)
+        self.http_factory = None
+        self._generation = 0
+
+    def _credentials_key(self, credentials):
+        """Key credentials by account so sessions of the same user share transports"""
+        refresh_token = getattr(credentials, 'refresh_token', None)
+        if refresh_token:
+            return (getattr(credentials, 'client_id', None), refresh_token)
+        return id(credentials)
+
+    def _create_http(self, credentials):
+        """Create an authorized, quota-scheduled HTTP transport for the calling thread"""
+        if self.http_factory:
+            http = self.http_factory(credentials)
+        else:
+            http = self.authorized_http(credentials)
+        return QuotaHttp(http, quota_scheduler)
+
+    @staticmethod
+    def authorized_http(credentials):
+        """Create the default authorized httplib2 transport"""
+        return google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+
+    def set_http_factory(self, factory):
+        """Build future transports with ``factory(credentials)`` (None restores the default)
+
+        Services already cached on any thread are rebuilt on their next use.
+        """
+        self.http_factory = factory
+        self._generation += 1
+
+    def get_service(self, credentials):
+        """Get the Gmail service for these credentials on the calling thread"""
+        services = getattr(self._local, 'services', None)
+        if services is None or getattr(self._local, 'generation', None) != self._generation:
+            services = self._local.services = {}
+            self._local.generation = self._generation
+
+        key = self._credentials_key(credentials)
+        service = services.get(key)
+        if service is None:
+            client_options = {'api_endpoint': self.api_endpoint} if self.api_endpoint else None
+            with tracer.start_as_current_span("gmail build"):
+                service = build(
+                    'gmail', 'v1',
+                    http=self._create_http(credentials),
+                    cache_discovery=False,
+                    client_options=client_options
+                )
+            services[key] = service
+        return service
+
+    def clear(self):
+        """Drop the services cached on the calling thread"""
+        self._local.services = {}
+
+# Shared pool used by all tools and views
+service_pool = ServicePool()
+
+def get_gmail_service(credentials):
+    """Get a thread-local Gmail service for the given credentials"""
+    return service_pool.get_service(credentials)
@@ -0,0 +1,89 @@
+import threading
+from .email_drafter import EmailDrafter
+from .email_analyzer import EmailAnalyzer
+from .response_suggester import ResponseSuggester
+from .email_processor import EmailProcessor
+from .email_finder import EmailFinder
+from .label_manager import LabelManager
+from .mailbox_export import MailboxExporter
+from .mailbox_import import MailboxImporter
+from .rules import RulesEngine
+from .triage import TriageClassifier
+from .mail_merge import MailMerge
+from .message_index import MessageIndexer
+
+class ToolSession:
+    """Set of Gmail tools owned by a single user session
+
+    Each Gradio session gets its own instance (held in ``gr.State``) so
+    per-user state such as the connected email never leaks between users
+    or browser tabs. Gmail transports come from the shared thread-local
+    service pool, so sessions of the same account still reuse connections.
+    """
+
+    TOOL_CLASSES = {
+        'email_drafter': EmailDrafter,
+        'email_analyzer': EmailAnalyzer,
+        'response_suggester': ResponseSuggester,
+        'email_processor': EmailProcessor,
+        'email_finder': EmailFinder,
+        'label_manager': LabelManager,
+        'mailbox_exporter': MailboxExporter,
+        'mailbox_importer': MailboxImporter,
+        'rules_engine': RulesEngine,
+        'triage_classifier': TriageClassifier,
+        'mail_merge': MailMerge,
+        'message_indexer': MessageIndexer
+    }
+
+    def __init__(self, account):
+        self.account_name = account.name
+        self.token_pickle = account.token_pickle
+        self.gemini_api_key = account.gemini_api_key
+        self.tools = {name: tool_class() for name, tool_class in self.TOOL_CLASSES.items()}
+
+        # Configure each tool with the account
+        for tool in self.tools.values():
+            tool.set_credentials(
+                client_id=account.client_id,
+                client_secret=account.client_secret,
+                token_pickle=account.token_pickle if account.token_pickle else None,
+                account_name=account.name
+            )
+        self.tools['response_suggester'].set_account(account.name, account.gemini_api_key)
+
+    def __getitem__(self, name: str):
+        return self.tools[name]
+
+    def matches(self, account) -> bool:
+        """Check whether this session was built for the given account"""
+        return (
+            account is not None
+            and account.name == self.account_name
+            and account.token_pickle == self.token_pickle
+            and account.gemini_api_key == self.gemini_api_key
+        )
+
+    def set_connected_email(self, email: str):
+        """Set the connected email for every tool in the session"""
+        for tool in self.tools.values():
+            tool.set_connected_email(email)
+
+class SessionCache:
+    """One shared ToolSession per account for long-lived headless servers
+
+    The chat UI keeps a session per browser tab; servers answering many
+    independent requests reuse one per account instead, so every request
+    hits the same warm tools and pooled transports.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, account) -> ToolSession:
+        with self._lock:
+            session = self._sessions.get(account.name)
+            if session is None or not session.matches(account):
+                session = self._sessions[account.name] = ToolSession(account)
+            return session
@@ -0,0 +1,231 @@
+"""Lightweight span tracing with an OpenTelemetry-style API
+
+    tracer = get_tracer(__name__)
+    with tracer.start_as_current_span("gmail messages.get", attributes={"id": email_id}) as span:
+        span.set_attribute("http.status_code", 200)
+
+Spans nest through a context variable, so spans opened in job threads
+(which run in a copy of the submitting context) attach to the handler
+span that started them. Finished traces are exported per root span:
+
+- ``GMAIL_AI_TRACE_EXPORTER``: ``console``, ``json`` or ``none`` (default)
+- ``GMAIL_AI_TRACE_FILE``: file for the JSON exporter (``traces.jsonl``)
+- ``GMAIL_AI_SLOW_TRACE_MS``: print the span tree of any trace slower than
+  this (default 2000, 0 disables)
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+from .data_dir import data_path, ensure_parent
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class StatusCode:
+    UNSET = 'UNSET'
+    OK = 'OK'
+    ERROR = 'ERROR'
+
+class Span:
+    """A timed operation with attributes, events and child spans"""
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, attributes: dict = None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.children = []
+        self.status = StatusCode.UNSET
+        self.status_description = None
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self._lock = threading.Lock()
+        if parent:
+            with parent._lock:
+                parent.children.append(self)
+
+    @property
+    def is_recording(self) -> bool:
+        return self.duration is None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict):
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes: dict = None):
+        self.events.append({'name': name, 'offset_ms': self.elapsed_ms(), 'attributes': dict(attributes or {})})
+
+    def set_status(self, status: str, description: str = None):
+        self.status = status
+        self.status_description = description
+
+    def record_exception(self, exception: BaseException):
+        self.add_event('exception', {'type': type(exception).__name__, 'message': str(exception)})
+
+    def elapsed_ms(self) -> float:
+        if self.duration is not None:
+            return self.duration * 1000
+        return (time.perf_counter() - self._start) * 1000
+
+    def end(self):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if self.parent is None:
+            _export(self)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            children = list(self.children)
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'start_time': self.start_time,
+            'duration_ms': round(self.elapsed_ms(), 3),
+            'status': self.status,
+            'attributes': self.attributes,
+            'events': self.events,
+            'children': [child.to_dict() for child in children]
+        }
+
+    def format_tree(self, indent: int = 0) -> str:
+        """Render the span and its children as an indented tree"""
+        attributes = " ".join(f"{k}={v}" for k, v in self.attributes.items())
+        flag = " [ERROR]" if self.status == StatusCode.ERROR else ""
+        running = "" if self.duration is not None else " (running)"
+        lines = [f"{'  ' * indent}{self.elapsed_ms():8.1f}ms  {self.name}{flag}{running}  {attributes}".rstrip()]
+        with self._lock:
+            children = sorted(self.children, key=lambda child: child.start_time)
+        for child in children:
+            lines.append(child.format_tree(indent + 1))
+        return "\n".join(lines)
+
+class Tracer:
+    def __init__(self, name: str):
+        self.name = name
+
+    def start_span(self, name: str, attributes: dict = None) -> Span:
+        """Start a span under the current one without making it current"""
+        return Span(name, _current_span.get(), attributes)
+
+    @contextmanager
+    def start_as_current_span(self, name: str, attributes: dict = None):
+        """Start a span, make it current for the block and end it afterwards"""
+        span = self.start_span(name, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):
+                span.record_exception(e)
+                span.set_status(StatusCode.ERROR, str(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+def get_tracer(name: str) -> Tracer:
+    return Tracer(name)
+
+def get_current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def set_attribute(key: str, value):
+    """Set an attribute on the current span, if any"""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+def traced(name: str = None):
+    """Decorator running a function (or each step of a generator) in a span"""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+        tracer = get_tracer(fn.__module__)
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                # Gradio may resume the generator in another context, so the
+                # span is made current around each step instead of across yields
+                span = tracer.start_span(span_name)
+                generator = fn(*args, **kwargs)
+                try:
+                    while True:
+                        token = _current_span.set(span)
+                        try:
+                            update = next(generator)
+                        except StopIteration:
+                            return
+                        finally:
+                            _current_span.reset(token)
+                        yield update
+                except GeneratorExit:
+                    span.set_attribute('cancelled', True)
+                    generator.close()
+                    raise
+                except Exception as e:
+                    span.record_exception(e)
+                    span.set_status(StatusCode.ERROR, str(e))
+                    raise
+                finally:
+                    span.end()
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class ConsoleSpanExporter:
+    """Print each finished trace as a span tree"""
+
+    def export(self, span: Span):
+        print(f"Trace {span.trace_id}:\n{span.format_tree()}")
+
+class JsonSpanExporter:
+    """Append each finished trace as one JSON line"""
+
+    def __init__(self, path: str = "traces.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            ensure_parent(self.path)
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+def _create_exporter():
+    exporter = os.getenv("GMAIL_AI_TRACE_EXPORTER", "none").lower()
+    if exporter == "console":
+        return ConsoleSpanExporter()
+    if exporter == "json":
+        return JsonSpanExporter(os.getenv("GMAIL_AI_TRACE_FILE") or data_path("traces.jsonl"))
+    return None
+
+exporter = _create_exporter()
+SLOW_TRACE_MS = float(os.getenv("GMAIL_AI_SLOW_TRACE_MS", "2000"))
+
+def _export(span: Span):
+    try:
+        if exporter is not None:
+            exporter.export(span)
+        if SLOW_TRACE_MS and span.elapsed_ms() >= SLOW_TRACE_MS and not isinstance(exporter, ConsoleSpanExporter):
+            print(f"Slow request ({span.elapsed_ms():.0f}ms >= {SLOW_TRACE_MS:.0f}ms), trace {span.trace_id}:\n{span.format_tree()}")
+    except Exception as e:
+        print(f"Error exporting trace: {str(e)}")